@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import threading
+import time
+from time import sleep
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import LRUCache
+
+
+LOGGER = logging.getLogger(__name__)
+
+POLICY_NAME = u'OpenEdxVideoPipelineAccessPolicy_{}_{}'
+POLICY_CACHE_KEY = 'azure_video_pipeline.access_policy.{}'
+POLICY_CACHE_TTL = 24 * 60 * 60
+CREATE_LOCK_TIMEOUT = 30
+CREATE_WAIT_INTERVAL = 0.1
+
+_access_policies = LRUCache(max_size=1000)
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def get_lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+class AccessPolicyPool(object):
+    """
+    Pool of AccessPolicies shared by all Locators of the Media Services account.
+
+    AccessPolicy duration counts from the Locator's StartTime, so a single policy per (permissions, duration)
+    serves every operation. The pooled policy is discovered by its name and created only if there is none;
+    its ID is kept in-process and in the Django cache for `AZURE_ACCESS_POLICY_CACHE_TTL` seconds.
+    Concurrent acquisition is serialized by a thread lock and a cache lock, so workers don't create duplicates.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_cache_key(self, duration_in_minutes, permissions):
+        digest = hashlib.md5(u'{}|{}|{}'.format(
+            self.client.rest_api_endpoint, permissions, duration_in_minutes
+        ).encode('utf-8')).hexdigest()
+        return POLICY_CACHE_KEY.format(digest)
+
+    def acquire(self, duration_in_minutes, permissions):
+        """
+        Get ID of pooled AccessPolicy with given duration and permissions.
+        """
+        key = self.get_cache_key(duration_in_minutes, permissions)
+        policy_id = _access_policies.get(key)
+        if policy_id is not None:
+            return policy_id
+
+        with get_lock(key):
+            policy_id = _access_policies.get(key) or cache.get(key)
+            if policy_id is None:
+                policy_id = self.discover_or_create(key, duration_in_minutes, permissions)
+                cache.set(key, policy_id, self.ttl)
+            _access_policies.set(key, policy_id, self.ttl)
+        return policy_id
+
+    def invalidate(self, duration_in_minutes, permissions):
+        """
+        Forget pooled AccessPolicy, e.g. after it was deleted on Azure.
+        """
+        key = self.get_cache_key(duration_in_minutes, permissions)
+        _access_policies.delete(key)
+        cache.delete(key)
+
+    @property
+    def ttl(self):
+        return settings.FEATURES.get('AZURE_ACCESS_POLICY_CACHE_TTL', POLICY_CACHE_TTL)
+
+    def discover(self, duration_in_minutes, permissions):
+        policies = self.client.iter_collection(
+            "AccessPolicies?$filter=Name eq '{}'".format(POLICY_NAME.format(permissions, duration_in_minutes)),
+            select=['Id', 'DurationInMinutes', 'Permissions'],
+        )
+        for policy in policies:
+            if (int(policy['Permissions']) == permissions and
+                    int(float(policy['DurationInMinutes'])) == duration_in_minutes):
+                return policy['Id']
+
+    def discover_or_create(self, key, duration_in_minutes, permissions):
+        policy_id = self.discover(duration_in_minutes, permissions)
+        if policy_id is not None:
+            return policy_id
+
+        lock_key = '{}.lock'.format(key)
+        deadline = time.time() + CREATE_LOCK_TIMEOUT
+        locked = cache.add(lock_key, True, CREATE_LOCK_TIMEOUT)
+        while not locked:
+            # another process is creating the policy - wait for it to be shared:
+            sleep(CREATE_WAIT_INTERVAL)
+            policy_id = cache.get(key)
+            if policy_id is not None:
+                return policy_id
+            if time.time() > deadline:
+                LOGGER.warning('Gave up waiting for concurrent AccessPolicy creation [%s].', key)
+                break
+            locked = cache.add(lock_key, True, CREATE_LOCK_TIMEOUT)
+        try:
+            policy_id = cache.get(key) or self.discover(duration_in_minutes, permissions)
+            if policy_id is None:
+                LOGGER.info('Creating pooled AccessPolicy [permissions:%s, duration:%s].', permissions,
+                            duration_in_minutes)
+                policy = self.client.create_access_policy(
+                    POLICY_NAME.format(permissions, duration_in_minutes), duration_in_minutes, permissions
+                )
+                policy_id = policy['Id']
+                cache.set(key, policy_id, self.ttl)
+            return policy_id
+        finally:
+            if locked:
+                cache.delete(lock_key)
@@ -1,10 +1,46 @@
 from django.contrib import admin
 
-from .models import AzureOrgProfile
+from .models import (
+    AzureEncodedAsset, AzureEncodeJob, AzureEncodeRequest, AzureOrgProfile, AzureUploadSession, AzureVideoTelemetry
+)
 
 
 class AzureOrgProfileAdmin(admin.ModelAdmin):
     list_display = ('organization', )
 
 
+class AzureUploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('edx_video_id', 'organization', 'blob_name', 'status', 'modified')
+    list_filter = ('status', )
+    search_fields = ('edx_video_id', 'asset_id')
+
+
+class AzureEncodedAssetAdmin(admin.ModelAdmin):
+    list_display = ('edx_video_id', 'organization', 'asset_id', 'created')
+    search_fields = ('edx_video_id', 'asset_id', 'fingerprint')
+
+
+class AzureEncodeJobAdmin(admin.ModelAdmin):
+    list_display = ('edx_video_id', 'organization', 'state', 'progress', 'queued', 'finished', 'processed')
+    list_filter = ('state', 'organization')
+    search_fields = ('edx_video_id', 'job_id')
+
+
+class AzureEncodeRequestAdmin(admin.ModelAdmin):
+    list_display = ('edx_video_id', 'organization', 'lane', 'created', 'submitted', 'job_id')
+    list_filter = ('organization', 'lane')
+    search_fields = ('edx_video_id', 'job_id')
+
+
+class AzureVideoTelemetryAdmin(admin.ModelAdmin):
+    list_display = ('edx_video_id', 'organization', 'preset', 'upload_url_issued', 'published')
+    list_filter = ('organization', 'preset')
+    search_fields = ('edx_video_id', )
+
+
 admin.site.register(AzureOrgProfile, AzureOrgProfileAdmin)
+admin.site.register(AzureUploadSession, AzureUploadSessionAdmin)
+admin.site.register(AzureEncodedAsset, AzureEncodedAssetAdmin)
+admin.site.register(AzureEncodeJob, AzureEncodeJobAdmin)
+admin.site.register(AzureEncodeRequest, AzureEncodeRequestAdmin)
+admin.site.register(AzureVideoTelemetry, AzureVideoTelemetryAdmin)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import atexit
+from multiprocessing.pool import ThreadPool
+import os
+import threading
+
+from django.conf import settings
+
+from .media_service import MediaServiceClient
+
+
+DEFAULT_WORKERS = 32
+DEFAULT_HOST_CONCURRENCY = 16
+
+# MediaServiceClient methods available in non-blocking flavour:
+ASYNC_METHODS = (
+    'get_locators_list', 'get_asset_locator', 'get_asset_files', 'get_input_asset_by_video_id',
+    'create_asset', 'create_asset_file', 'update_asset_file',
+    'create_access_policy', 'delete_access_policy', 'get_access_policy_id',
+    'create_locator', 'create_locators', 'create_pooled_locators', 'delete_locator',
+    'get_media_processor', 'create_job', 'get_job', 'get_output_media_asset',
+)
+
+_pools = {}
+_host_semaphores = {}
+_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Get process-wide worker pool shared by all asynchronous clients (size is `AZURE_ASYNC_WORKERS`).
+    """
+    pid = os.getpid()
+    pool = _pools.get(pid)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(pid)
+            if pool is None:
+                pool = _pools[pid] = ThreadPool(settings.FEATURES.get('AZURE_ASYNC_WORKERS', DEFAULT_WORKERS))
+    return pool
+
+
+@atexit.register
+def terminate_pools():
+    for pool in _pools.values():
+        pool.terminate()
+        pool.join()
+    _pools.clear()
+
+
+def get_host_semaphore(host):
+    """
+    Get semaphore limiting simultaneous requests to the host (limit is `AZURE_ASYNC_HOST_CONCURRENCY`).
+    """
+    key = (os.getpid(), host)
+    semaphore = _host_semaphores.get(key)
+    if semaphore is None:
+        with _lock:
+            semaphore = _host_semaphores.get(key)
+            if semaphore is None:
+                semaphore = _host_semaphores[key] = threading.BoundedSemaphore(
+                    settings.FEATURES.get('AZURE_ASYNC_HOST_CONCURRENCY', DEFAULT_HOST_CONCURRENCY)
+                )
+    return semaphore
+
+
+def gather(results, timeout=None):
+    """
+    Wait for all asynchronous results and return their values in the same order.
+
+    :param results: iterable of AsyncResult objects
+    :param timeout: seconds to wait for every single result
+    """
+    return [result.get(timeout) for result in results]
+
+
+class AsyncMediaServiceClient(object):
+    """
+    Non-blocking counterpart of MediaServiceClient for bulk operations.
+
+    Methods have the same signatures and return values as MediaServiceClient ones, but they return
+    `multiprocessing.pool.AsyncResult` at once (use `.get()` or `gather`). Calls run on a process-wide
+    bounded worker pool over the shared connection pool, so thousands of queued operations never spawn
+    more than `AZURE_ASYNC_WORKERS` threads nor exceed `AZURE_ASYNC_HOST_CONCURRENCY` requests per AMS host.
+    """
+
+    def __init__(self, azure_config=None, client=None):
+        """
+        Create an AsyncMediaServiceClient instance.
+
+        :param azure_config: (dict) initialization parameters
+        :param client: MediaServiceClient to wrap instead of creating a new one
+        """
+        self.client = client or MediaServiceClient(azure_config)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run any callable on the worker pool within the client's host concurrency limit.
+        """
+        semaphore = get_host_semaphore(self.client.host)
+
+        def call():
+            with semaphore:
+                return func(*args, **kwargs)
+
+        return get_pool().apply_async(call)
+
+    def refresh_token(self):
+        """
+        Get AAD access token in background, e.g. to warm up the token cache before a bulk run.
+        """
+        return get_pool().apply_async(lambda: self.client.credentials.token)
+
+
+def _make_async_method(name):
+    def method(self, *args, **kwargs):
+        return self.submit(getattr(self.client, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = 'Asynchronous `MediaServiceClient.{}`.'.format(name)
+    return method
+
+
+for _method_name in ASYNC_METHODS:
+    setattr(AsyncMediaServiceClient, _method_name, _make_async_method(_method_name))
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import uuid
+
+from requests import HTTPError
+
+from .transport import IDEMPOTENT_METHODS
+
+
+CRLF = '\r\n'
+INNER_REQUEST_HEADERS = (
+    'Content-Type', 'Accept', 'DataServiceVersion', 'MaxDataServiceVersion', 'x-ms-version'
+)
+BOUNDARY_RE = re.compile(r'boundary=([^;\s]+)', re.I)
+HEADERS_END_RE = re.compile(r'\r?\n\r?\n')
+
+
+class BatchRequest(object):
+    """
+    Collect AMS entity operations and send them in one OData `$batch` request.
+
+    Operations are grouped into changesets: every changeset is applied atomically (fails as a whole) and
+    changesets are processed in the order they were added.
+    ref: https://docs.microsoft.com/en-us/rest/api/media/operations/batch
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.changesets = [[]]
+        self.operations_count = 0
+
+    def add(self, method, resource, data=None):
+        """
+        Queue entity operation into the current changeset.
+
+        :param method: HTTP method
+        :param resource: resource path relative to REST API endpoint, e.g. `Locators`
+        :param data: (dict) JSON payload
+        :return: operation index in `execute` results
+        """
+        self.changesets[-1].append((method, resource, data))
+        self.operations_count += 1
+        return self.operations_count - 1
+
+    def new_changeset(self):
+        """
+        Start new changeset, so following operations don't share failure with previous ones.
+        """
+        if self.changesets[-1]:
+            self.changesets.append([])
+
+    def execute(self, raise_for_status=True):
+        """
+        Send all queued operations.
+
+        :param raise_for_status: raise HTTPError for the first failed operation
+        :return: list of operations results (JSON response, None for empty one or HTTPError if failed)
+        """
+        if not self.operations_count:
+            return []
+
+        boundary = 'batch_{}'.format(uuid.uuid4())
+        # batches of idempotent operations only (e.g. MERGE, DELETE) are safe to be retried as a whole:
+        idempotent = all(
+            method.upper() in IDEMPOTENT_METHODS for operations in self.changesets for method, _, _ in operations
+        )
+        headers = self.client.get_headers()
+        headers.update({
+            'Content-Type': 'multipart/mixed; boundary={}'.format(boundary),
+            'Accept': 'multipart/mixed',
+        })
+        response = self.client.session.post(
+            '{}$batch'.format(self.client.rest_api_endpoint),
+            headers=headers,
+            data=self.build_body(boundary, headers=self.client.get_headers()),
+            dedupe_key=boundary if idempotent else None,
+        )
+        if response.status_code not in (200, 202):
+            response.raise_for_status()
+
+        results = []
+        changesets_responses = parse_batch_response(response.headers.get('Content-Type', ''), response.text)
+        for operations, responses in zip(self.changesets, changesets_responses):
+            if len(responses) != len(operations):
+                # failed changeset is answered with a single error response for all of its operations:
+                responses = responses[:1] * len(operations)
+            results.extend(responses)
+        if len(results) != self.operations_count:
+            raise HTTPError('Unexpected $batch response: {} of {} operations answered.'.format(
+                len(results), self.operations_count
+            ))
+        if raise_for_status:
+            for result in results:
+                if isinstance(result, HTTPError):
+                    raise result
+        return results
+
+    def build_body(self, boundary, headers):
+        inner_headers = u''.join(
+            u'{}: {}{}'.format(name, headers[name], CRLF) for name in INNER_REQUEST_HEADERS if name in headers
+        )
+        lines = []
+        content_id = 0
+        for operations in self.changesets:
+            changeset_boundary = 'changeset_{}'.format(uuid.uuid4())
+            lines += [
+                u'--{}'.format(boundary),
+                u'Content-Type: multipart/mixed; boundary={}'.format(changeset_boundary),
+                u'',
+            ]
+            for method, resource, data in operations:
+                content_id += 1
+                lines += [
+                    u'--{}'.format(changeset_boundary),
+                    u'Content-Type: application/http',
+                    u'Content-Transfer-Encoding: binary',
+                    u'Content-ID: {}'.format(content_id),
+                    u'',
+                    u'{} {}{} HTTP/1.1'.format(method, self.client.rest_api_endpoint, resource),
+                    inner_headers,
+                    json.dumps(data) if data is not None else u'',
+                ]
+            lines.append(u'--{}--'.format(changeset_boundary))
+        lines.append(u'--{}--'.format(boundary))
+        return CRLF.join(lines).encode('utf-8')
+
+
+def split_headers(text):
+    """
+    Split MIME part (or HTTP message) into headers dict and body.
+    """
+    parts = HEADERS_END_RE.split(text, 1)
+    head, body = parts if len(parts) == 2 else (parts[0], '')
+    headers = {}
+    for line in head.splitlines():
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers, body
+
+
+def split_multipart(content_type, body):
+    boundary = BOUNDARY_RE.search(content_type)
+    if not boundary:
+        return []
+    delimiter = '--{}'.format(boundary.group(1).strip('"'))
+    parts = []
+    for chunk in body.split(delimiter)[1:]:
+        if chunk.startswith('--'):
+            break
+        parts.append(chunk.strip('\r\n'))
+    return parts
+
+
+def parse_operation_response(part):
+    """
+    Parse single operation response part into (Content-ID, result) pair.
+    """
+    part_headers, message = split_headers(part)
+    status_line, _, message = message.partition('\n')
+    headers, body = split_headers(message)
+    content_id = part_headers.get('content-id') or headers.get('content-id')
+    body = body.strip()
+    if int(status_line.split()[1]) >= 400:
+        result = HTTPError('{} Response: {}'.format(status_line.strip(), body))
+    else:
+        result = json.loads(body) if body else None
+    return int(content_id) if content_id else 0, result
+
+
+def parse_batch_response(content_type, body):
+    """
+    Parse `$batch` response into lists of operations results (ordered by Content-ID), one per changeset.
+    """
+    changesets = []
+    for part in split_multipart(content_type, body):
+        part_headers, content = split_headers(part)
+        part_type = part_headers.get('content-type', '')
+        if part_type.startswith('multipart/mixed'):
+            responses = [parse_operation_response(response) for response in split_multipart(part_type, content)]
+        else:
+            responses = [parse_operation_response(part)]
+        changesets.append([result for _, result in sorted(responses, key=lambda response: response[0])])
+    return changesets
@@ -1,21 +1,101 @@
+import base64
 from datetime import datetime, timedelta
+import hashlib
+import itertools
+import logging
+import mmap
+from multiprocessing.pool import ThreadPool
+import os
+import re
+import threading
 
-from azure.storage import AccessPolicy, CloudStorageAccount, SharedAccessPolicy
-from azure.storage.blob import BlobSharedAccessPermissions
+from azure.common import AzureMissingResourceHttpError
+from azure.storage import AccessPolicy, SharedAccessPolicy
+from azure.storage.blob import BlobService, BlobSharedAccessPermissions
+from azure.storage.constants import BLOB_SERVICE_HOST_BASE
+from django.conf import settings
+from django.utils.six.moves import range
+
+from .sas import get_sas_signer
+from .transport import get_session
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Put Block API (2014-02-14) accepts blocks up to 4 MB:
+MAX_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 4
+# all block IDs of a blob must have the same length:
+BLOCK_ID_FORMAT = 'block-{:08d}'
+
+
+BLOCK_ID_RE = re.compile(r'^block-(\d{8})$')
+
+
+def get_block_id(index):
+    return BLOCK_ID_FORMAT.format(index)
+
+
+def get_block_index(block_id):
+    match = BLOCK_ID_RE.match(block_id or '')
+    return int(match.group(1)) if match else None
+
+
+def get_content_md5(data):
+    return base64.b64encode(hashlib.md5(data).digest())
+
+
+def iter_file_blocks(uploaded_file, block_size):
+    """
+    Read Django UploadedFile block by block; files stored on disk are memory-mapped instead.
+    """
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        with open(uploaded_file.temporary_file_path(), 'rb') as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if not size:
+                return
+            mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset in range(0, size, block_size):
+                    yield mapped[offset:offset + block_size]
+            finally:
+                mapped.close()
+        return
+
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(block_size), b''):
+        yield block
 
 
 class BlobServiceClient(object):
 
     def __init__(self, account_name, account_key):
-        storage_client = CloudStorageAccount(account_name, account_key)
-        self.blob_service = storage_client.create_blob_service()
+        self.account_name = account_name
+        self.account_key = account_key
+        self._blob_service = None
 
-    def generate_url(self, asset_id, blob_name, expires_in):
-        sas_policy = self.get_shared_access_policy(BlobSharedAccessPermissions.WRITE, expires_in)
+    @property
+    def blob_service(self):
+        if self._blob_service is None:
+            self._blob_service = BlobService(
+                self.account_name,
+                self.account_key,
+                request_session=get_session('https://{}{}'.format(self.account_name, BLOB_SERVICE_HOST_BASE)),
+            )
+        return self._blob_service
+
+    @blob_service.setter
+    def blob_service(self, blob_service):
+        self._blob_service = blob_service
+
+    def generate_url(self, asset_id, blob_name, expires_in, permission=BlobSharedAccessPermissions.WRITE):
+        """
+        Get SAS URL of the Asset's blob signed locally (see `sas.SasSigner`).
+        """
         container_name = 'asset-{}'.format(asset_id.split(':')[-1])
-        sas_token = self.blob_service.generate_shared_access_signature(container_name, blob_name, sas_policy)
-        sas_url = self.blob_service.make_blob_url(container_name, blob_name, sas_token=sas_token)
-        return sas_url
+        return get_sas_signer(self.account_name, self.account_key).make_blob_url(
+            container_name, blob_name, permission, expires_in
+        )
 
     def get_shared_access_policy(self, permission, expires_in):
         date_format = "%Y-%m-%dT%H:%M:%SZ"
@@ -28,3 +108,127 @@ class BlobServiceClient(object):
                 permission,
             )
         )
+
+    def upload_file(self, container_name, blob_name, uploaded_file, block_size=None, workers=None):
+        """
+        Upload Django UploadedFile as block blob sending its blocks in parallel.
+
+        Blocks are read (memory-mapped for files on disk) no further than `workers` blocks ahead of uploading,
+        so peak memory is O(block_size * workers). Blob's Content-MD5 is computed as the file is read, every
+        block is sent with its own Content-MD5 and retried separately. Single-block files take one request.
+        :param block_size: bytes per block (`AZURE_UPLOAD_BLOCK_SIZE`, 4 MB at most)
+        :param workers: number of blocks uploaded simultaneously (`AZURE_UPLOAD_WORKERS`)
+        :return: list of committed block IDs (empty for single-request upload)
+        """
+        features = settings.FEATURES
+        block_size = min(block_size or features.get('AZURE_UPLOAD_BLOCK_SIZE', MAX_BLOCK_SIZE), MAX_BLOCK_SIZE)
+        workers = workers or features.get('AZURE_UPLOAD_WORKERS', DEFAULT_UPLOAD_WORKERS)
+        content_type = getattr(uploaded_file, 'content_type', None)
+        blocks = iter_file_blocks(uploaded_file, block_size)
+
+        first_block = next(blocks, b'')
+        if len(first_block) < block_size:
+            self.blob_service.put_blob(
+                container_name, blob_name, first_block, 'BlockBlob',
+                content_md5=get_content_md5(first_block),
+                x_ms_blob_content_type=content_type,
+                x_ms_blob_content_md5=get_content_md5(first_block),
+            )
+            return []
+
+        content_md5 = hashlib.md5()
+        slots = threading.BoundedSemaphore(workers)
+        errors = []
+        results = []
+
+        def upload(block, block_id):
+            try:
+                return self.put_block(container_name, blob_name, block, block_id)
+            except Exception as error:
+                errors.append(error)
+                raise
+            finally:
+                slots.release()
+
+        pool = ThreadPool(workers)
+        try:
+            for index, block in enumerate(itertools.chain([first_block], blocks)):
+                content_md5.update(block)
+                slots.acquire()
+                if errors:
+                    slots.release()
+                    break
+                results.append(pool.apply_async(upload, (block, get_block_id(index))))
+            block_ids = [result.get() for result in results]
+        finally:
+            blocks.close()
+            # blocks in flight are waited for, no upload goes on after the call returns:
+            pool.terminate()
+            pool.join()
+
+        self.commit_blocks(
+            container_name, blob_name, block_ids, content_type, base64.b64encode(content_md5.digest())
+        )
+        return block_ids
+
+    def commit_blocks(self, container_name, blob_name, block_ids, content_type=None, content_md5=None):
+        """
+        Make uploaded blocks the blob's content.
+        """
+        self.blob_service.put_block_list(
+            container_name, blob_name, block_ids,
+            x_ms_blob_content_type=content_type,
+            x_ms_blob_content_md5=content_md5,
+        )
+
+    def put_block(self, container_name, blob_name, block, block_id):
+        """
+        Upload single block; Put Block is idempotent, so failed attempts are retried by the transport session.
+        """
+        self.blob_service.put_block(container_name, blob_name, block, block_id, content_md5=get_content_md5(block))
+        return block_id
+
+    def get_block_sizes(self, container_name, blob_name):
+        """
+        Get sizes of committed and uncommitted blocks of the blob by their indexes (see `get_block_id`).
+        """
+        try:
+            block_list = self.blob_service.get_block_list(container_name, blob_name, blocklisttype='all')
+        except AzureMissingResourceHttpError:
+            return {}
+        block_sizes = {}
+        for block in block_list.committed_blocks + block_list.uncommitted_blocks:
+            index = get_block_index(block.id)
+            if index is not None:
+                block_sizes[index] = int(block.size)
+        return block_sizes
+
+    def get_content_md5(self, container_name, blob_name, max_size=None):
+        """
+        Get base64 Content-MD5 and size of the blob.
+
+        Content-MD5 stored with the blob (by Put Blob or on blocks commit) is used when there is one, otherwise
+        the blob is read in `MAX_BLOCK_SIZE` ranges and hashed - unless it is larger than `max_size` bytes.
+        :return: (content_md5, size) pair, `content_md5` is None if the blob is too large to be hashed
+        """
+        properties = self.blob_service.get_blob_properties(container_name, blob_name)
+        size = int(properties['content-length'])
+        content_md5 = properties.get('content-md5')
+        if content_md5 or (max_size is not None and size > max_size):
+            return content_md5 or None, size
+
+        md5 = hashlib.md5()
+        for start in range(0, size, MAX_BLOCK_SIZE):
+            md5.update(self.blob_service.get_blob(
+                container_name, blob_name, x_ms_range='bytes={}-{}'.format(start, min(start + MAX_BLOCK_SIZE, size) - 1)
+            ))
+        return base64.b64encode(md5.digest()), size
+
+    def get_blob_size(self, container_name, blob_name):
+        return int(self.blob_service.get_blob_properties(container_name, blob_name)['content-length'])
+
+    def get_blob_range(self, container_name, blob_name, start, end):
+        """
+        Read bytes `start`-`end` (inclusive) of the blob.
+        """
+        return self.blob_service.get_blob(container_name, blob_name, x_ms_range='bytes={}-{}'.format(start, end))
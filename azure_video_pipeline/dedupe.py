@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import logging
+
+from azure.common import AzureHttpError
+from django.conf import settings
+from requests import HTTPError
+
+from .blobs_service import BlobServiceClient
+from .media_service import AccessPolicyPermissions, LocatorTypes, PUBLISHED_ACCESS_POLICY_DURATION
+from .models import AzureEncodedAsset
+
+
+LOGGER = logging.getLogger(__name__)
+
+FINGERPRINT_FORMAT = u'{}-{}'
+# uploads without stored Content-MD5 are read and hashed only if they are not larger than this:
+DEFAULT_MAX_HASH_SIZE = 2 * 1024 * 1024 * 1024
+PUBLISHED_LOCATOR_TYPES = (LocatorTypes.OnDemandOrigin, LocatorTypes.SAS)
+
+
+def get_asset_fingerprint(media_service_client, input_asset_id):
+    """
+    Get fingerprint (MD5 and size) of the uploaded video file of the input Asset.
+
+    Content-MD5 stored with the blob is used when there is one, so the file is read (and hashed) only if the
+    client committed its blocks without it.
+    :return: fingerprint string or None if it can't be computed (or `AZURE_DEDUPE_ENABLED` is off)
+    """
+    features = settings.FEATURES
+    if not features.get('AZURE_DEDUPE_ENABLED', True):
+        return None
+    asset_files = media_service_client.get_asset_files(input_asset_id)
+    if len(asset_files) != 1:
+        return None
+
+    blob_service_client = BlobServiceClient(media_service_client.storage_account_name, media_service_client.storage_key)
+    try:
+        content_md5, size = blob_service_client.get_content_md5(
+            'asset-{}'.format(input_asset_id.split(':')[-1]),
+            asset_files[0]['Name'],
+            max_size=features.get('AZURE_DEDUPE_MAX_HASH_SIZE', DEFAULT_MAX_HASH_SIZE),
+        )
+    except AzureHttpError:
+        LOGGER.warning('Could not fingerprint uploaded file of Asset [%s].', input_asset_id, exc_info=True)
+        return None
+    if content_md5 is None:
+        return None
+    return FINGERPRINT_FORMAT.format(binascii.hexlify(base64.b64decode(content_md5)), size)
+
+
+def get_fingerprint_size(fingerprint):
+    """
+    Get size of the uploaded file from its fingerprint, None if there is no fingerprint.
+    """
+    if not fingerprint:
+        return None
+    return int(fingerprint.rsplit('-', 1)[-1])
+
+
+def register_encoded_asset(organization, edx_video_id, asset_id, fingerprint):
+    encoded_asset, _ = AzureEncodedAsset.objects.update_or_create(
+        edx_video_id=edx_video_id,
+        defaults={'organization': organization or '', 'asset_id': asset_id, 'fingerprint': fingerprint},
+    )
+    return encoded_asset
+
+
+def find_encoded_asset(organization, fingerprint):
+    return AzureEncodedAsset.objects.filter(
+        organization=organization or '', fingerprint=fingerprint
+    ).order_by('created').first()
+
+
+def reuse_encoded_asset(media_service_client, organization, edx_video_id, fingerprint):
+    """
+    Publish the video with the already encoded Asset of the same content, instead of encoding it again.
+
+    Published Locators of the Asset are created if some of them are missing. Assets no longer found on Azure are
+    forgotten; if the Asset can't be checked for other reasons (e.g. throttling or an outage) the video is
+    encoded as usual and the Asset is kept for videos published with it.
+    :return: reused AzureEncodedAsset or None if there is no Asset to reuse
+    """
+    encoded_asset = find_encoded_asset(organization, fingerprint)
+    if encoded_asset is None:
+        return None
+
+    asset_id = encoded_asset.asset_id
+    try:
+        missing_locator_types = [
+            locator_type for locator_type in PUBLISHED_LOCATOR_TYPES
+            if media_service_client.get_asset_locator(asset_id, locator_type) is None
+        ]
+        if missing_locator_types:
+            media_service_client.create_pooled_locators(
+                asset_id,
+                locator_types=missing_locator_types,
+                duration_in_minutes=PUBLISHED_ACCESS_POLICY_DURATION,
+                permissions=AccessPolicyPermissions.READ
+            )
+    except HTTPError as error:
+        if error.response is not None and error.response.status_code == 404:
+            LOGGER.warning('Encoded Asset [%s] is not available anymore, it is not reused.', asset_id)
+            AzureEncodedAsset.objects.filter(asset_id=asset_id).delete()
+        else:
+            LOGGER.warning('Could not check encoded Asset [%s], it is not reused.', asset_id, exc_info=True)
+        return None
+
+    LOGGER.info('Video [%s] is published with encoded Asset [%s] of the same content.', edx_video_id, asset_id)
+    register_encoded_asset(organization, edx_video_id, asset_id, fingerprint)
+    return encoded_asset
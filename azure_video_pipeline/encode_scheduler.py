@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+from collections import Counter, defaultdict, deque, OrderedDict
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min
+from django.utils import timezone
+from requests import RequestException
+
+from .job_poller import FINAL_STATES, get_tracked_jobs
+from .models import AzureEncodeRequest
+
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEDULER_SCHEDULED_KEY = 'azure_video_pipeline.encode_scheduler_scheduled'
+SCHEDULER_LOCK_KEY = 'azure_video_pipeline.encode_scheduler_lock'
+SCHEDULER_LOCK_TIMEOUT = 5 * 60
+RESERVED_UNITS_CACHE_KEY = 'azure_video_pipeline.reserved_units.{}'
+RESERVED_UNITS_CACHE_TTL = 10 * 60
+DEFAULT_SUBMIT_INTERVAL = 10
+# uploads up to that many bytes are submitted through the priority lane:
+DEFAULT_PRIORITY_MAX_SIZE = 200 * 1024 * 1024
+
+_metrics = Counter()
+_lock = threading.Lock()
+
+
+def get_submit_interval():
+    return settings.FEATURES.get('AZURE_ENCODE_SUBMIT_INTERVAL', DEFAULT_SUBMIT_INTERVAL)
+
+
+def get_weight(organization):
+    return settings.FEATURES.get('AZURE_ENCODE_ORG_WEIGHTS', {}).get(organization, 1)
+
+
+def get_lane(input_size):
+    """
+    Get lane of the upload: short videos (small uploads) are submitted first.
+    """
+    max_size = settings.FEATURES.get('AZURE_ENCODE_PRIORITY_MAX_SIZE', DEFAULT_PRIORITY_MAX_SIZE)
+    if input_size and input_size <= max_size:
+        return AzureEncodeRequest.PRIORITY
+    return AzureEncodeRequest.NORMAL
+
+
+def enqueue_encode(organization, edx_video_id, input_asset_id, fingerprint=None, preset='', input_size=None):
+    """
+    Queue encoding of the uploaded video, its Job is submitted by `submit_pending_encodes`.
+
+    :return: AzureEncodeRequest
+    """
+    encode_request, _ = AzureEncodeRequest.objects.update_or_create(edx_video_id=edx_video_id, defaults={
+        'organization': organization or '',
+        'input_asset_id': input_asset_id,
+        'fingerprint': fingerprint or '',
+        'preset': preset,
+        'input_size': input_size,
+        'lane': get_lane(input_size),
+        'created': timezone.now(),
+        'submitted': None,
+        'job_id': '',
+    })
+    return encode_request
+
+
+def get_pending_requests():
+    return AzureEncodeRequest.objects.filter(submitted__isnull=True)
+
+
+def get_pending_queues():
+    """
+    Get pending requests by Organization, each queue ordered by lane and age.
+    """
+    queues = OrderedDict()
+    for encode_request in get_pending_requests().order_by('lane', 'created', 'pk'):
+        queues.setdefault(encode_request.organization, deque()).append(encode_request)
+    return queues
+
+
+def get_running_jobs():
+    """
+    Get number of submitted Jobs which are not finished yet by Organization.
+    """
+    jobs = get_tracked_jobs().exclude(state__in=FINAL_STATES).values('organization').annotate(count=Count('pk'))
+    return Counter({job['organization']: job['count'] for job in jobs})
+
+
+def get_account_concurrency(media_service_client):
+    """
+    Get number of Jobs the Media Services account is to process concurrently: its encoding Reserved Units.
+
+    `AZURE_ENCODE_ACCOUNT_CONCURRENCY` overrides the number looked up on Azure (cached for
+    `RESERVED_UNITS_CACHE_TTL` seconds).
+    """
+    concurrency = settings.FEATURES.get('AZURE_ENCODE_ACCOUNT_CONCURRENCY')
+    if concurrency:
+        return concurrency
+    key = RESERVED_UNITS_CACHE_KEY.format(
+        hashlib.md5(media_service_client.rest_api_endpoint.encode('utf-8')).hexdigest()
+    )
+    reserved_units = cache.get(key)
+    if reserved_units is None:
+        try:
+            reserved_units = media_service_client.get_encoding_reserved_units()
+        except (RequestException, ValueError):
+            LOGGER.warning('Could not look up encoding Reserved Units, one Job is submitted at a time.', exc_info=True)
+            return 1
+        cache.set(key, reserved_units, RESERVED_UNITS_CACHE_TTL)
+    # accounts without Reserved Units still process one Task at a time:
+    return max(reserved_units, 1)
+
+
+def pick_organization(queues, running, account_running, accounts, account_caps):
+    """
+    Pick Organization whose request is submitted next, None if all of them are at their caps.
+
+    Weighted fair queuing: the Organization with the smallest weighted share of running Jobs goes first, ties
+    are broken by the lane and the age of its next request.
+    """
+    org_cap = settings.FEATURES.get('AZURE_ENCODE_ORG_CONCURRENCY')
+    candidates = [
+        organization for organization, queue in queues.items() if queue and (
+            (not org_cap or running[organization] < org_cap) and
+            account_running[accounts[organization]] < account_caps[accounts[organization]]
+        )
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda organization: (
+        running[organization] / float(get_weight(organization)),
+        queues[organization][0].lane,
+        queues[organization][0].created,
+    ))
+
+
+def record_submission(encode_request, job_id):
+    encode_request.submitted = timezone.now()
+    encode_request.job_id = job_id
+    AzureEncodeRequest.objects.filter(pk=encode_request.pk).update(
+        submitted=encode_request.submitted, job_id=encode_request.job_id
+    )
+    LOGGER.info('Encode of video [%s] submitted after %.0f seconds in queue [organization:%s].',
+                encode_request.edx_video_id, encode_request.wait, encode_request.organization)
+    with _lock:
+        _metrics[('submitted', encode_request.organization)] += 1
+        _metrics[('wait_seconds', encode_request.organization)] += encode_request.wait
+
+
+def discard_request(encode_request):
+    """
+    Drop request whose Job can't be created (e.g. rejected by AMS), its video is failed by `submit`.
+    """
+    AzureEncodeRequest.objects.filter(pk=encode_request.pk).delete()
+    LOGGER.warning('Encode of video [%s] is not submitted, its Job could not be created [organization:%s].',
+                   encode_request.edx_video_id, encode_request.organization)
+    with _lock:
+        _metrics[('failed', encode_request.organization)] += 1
+
+
+def run_scheduler(get_client, submit):
+    queues = get_pending_queues()
+    if not queues:
+        return 0
+    running = get_running_jobs()
+    clients = {organization: get_client(organization) for organization in set(queues) | set(running)}
+    accounts = {organization: client.rest_api_endpoint for organization, client in clients.items()}
+    account_caps = {accounts[organization]: get_account_concurrency(clients[organization]) for organization in queues}
+    account_running = Counter()
+    for organization, count in running.items():
+        account_running[accounts[organization]] += count
+
+    submitted = 0
+    while True:
+        organization = pick_organization(queues, running, account_running, accounts, account_caps)
+        if organization is None:
+            return submitted
+        encode_request = queues[organization].popleft()
+        try:
+            job_id = submit(clients[organization], encode_request)
+        except RequestException:
+            LOGGER.exception('Could not submit encode Job, retrying later [organization:%s].', organization)
+            del queues[organization]
+            continue
+        if not job_id:
+            discard_request(encode_request)
+            continue
+        record_submission(encode_request, job_id)
+        running[organization] += 1
+        account_running[accounts[organization]] += 1
+        submitted += 1
+
+
+def submit_pending_encodes(get_client, submit):
+    """
+    Submit encode Jobs of pending requests within concurrency caps, fairly across Organizations.
+
+    Organizations sharing a Media Services account get no more than its encoding Reserved Units of running
+    Jobs in total and each of them `AZURE_ENCODE_ORG_CONCURRENCY` at most, so a bulk upload of one
+    Organization doesn't hold up the others. A single scheduler runs at a time.
+    :param get_client: callable returning MediaServiceClient for Organization short name
+    :param submit: callable `(media_service_client, encode_request)` creating the Job, returns its ID
+        (None if the Job can't be created); requests failed with RequestException stay pending
+    :return: number of submitted Jobs
+    """
+    if not cache.add(SCHEDULER_LOCK_KEY, True, SCHEDULER_LOCK_TIMEOUT):
+        return 0
+    try:
+        return run_scheduler(get_client, submit)
+    finally:
+        cache.delete(SCHEDULER_LOCK_KEY)
+
+
+def get_queue_stats():
+    """
+    Get encode queue state by Organization.
+
+    :return: `{organization: {'pending': count, 'wait': seconds the oldest pending request waits, 'running': count}}`
+    """
+    now = timezone.now()
+    stats = defaultdict(lambda: {'pending': 0, 'wait': 0, 'running': 0})
+    pending = get_pending_requests().values('organization').annotate(pending=Count('pk'), oldest=Min('created'))
+    for row in pending:
+        stats[row['organization']].update(pending=row['pending'], wait=(now - row['oldest']).total_seconds())
+    for organization, count in get_running_jobs().items():
+        stats[organization]['running'] = count
+    return dict(stats)
+
+
+def get_metrics():
+    """
+    Get encode scheduler counters of the current process.
+
+    :return: dict of `{(name, organization): value}`, names are `submitted`, `wait_seconds` (total) and
+        `failed`
+    """
+    with _lock:
+        return dict(_metrics)
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import json
+import logging
+import threading
+
+from azure.common import AzureHttpError
+from azure.storage.queue import QueueService
+from django.conf import settings
+from django.utils.six.moves import range
+from requests import RequestException
+
+from .job_poller import get_tracked_jobs, update_job_states
+from .media_service import JobStatus
+from .transport import get_session
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONSUMER_SCHEDULED_KEY = 'azure_video_pipeline.job_notifications_consumer_scheduled'
+QUEUE_SERVICE_URL = 'https://{}.queue.core.windows.net'
+# Get Messages API returns 32 messages at most:
+MAX_MESSAGES_BATCH = 32
+MESSAGE_VISIBILITY_TIMEOUT = 60
+DEFAULT_CONSUME_INTERVAL = 5
+DEFAULT_MAX_BATCHES = 10
+# state names used by AMS `JobStateChange` notifications:
+JOB_STATES = {
+    'Queued': JobStatus.QUEUED,
+    'Scheduled': JobStatus.SCHEDULED,
+    'Processing': JobStatus.PROCESSING,
+    'Finished': JobStatus.FINISHED,
+    'Error': JobStatus.ERROR,
+    'Canceled': JobStatus.CANCELED,
+    'Canceling': JobStatus.CANCELING,
+}
+
+_created_queues = set()
+_lock = threading.Lock()
+
+
+def get_queue_name():
+    """
+    Get name of the storage queue AMS notifies of Job final states, None if notifications are off.
+    """
+    return settings.FEATURES.get('AZURE_JOB_NOTIFICATIONS_QUEUE')
+
+
+def get_consume_interval():
+    return settings.FEATURES.get('AZURE_JOB_NOTIFICATIONS_INTERVAL', DEFAULT_CONSUME_INTERVAL)
+
+
+def get_queue_service(media_service_client):
+    return QueueService(
+        media_service_client.storage_account_name,
+        media_service_client.storage_key,
+        request_session=get_session(QUEUE_SERVICE_URL.format(media_service_client.storage_account_name)),
+    )
+
+
+def ensure_queue(media_service_client, queue_name):
+    key = (media_service_client.storage_account_name, queue_name)
+    if key not in _created_queues:
+        get_queue_service(media_service_client).create_queue(queue_name)
+        with _lock:
+            _created_queues.add(key)
+
+
+def get_notification_endpoint_id(media_service_client):
+    """
+    Get ID of NotificationEndPoint new Jobs are to be subscribed to.
+
+    :return: endpoint ID or None if notifications are off or unavailable - Jobs are polled then
+    """
+    queue_name = get_queue_name()
+    if not queue_name:
+        return None
+    try:
+        ensure_queue(media_service_client, queue_name)
+        return media_service_client.get_notification_endpoint_id(queue_name)
+    except (AzureHttpError, RequestException):
+        LOGGER.warning('Job notifications queue [%s] is not available, Jobs are polled.', queue_name, exc_info=True)
+        return None
+
+
+def parse_notification(message_text):
+    """
+    Parse AMS notification message.
+
+    :return: (job_id, state) pair of `JobStateChange` notification, None for anything else
+    """
+    try:
+        message = json.loads(message_text)
+    except ValueError:
+        try:
+            message = json.loads(base64.b64decode(message_text))
+        except (binascii.Error, TypeError, ValueError):
+            return None
+    if not isinstance(message, dict) or message.get('EventType') != 'JobStateChange':
+        return None
+    properties = message.get('Properties') or {}
+    state = JOB_STATES.get(properties.get('NewState'))
+    if not properties.get('JobId') or state is None:
+        return None
+    return properties['JobId'], state
+
+
+def consume_notifications(queue_service, queue_name, dispatch, max_batches=None):
+    """
+    Drain notifications queue in batches, dispatching final states of tracked Jobs (see `job_poller.poll_jobs`).
+
+    Messages are deleted once their batch is dispatched; notifications of Jobs which are not tracked (e.g. already
+    processed after being polled) are dropped.
+    :return: number of consumed messages
+    """
+    max_batches = max_batches or settings.FEATURES.get('AZURE_JOB_NOTIFICATIONS_MAX_BATCHES', DEFAULT_MAX_BATCHES)
+    consumed = 0
+    for _ in range(max_batches):
+        messages = queue_service.get_messages(
+            queue_name, numofmessages=MAX_MESSAGES_BATCH, visibilitytimeout=MESSAGE_VISIBILITY_TIMEOUT
+        )
+        states = {}
+        for message in messages:
+            notification = parse_notification(message.message_text)
+            if notification is None:
+                LOGGER.warning('Unexpected message [%s] in Job notifications queue.', message.message_id)
+            else:
+                job_id, state = notification
+                states[job_id] = state
+
+        to_dispatch, _ = update_job_states(states)
+        for encode_job in to_dispatch:
+            dispatch(encode_job.job_id, encode_job.state, encode_job.organization, encode_job.fingerprint)
+        for message in messages:
+            queue_service.delete_message(queue_name, message.message_id, message.pop_receipt)
+
+        consumed += len(messages)
+        if len(messages) < MAX_MESSAGES_BATCH:
+            break
+    return consumed
+
+
+def consume_job_notifications(get_client, dispatch):
+    """
+    Drain notifications queues of storage accounts which have Jobs in flight.
+
+    :param get_client: callable returning MediaServiceClient for Organization short name
+    :param dispatch: callable `(job_id, state, organization, fingerprint)`, e.g. queueing a Celery task
+    :return: number of consumed messages
+    """
+    queue_name = get_queue_name()
+    if not queue_name:
+        return 0
+    consumed = 0
+    storage_accounts = set()
+    for organization in set(get_tracked_jobs().values_list('organization', flat=True)):
+        media_service_client = get_client(organization)
+        if media_service_client.storage_account_name in storage_accounts:
+            continue
+        storage_accounts.add(media_service_client.storage_account_name)
+        try:
+            consumed += consume_notifications(get_queue_service(media_service_client), queue_name, dispatch)
+        except (AzureHttpError, RequestException):
+            LOGGER.exception('Could not consume Job notifications [organization:%s].', organization)
+    return consumed
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from datetime import timedelta
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.six.moves import range
+from requests import RequestException
+
+from .job_schedule import get_next_poll
+from .media_service import JobStatus
+from .models import AzureEncodeJob
+
+
+LOGGER = logging.getLogger(__name__)
+
+POLLER_SCHEDULED_KEY = 'azure_video_pipeline.job_poller_scheduled'
+ENCODE_QUEUED_KEY = 'azure_video_pipeline.encode_queued.{}'
+# encoding of the video is queued again after that many seconds if its task is lost:
+ENCODE_QUEUED_TIMEOUT = 10 * 60
+# Jobs looked up by one query (keeps the number of SQL parameters within database limits):
+QUERY_CHUNK_SIZE = 500
+# Jobs poller runs that often; Azure is requested only for Jobs which are due (see `job_schedule`):
+DEFAULT_POLL_INTERVAL = 10
+DEFAULT_MAX_POLL_INTERVAL = 10 * 60
+# Jobs are polled rarely when their final states are pushed through notifications queue (see `job_notifications`):
+DEFAULT_FALLBACK_POLL_INTERVAL = 5 * 60
+# final state of the Job is dispatched again if it is still tracked after that many seconds (e.g. publishing failed):
+DEFAULT_DISPATCH_TIMEOUT = 10 * 60
+FINAL_STATES = (JobStatus.FINISHED, JobStatus.ERROR, JobStatus.CANCELED)
+
+
+def get_poll_interval():
+    features = settings.FEATURES
+    if features.get('AZURE_JOB_NOTIFICATIONS_QUEUE'):
+        return features.get('AZURE_JOB_FALLBACK_POLL_INTERVAL', DEFAULT_FALLBACK_POLL_INTERVAL)
+    return features.get('AZURE_JOB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+
+
+def get_max_poll_interval():
+    return settings.FEATURES.get('AZURE_JOB_MAX_POLL_INTERVAL', DEFAULT_MAX_POLL_INTERVAL)
+
+
+def get_dispatch_timeout():
+    return settings.FEATURES.get('AZURE_JOB_DISPATCH_TIMEOUT', DEFAULT_DISPATCH_TIMEOUT)
+
+
+def track_job(job_id, organization=None, fingerprint=None, edx_video_id='', input_asset_id='', preset='',
+              input_size=None):
+    """
+    Start tracking encode Job until its final state is processed.
+
+    :param organization: Organization short name
+    :param fingerprint: uploaded file fingerprint (see `dedupe`)
+    :param preset: encoding preset, Jobs are checked when encodes with it are expected to finish
+    :param input_size: size of the uploaded file
+    :return: AzureEncodeJob
+    """
+    defaults = {
+        'organization': organization or '', 'fingerprint': fingerprint or '', 'processed': None, 'next_poll': None,
+    }
+    # Jobs re-tracked by tasks queued by previous versions keep what is already known of them:
+    optional = {'edx_video_id': edx_video_id, 'input_asset_id': input_asset_id, 'preset': preset,
+                'input_size': input_size}
+    defaults.update((name, value) for name, value in optional.items() if value)
+    encode_job, _ = AzureEncodeJob.objects.update_or_create(job_id=job_id, defaults=defaults)
+    return encode_job
+
+
+def untrack_job(job_id, output_asset_id=None):
+    """
+    Mark Job's final state processed, so it isn't in flight anymore.
+    """
+    fields = {'processed': timezone.now()}
+    if output_asset_id:
+        fields['output_asset_id'] = output_asset_id
+    AzureEncodeJob.objects.filter(job_id=job_id).update(**fields)
+
+
+def get_tracked_jobs():
+    """
+    Get in-flight Jobs.
+    """
+    return AzureEncodeJob.objects.filter(processed__isnull=True)
+
+
+def acquire_schedule(key, interval):
+    """
+    Check whether the self-rescheduling task is to be scheduled: there is a single one for all in-flight Jobs.
+
+    The schedule mark expires, so the task is restarted by the next tracked Job if its chain breaks.
+    :param key: schedule mark cache key, e.g. `POLLER_SCHEDULED_KEY`
+    :param interval: seconds between task runs
+    """
+    return cache.add(key, True, interval * 4)
+
+
+def release_schedule(key):
+    cache.delete(key)
+
+
+def get_due_jobs(now):
+    """
+    Get in-flight Jobs which are to be checked.
+    """
+    return get_tracked_jobs().filter(Q(next_poll__isnull=True) | Q(next_poll__lte=now))
+
+
+def get_encode_queued_key(edx_video_id):
+    return ENCODE_QUEUED_KEY.format(hashlib.md5(edx_video_id.encode('utf-8')).hexdigest())
+
+
+def acquire_video_encoding(edx_video_id):
+    """
+    Check whether encoding of the video is to be queued: repeated Video saves queue a single task.
+    """
+    return cache.add(get_encode_queued_key(edx_video_id), True, ENCODE_QUEUED_TIMEOUT)
+
+
+def release_video_encoding(edx_video_id):
+    cache.delete(get_encode_queued_key(edx_video_id))
+
+
+def get_job_progress(job):
+    """
+    Get percent of the Job processed, as reported by its Tasks (None if they are not fetched).
+    """
+    tasks = job.get('Tasks') or []
+    if isinstance(tasks, dict):
+        tasks = tasks.get('results', [])
+    progress = [float(job_task['Progress']) for job_task in tasks if job_task.get('Progress') is not None]
+    if not progress:
+        return None
+    return sum(progress) / len(progress)
+
+
+def parse_job_time(value):
+    """
+    Parse Job's `StartTime`/`EndTime` (UTC), None if it isn't set yet.
+    """
+    value = value and parse_datetime(value)
+    if value is None or value.year <= 1:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    return value if settings.USE_TZ else timezone.make_naive(value)
+
+
+def get_job_details(job):
+    """
+    Get progress and processing start/end times of the Job as reported by AMS.
+    """
+    return {
+        'progress': get_job_progress(job),
+        'started': parse_job_time(job.get('StartTime')),
+        'finished': parse_job_time(job.get('EndTime')),
+    }
+
+
+def fetch_job_states(get_client, job_ids_by_organization):
+    """
+    Fetch states, progress and processing times of the Jobs, one bulk lookup per Organization.
+
+    :return: (`{job_id: state}`, `{job_id: details}`), state is None for Jobs which don't exist on Azure;
+        Jobs of Organizations whose lookup failed are left out; see `get_job_details`
+    """
+    states, details = {}, {}
+    for organization, job_ids in job_ids_by_organization.items():
+        try:
+            jobs = get_client(organization).get_jobs(
+                job_ids, select=['Id', 'State', 'StartTime', 'EndTime', 'Tasks/Progress'], expand=['Tasks']
+            )
+        except RequestException:
+            LOGGER.exception('Could not fetch states of in-flight Jobs [organization:%s].', organization)
+            continue
+        found = {job['Id']: int(job['State']) for job in jobs}
+        states.update((job_id, found.get(job_id)) for job_id in job_ids)
+        details.update((job['Id'], get_job_details(job)) for job in jobs)
+    return states, details
+
+
+def get_state_fields(encode_job, state, details, now):
+    """
+    Get AzureEncodeJob fields to be updated with the fetched state.
+
+    Processing start/end times reported by AMS are stored; Jobs whose state is pushed without them (see
+    `job_notifications`) get the time the state was observed at.
+    """
+    if state == encode_job.state:
+        fields = {'polls': encode_job.polls + 1}
+    else:
+        LOGGER.info('Job [%s] state changed [%s -> %s].', encode_job.job_id, encode_job.state, state)
+        fields = {'state': state, 'polls': 0}
+    started, finished = details.get('started'), details.get('finished')
+    if started is None and state == JobStatus.PROCESSING and encode_job.started is None:
+        started = now
+    if finished is None and state in FINAL_STATES and encode_job.finished is None:
+        finished = now
+    if started is not None and started != encode_job.started:
+        fields['started'] = started
+    if finished is not None and finished != encode_job.finished:
+        fields['finished'] = finished
+    if details.get('progress') is not None:
+        fields['progress'] = details['progress']
+    return fields
+
+
+def get_job_next_poll(encode_job, now):
+    if encode_job.state in FINAL_STATES:
+        # final state is checked again only if its processing is not done by then:
+        return now + timedelta(seconds=get_dispatch_timeout())
+    return get_next_poll(encode_job, now, get_poll_interval(), get_max_poll_interval())
+
+
+def claim_dispatch(encode_job, now):
+    """
+    Atomically mark Job's final state dispatched, unless it was dispatched recently by another process.
+    """
+    timeout = timedelta(seconds=get_dispatch_timeout())
+    return AzureEncodeJob.objects.filter(pk=encode_job.pk, processed__isnull=True).filter(
+        Q(dispatched__isnull=True) | Q(dispatched__lt=now - timeout)
+    ).update(dispatched=now) == 1
+
+
+def update_job_states(states, details=None):
+    """
+    Store fetched Job states, schedule next checks of the Jobs and pick Jobs whose final state is to be dispatched.
+
+    :param details: `{job_id: details}` of the Jobs which are fetched from AMS, see `get_job_details`
+    :return: (list of AzureEncodeJobs to dispatch, number of Jobs still in flight)
+    """
+    now = timezone.now()
+    details = details or {}
+    to_dispatch = []
+    job_ids = list(states)
+    for start in range(0, len(job_ids), QUERY_CHUNK_SIZE):
+        for encode_job in get_tracked_jobs().filter(job_id__in=job_ids[start:start + QUERY_CHUNK_SIZE]):
+            state = states[encode_job.job_id]
+            if state is None:
+                LOGGER.warning('Job [%s] is not found on Azure, it is not tracked anymore.', encode_job.job_id)
+                untrack_job(encode_job.job_id)
+                continue
+            fields = get_state_fields(encode_job, state, details.get(encode_job.job_id, {}), now)
+            for name, value in fields.items():
+                setattr(encode_job, name, value)
+            fields['next_poll'] = encode_job.next_poll = get_job_next_poll(encode_job, now)
+            AzureEncodeJob.objects.filter(pk=encode_job.pk).update(**fields)
+            if state in FINAL_STATES and claim_dispatch(encode_job, now):
+                to_dispatch.append(encode_job)
+    return to_dispatch, get_tracked_jobs().count()
+
+
+def poll_jobs(get_client, dispatch):
+    """
+    Fetch states of in-flight Jobs which are due in bulk and dispatch the ones which reached their final state.
+
+    Every Job is checked on its own schedule (see `job_schedule`), so the poller requests Azure only when some
+    Jobs are expected to have progressed. Jobs stay in flight until the dispatched processing calls `untrack_job`,
+    so failed processing is dispatched again after `AZURE_JOB_DISPATCH_TIMEOUT` seconds.
+    :param get_client: callable returning MediaServiceClient for Organization short name
+    :param dispatch: callable `(job_id, state, organization, fingerprint)`, e.g. queueing a Celery task
+    :return: number of Jobs still in flight
+    """
+    job_ids_by_organization = defaultdict(list)
+    for job_id, organization in get_due_jobs(timezone.now()).values_list('job_id', 'organization').iterator():
+        job_ids_by_organization[organization].append(job_id)
+
+    states, details = fetch_job_states(get_client, job_ids_by_organization)
+    to_dispatch, in_flight = update_job_states(states, details)
+    for encode_job in to_dispatch:
+        dispatch(encode_job.job_id, encode_job.state, encode_job.organization, encode_job.fingerprint)
+    return in_flight
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+import hashlib
+
+from django.core.cache import cache
+
+from .models import AzureEncodeJob
+
+
+ESTIMATE_CACHE_KEY = 'azure_video_pipeline.encode_duration.{}'
+ESTIMATE_CACHE_TTL = 10 * 60
+# estimates are medians of that many latest encode durations:
+HISTORY_SIZE = 20
+# Jobs expected to finish soon are checked a bit after the estimate, so the check most likely finds them finished:
+ESTIMATE_MARGIN = 1.1
+WAITING_STATES = (AzureEncodeJob.QUEUED, AzureEncodeJob.SCHEDULED)
+
+
+def get_size_range(input_size):
+    """
+    Get input size range `[2^n, 2^(n+1))` of similar uploads the encode durations are compared with.
+    """
+    if not input_size:
+        return None
+    low = 1 << (int(input_size).bit_length() - 1)
+    return low, low * 2
+
+
+def get_duration_history(organization, preset, size_range=None):
+    """
+    Get seconds of the latest encodes (from their start of processing) of the Organization with the preset.
+    """
+    encode_jobs = AzureEncodeJob.objects.filter(
+        organization=organization or '', preset=preset, state=AzureEncodeJob.FINISHED,
+        started__isnull=False, finished__isnull=False,
+    )
+    if size_range is not None:
+        encode_jobs = encode_jobs.filter(input_size__gte=size_range[0], input_size__lt=size_range[1])
+    return [
+        (finished - started).total_seconds()
+        for started, finished in encode_jobs.order_by('-finished').values_list('started', 'finished')[:HISTORY_SIZE]
+    ]
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def estimate_duration(organization, preset, input_size=None):
+    """
+    Estimate seconds the Job is processed for from encodes of similar uploads.
+
+    Encodes of uploads of the same size range are preferred, all encodes with the preset are used if there are
+    none yet. Estimates are cached for `ESTIMATE_CACHE_TTL` seconds.
+    :return: seconds or None if there is no history
+    """
+    size_range = get_size_range(input_size)
+    key = ESTIMATE_CACHE_KEY.format(
+        hashlib.md5(u'{}:{}:{}'.format(organization, preset, size_range).encode('utf-8')).hexdigest()
+    )
+    estimate = cache.get(key)
+    if estimate is None:
+        durations = size_range and get_duration_history(organization, preset, size_range)
+        durations = durations or get_duration_history(organization, preset)
+        # no history is cached too (as 0), so Jobs of new Organizations don't query it on every check:
+        estimate = median(durations) if durations else 0
+        cache.set(key, estimate, ESTIMATE_CACHE_TTL)
+    return estimate or None
+
+
+def get_remaining_time(encode_job, now):
+    """
+    Estimate seconds left until the processed Job finishes, from its reported progress or encodes history.
+
+    :return: seconds (negative if the Job is overdue) or None if nothing is known
+    """
+    if encode_job.started is None:
+        return None
+    elapsed = (now - encode_job.started).total_seconds()
+    if encode_job.progress:
+        return elapsed * (100 - encode_job.progress) / encode_job.progress
+    estimate = estimate_duration(encode_job.organization, encode_job.preset, encode_job.input_size)
+    if estimate is None:
+        return None
+    return estimate - elapsed
+
+
+def get_poll_delay(encode_job, now, min_interval, max_interval):
+    """
+    Get seconds until the Job is to be checked again.
+
+    Waiting (queued or scheduled) Jobs are checked with exponential back-off. Processed Jobs are checked
+    when they are expected to finish; overdue ones are checked again after half of the time they are overdue,
+    so a poor estimate costs a few checks only.
+    :param min_interval: seconds between checks of the Job at least (Jobs poller runs that often)
+    :param max_interval: seconds between checks of the Job at most
+    """
+    if encode_job.state in WAITING_STATES:
+        delay = min_interval * 2 ** min(encode_job.polls, 16)
+    else:
+        remaining = get_remaining_time(encode_job, now)
+        if remaining is None:
+            delay = min_interval
+        elif remaining > 0:
+            delay = remaining * ESTIMATE_MARGIN
+        else:
+            delay = -remaining / 2
+    return min(max(delay, min_interval), max(max_interval, min_interval))
+
+
+def get_next_poll(encode_job, now, min_interval, max_interval):
+    return now + timedelta(seconds=get_poll_delay(encode_job, now, min_interval, max_interval))
@@ -1,151 +1,326 @@
 import logging
-import time
 
+from celery.signals import worker_ready
 from celery.task import task
 from celery.utils.log import get_task_logger
 from courseware import courses
 from django.db import models
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from edxval.api import update_video_status
 from edxval.models import Video
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 from requests import RequestException
 
-from .media_service import AccessPolicyPermissions, LocatorTypes, MediaServiceClient
-from .utils import get_azure_config
+from .dedupe import get_asset_fingerprint, get_fingerprint_size, reuse_encoded_asset
+from .encode_scheduler import (
+    enqueue_encode, get_pending_requests, get_submit_interval, SCHEDULER_SCHEDULED_KEY, submit_pending_encodes
+)
+from .job_notifications import (
+    consume_job_notifications, CONSUMER_SCHEDULED_KEY, get_consume_interval, get_notification_endpoint_id,
+    get_queue_name as get_notification_queue_name
+)
+from .job_poller import (
+    acquire_schedule, acquire_video_encoding, FINAL_STATES, get_max_poll_interval, get_poll_interval, get_tracked_jobs,
+    poll_jobs, POLLER_SCHEDULED_KEY, release_schedule, release_video_encoding, track_job, untrack_job
+)
+from .media_service import DEFAULT_ENCODING_PRESET, JobStatus, MediaServiceClient
+from .presets import select_preset
+from .publishing import get_encode_job, publish_job, resolve_output_asset
+from .telemetry import get_video_duration, record_stage, record_stages
+from .transport import is_transient_error
+from .utils import get_media_service_client
 
 LOGGER = logging.getLogger(__name__)
 TASK_LOGGER = get_task_logger(__name__)
+# Jobs of monitoring tasks queued by previous versions are checked that often at least:
+LEGACY_POLL_INTERVAL = 30
 
 
-class JobStatus(object):
+@receiver(models.signals.post_save, sender=Video)
+def video_status_update_callback(sender, **kwargs):  # pylint: disable=unused-argument
     """
-    Azure Job entity status code enum.
+    Listen to video status updates and queue encoding of uploaded videos.
 
-    ref: https://docs.microsoft.com/en-us/rest/api/media/operations/job#list_jobs
+    Neither AMS nor the DB is called here (besides the cache), so Video saves don't wait for them; repeated
+    saves queue a single task. Upload completion time is recorded by the task.
     """
+    # process video after it is successfully uploaded:
+    if not kwargs['created']:
+        video = kwargs['instance']
+        if video.status == 'upload_completed' and acquire_video_encoding(video.edx_video_id):
+            encode_video_task.apply_async([video.edx_video_id], {'upload_completed': timezone.now().isoformat()})
 
-    QUEUED = 0
-    SCHEDULED = 1
-    PROCESSING = 2
-    FINISHED = 3
-    ERROR = 4
-    CANCELED = 5
-    CANCELING = 6
 
+def get_video_organization(video):
+    course_video = video.courses.first()
+    course_id = course_video.course_id
+    try:
+        course_key = CourseKey.from_string(course_id)
+        course = courses.get_course(course_key)
+        return course.org
+    except (InvalidKeyError, ValueError):
+        # need to update video status to 'failed' here:
+        update_video_status(video.edx_video_id, 'upload_failed')
+        LOGGER.exception("Couldn't recognize Organization Azure storage profile.")
 
-@receiver(models.signals.post_save, sender=Video)
-def video_status_update_callback(sender, **kwargs):  # pylint: disable=unused-argument
+
+@task()
+def encode_video_task(edx_video_id, upload_completed=None):
     """
-    Listen to video status updates and set processing job.
+    Look up uploaded video's input Asset and start its encoding.
+
+    The task is idempotent: videos which are being encoded already are skipped (see `encode_video`).
+    :param upload_completed: ISO 8601 time the upload was completed at (telemetry)
     """
-    # process video after it is successfully uploaded:
-    if not kwargs['created']:
-        video = kwargs['instance']
-        if video.status == 'upload_completed':
-            course_video = video.courses.first()
-            course_id = course_video.course_id
-            azure_config = {}
-            try:
-                course_key = CourseKey.from_string(course_id)
-                course = courses.get_course(course_key)
-                azure_config = get_azure_config(course.org)
-            except (InvalidKeyError, ValueError):
-                # need to update video status to 'failed' here:
-                update_video_status(video.edx_video_id, 'upload_failed')
-                LOGGER.exception("Couldn't recognize Organization Azure storage profile.")
-
-            ams_api = MediaServiceClient(azure_config)
-
-            # create AzureMS video encode Job:
-            video_status = 'transcode_failed'
-            try:
-                video_id = video.edx_video_id
-                asset_data = ams_api.get_input_asset_by_video_id(video_id)
-
-                input_asset_id = asset_data and asset_data[u'Id']
-                if input_asset_id:
-                    LOGGER.info('Creating video encode Job on Azure...')
-                    job_info = ams_api.create_job(input_asset_id, video_id)
-                    job_data = job_info['d']
-                    # Once Job is fired - update Edx video's status and start monitor the Job state:
-                    if u'Created' in job_data.keys():
-                        video_status = 'transcode_active'
-                        run_job_monitoring_task.apply_async([job_data['Id'], azure_config])
-            except RequestException:
-                LOGGER.exception("Something went wrong during AzureMS encode Job creation.")
-            except ValueError:
-                LOGGER.exception("Can't read AzureMS Job API response.")
-            finally:
-                update_video_status(video.edx_video_id, video_status)
+    try:
+        if upload_completed:
+            record_stages(edx_video_id, {'upload_completed': parse_datetime(upload_completed)})
+        video = Video.objects.get(edx_video_id=edx_video_id)
+        organization = get_video_organization(video)
+        ams_api = get_media_service_client(organization)
+
+        # create AzureMS video encode Job:
+        video_status = 'transcode_failed'
+        try:
+            asset_data = ams_api.get_input_asset_by_video_id(edx_video_id)
+
+            input_asset_id = asset_data and asset_data[u'Id']
+            if input_asset_id:
+                video_status = encode_video(ams_api, organization, edx_video_id, input_asset_id)
+        except RequestException:
+            LOGGER.exception("Something went wrong during AzureMS encode Job creation.")
+        except ValueError:
+            LOGGER.exception("Can't read AzureMS Job API response.")
+        finally:
+            # queued video's status is set before it is enqueued, its Job may be submitted by now:
+            if video_status != 'transcode_queue':
+                update_video_status(edx_video_id, video_status)
+        if video_status == 'transcode_queue':
+            schedule_encode_submission(countdown=0)
+    finally:
+        release_video_encoding(edx_video_id)
+
+
+def encode_video(ams_api, organization, video_id, input_asset_id):
+    """
+    Queue encoding of the uploaded video, unless the same content is already encoded.
+
+    Queued video's status is set here, before the scheduler may submit its Job and set `transcode_active`.
+    :return: Edx video status
+    """
+    if get_tracked_jobs().filter(edx_video_id=video_id).exists():
+        LOGGER.info('Video [%s] is being encoded already.', video_id)
+        return 'transcode_active'
+    if get_pending_requests().filter(edx_video_id=video_id).exists():
+        LOGGER.info('Video [%s] is queued for encoding already.', video_id)
+        return 'transcode_queue'
+
+    fingerprint = get_asset_fingerprint(ams_api, input_asset_id)
+    encoded_asset = fingerprint and reuse_encoded_asset(ams_api, organization, video_id, fingerprint)
+    if encoded_asset:
+        # the video has the same content as the one encoded already:
+        record_stage(
+            video_id, 'published', organization=organization,
+            video_duration=get_video_duration(encoded_asset.edx_video_id),
+        )
+        return 'file_complete'
+
+    preset, media_info = select_preset(ams_api, organization, input_asset_id)
+    input_size = get_fingerprint_size(fingerprint)
+    record_stages(
+        video_id, organization=organization, preset=preset, input_size=input_size,
+        video_duration=media_info and media_info.duration,
+    )
+    update_video_status(video_id, 'transcode_queue')
+    enqueue_encode(organization, video_id, input_asset_id, fingerprint, preset, input_size)
+    return 'transcode_queue'
+
+
+def submit_encode(ams_api, encode_request):
+    """
+    Create encode Job of the request picked by the scheduler and start monitoring it.
+
+    Transient errors (throttling, unavailable AMS) are raised, so the request stays pending and the video stays
+    queued until the scheduler retries it; the video is failed only if AMS rejects the Job.
+    :return: Job ID or None if the Job couldn't be created
+    """
+    video_id = encode_request.edx_video_id
+    job_id = None
+    LOGGER.info('Creating video encode Job on Azure...')
+    notification_endpoint_id = get_notification_endpoint_id(ams_api)
+    try:
+        job_info = ams_api.create_job(
+            encode_request.input_asset_id, video_id, notification_endpoint_id=notification_endpoint_id,
+            preset=encode_request.preset or DEFAULT_ENCODING_PRESET,
+        )
+        job_data = job_info['d']
+        if u'Created' in job_data.keys():
+            job_id = job_data['Id']
+    except RequestException as error:
+        if is_transient_error(error):
+            raise
+        LOGGER.exception("Something went wrong during AzureMS encode Job creation.")
+    except ValueError:
+        LOGGER.exception("Can't read AzureMS Job API response.")
+    if job_id is None:
+        update_video_status(video_id, 'transcode_failed')
+        return None
+
+    # Once Job is fired - update Edx video's status and start monitor the Job state:
+    track_job(
+        job_id, encode_request.organization, encode_request.fingerprint, edx_video_id=video_id,
+        input_asset_id=encode_request.input_asset_id, preset=encode_request.preset,
+        input_size=encode_request.input_size,
+    )
+    schedule_job_polling()
+    if notification_endpoint_id:
+        schedule_notifications_consuming()
+    record_stage(video_id, 'job_created')
+    update_video_status(video_id, 'transcode_active')
+    return job_id
 
 
 @task()
-def run_job_monitoring_task(job_id, azure_config):
+def run_job_monitoring_task(job_id, azure_config=None, organization=None, fingerprint=None, polls=0):
     """
-    Monitor completed Azure encode jobs.
+    Start monitoring Azure encode Job: it is tracked by the Jobs poller until its final state is processed.
 
-    Fetches all jobs, finds all completed, looks for relevant videos with `in progress` status and updates them.
     :param job_id: monitored Job ID
-    :param azure_config: Organization's Azure profile
+    :param azure_config: Organization's Azure profile (left for tasks queued by previous versions)
+    :param organization: Organization short name
+    :param fingerprint: uploaded file fingerprint the encoded Asset is registered with for reuse
+    :param polls: number of checks of the Job made by tasks queued by previous versions
     """
     TASK_LOGGER.info('Starting job monitoring [{}]'.format(job_id))
+    if azure_config is None:
+        track_job(job_id, organization, fingerprint)
+        schedule_job_polling()
+        return
+
+    # tasks queued by previous versions know the Azure profile only, so their Jobs are checked one by one, with
+    # back-off starting at the interval those versions used:
     ams_api = MediaServiceClient(azure_config)
+    state = int(ams_api.get_job(job_id)['State'])
+    if state in FINAL_STATES:
+        process_job_state(ams_api, job_id, state, organization, fingerprint)
+    else:
+        countdown = min(LEGACY_POLL_INTERVAL * 2 ** min(polls, 16), max(get_max_poll_interval(), LEGACY_POLL_INTERVAL))
+        run_job_monitoring_task.apply_async([job_id], {
+            'azure_config': azure_config, 'organization': organization, 'fingerprint': fingerprint, 'polls': polls + 1,
+        }, countdown=countdown)
+
+
+@worker_ready.connect
+def resume_job_monitoring(**kwargs):  # pylint: disable=unused-argument
+    """
+    Resume monitoring of Jobs which are in flight after workers restart.
+    """
+    if get_tracked_jobs().exists():
+        schedule_job_polling()
+        if get_notification_queue_name():
+            schedule_notifications_consuming()
+    if get_pending_requests().exists():
+        schedule_encode_submission()
 
-    def get_video_id_for_job(job_id, api_client):
-        output_media_asset = api_client.get_output_media_asset(job_id)
-        video_id = output_media_asset['Name'].split('::')[1]
-        return output_media_asset, video_id
-
-    while True:
-        job_info = ams_api.get_job(job_id)
-        state = job_info['State']
-        TASK_LOGGER.info('Got state[{}] for Job[{}]'.format(state, job_id))
-
-        if int(state) == JobStatus.FINISHED:
-            try:
-                output_media_asset, video_id = get_video_id_for_job(job_id, ams_api)
-                TASK_LOGGER.info('Starting output Asset publishing [video ID:{}]...'.format(video_id))
-
-                TASK_LOGGER.info('Creating AccessPolicy...')
-                policy_name = u'OpenEdxVideoPipelineAccessPolicy'
-                access_policy = ams_api.create_access_policy(
-                    policy_name,
-                    duration_in_minutes=60 * 24 * 365 * 10,
-                    permissions=AccessPolicyPermissions.READ
-                )
-                TASK_LOGGER.info('Creating streaming locator...')
-                ams_api.create_locator(
-                    access_policy['Id'],
-                    output_media_asset['Id'],
-                    locator_type=LocatorTypes.OnDemandOrigin
-                )
-                TASK_LOGGER.info('Creating progressive locator...')
-                ams_api.create_locator(
-                    access_policy['Id'],
-                    output_media_asset['Id'],
-                    locator_type=LocatorTypes.SAS
-                )
-                # Job is finished and processed asset is published:
-                update_video_status(video_id, 'file_complete')
-
-            except RequestException:
-                TASK_LOGGER.exception("Something went wrong during AzureMS completed Job processing.")
-            else:
-                break
-
-        if int(state) == JobStatus.ERROR:
-            TASK_LOGGER.error("AzureMS video processing Job failed.")
-
-        # Job canceled:
-        if int(state) > 4:
-            output_media_asset, video_id = get_video_id_for_job(job_id, ams_api)
+
+def schedule_job_polling():
+    interval = get_poll_interval()
+    if acquire_schedule(POLLER_SCHEDULED_KEY, interval):
+        poll_jobs_task.apply_async(countdown=interval)
+
+
+def schedule_notifications_consuming():
+    interval = get_consume_interval()
+    if acquire_schedule(CONSUMER_SCHEDULED_KEY, interval):
+        consume_job_notifications_task.apply_async(countdown=interval)
+
+
+def schedule_encode_submission(countdown=None):
+    interval = get_submit_interval()
+    if acquire_schedule(SCHEDULER_SCHEDULED_KEY, interval):
+        submit_encodes_task.apply_async(countdown=interval if countdown is None else countdown)
+
+
+def dispatch_job_state(job_id, state, organization, fingerprint):
+    process_job_state_task.apply_async([job_id, state], {'organization': organization, 'fingerprint': fingerprint})
+
+
+@task()
+def poll_jobs_task():
+    """
+    Fetch states of all in-flight encode Jobs in bulk and queue processing of finished ones.
+
+    The task re-schedules itself while there are Jobs in flight, so a single task monitors all of them. With Job
+    notifications on, it is a slow fallback for notifications which were lost.
+    """
+    in_flight = poll_jobs(get_media_service_client, dispatch_job_state)
+    TASK_LOGGER.info('Polled encode Jobs, {} in flight.'.format(in_flight))
+    release_schedule(POLLER_SCHEDULED_KEY)
+    # Jobs tracked while this poll was running couldn't schedule the poller:
+    if get_tracked_jobs().exists():
+        schedule_job_polling()
+
+
+@task()
+def consume_job_notifications_task():
+    """
+    Drain Job notifications queues and queue processing of Jobs AMS reported as finished.
+
+    The task re-schedules itself every `AZURE_JOB_NOTIFICATIONS_INTERVAL` seconds while there are Jobs in flight.
+    """
+    consumed = consume_job_notifications(get_media_service_client, dispatch_job_state)
+    TASK_LOGGER.info('Consumed {} Job notifications.'.format(consumed))
+    release_schedule(CONSUMER_SCHEDULED_KEY)
+    if get_tracked_jobs().exists():
+        schedule_notifications_consuming()
+
+
+@task()
+def process_job_state_task(job_id, state, organization=None, fingerprint=None):
+    process_job_state(get_media_service_client(organization), job_id, state, organization, fingerprint)
+
+
+def process_job_state(ams_api, job_id, state, organization=None, fingerprint=None):
+    """
+    Publish output Asset of finished Job or update video status of failed/canceled one.
+
+    The Job stops being tracked once its state is processed; on failure it is dispatched again and publishing
+    resumes from its last checkpoint (see `publishing.publish_job`).
+    """
+    try:
+        encode_job = get_encode_job(job_id, organization, fingerprint)
+        resolve_output_asset(ams_api, encode_job)
+        video_id = encode_job.edx_video_id
+
+        if state == JobStatus.FINISHED:
+            TASK_LOGGER.info('Starting output Asset publishing [video ID:{}]...'.format(video_id))
+            publish_job(ams_api, encode_job, update_video_status)
+        elif state == JobStatus.ERROR:
+            TASK_LOGGER.error("AzureMS video processing Job failed [video ID:{}].".format(video_id))
+            update_video_status(video_id, 'transcode_failed')
+        else:
             TASK_LOGGER.warn("AzureMS video processing Job canceled [Output Media Asset:{}, video ID:{}]".format(
-                output_media_asset['Name'], video_id
+                encode_job.output_asset_id, video_id
             ))
             update_video_status(video_id, 'transcode_cancelled')
-            break
+    except RequestException:
+        TASK_LOGGER.exception("Something went wrong during AzureMS completed Job processing.")
+    else:
+        untrack_job(job_id)
+
 
-        # # check for Job status every 30 sec:
-        time.sleep(30)
+@task()
+def submit_encodes_task():
+    """
+    Submit encode Jobs of queued videos within Organizations' and Media Services accounts' concurrency caps.
+
+    The task re-schedules itself every `AZURE_ENCODE_SUBMIT_INTERVAL` seconds while there are queued videos.
+    """
+    submitted = submit_pending_encodes(get_media_service_client, submit_encode)
+    TASK_LOGGER.info('Submitted {} encode Jobs.'.format(submitted))
+    release_schedule(SCHEDULER_SCHEDULED_KEY)
+    if get_pending_requests().exists():
+        schedule_encode_submission()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...telemetry import get_report, PERCENTILES, STAGES
+
+
+class Command(BaseCommand):
+    """
+    Report throughput and stage durations of the video pipeline by Organization and by encoding preset.
+
+    Example: `./manage.py lms azure_encode_report --hours 168 --organization MITx`
+    """
+
+    help = 'Report video minutes published per hour and p50/p90/p99 of pipeline stage durations (seconds).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Report videos published within that many hours.')
+        parser.add_argument('--organization', default=None, help='Report videos of the Organization only.')
+
+    def handle(self, *args, **options):
+        until = timezone.now()
+        report = get_report(until - timedelta(hours=options['hours']), until, options['organization'])
+        self.write_summary('All videos', report['all'])
+        for title, group in (('Organization', 'organizations'), ('Preset', 'presets')):
+            for name, summary in sorted(report[group].items()):
+                self.write_summary('{} [{}]'.format(title, name or '-'), summary)
+
+    def write_summary(self, title, summary):
+        line = '{}: {} videos, {:.1f} video minutes, {:.2f} video minutes per hour, slowest stage: {}'.format(
+            title, summary['videos'], summary['video_minutes'], summary['throughput'] or 0,
+            summary['slowest_stage'] or '-',
+        )
+        if summary['unknown_duration']:
+            line += ' ({} videos of unknown duration are not counted in video minutes)'.format(
+                summary['unknown_duration']
+            )
+        self.stdout.write(line)
+        for name in [stage for stage, _, _ in STAGES] + ['total']:
+            percentiles = summary['stages'].get(name)
+            if percentiles:
+                self.stdout.write('    {:<12}{}'.format(name, ' '.join(
+                    'p{}={:.0f}'.format(percent, percentiles['p{}'.format(percent)]) for percent in PERCENTILES
+                )))
@@ -1,19 +1,54 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
+import hashlib
 import logging
 import mimetypes
 import re
+import time
+import uuid
 
+from azure.storage.blob import BlobSharedAccessPermissions
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
-from msrestazure.azure_active_directory import ServicePrincipalCredentials
-import requests
+from django.utils.six.moves.urllib.parse import urljoin
 from requests import HTTPError
 
+from .access_policies import AccessPolicyPool
+from .batch import BatchRequest
 from .blobs_service import BlobServiceClient
+from .caching import LRUCache
+from .models import AzureEncodedAsset
+from .response_cache import CachedResponse, get_response_cache, get_response_cache_key, get_ttl, increment_metric
+from .sas import get_sas_signer
+from .telemetry import record_stage
+from .tokens import CachedServicePrincipalCredentials
+from .transport import get_session
 
 
 LOGGER = logging.getLogger(__name__)
 
+# AMS never returns more than 1000 entities per collection request:
+MAX_PAGE_SIZE = 1000
+# Jobs fetched by one request with `$filter` of their IDs (keeps request URL reasonably short):
+JOBS_FILTER_SIZE = 50
+
+DEFAULT_MEDIA_PROCESSOR = 'Media Encoder Standard'
+# streaming and downloading:
+DEFAULT_ENCODING_PRESET = 'Content Adaptive Multiple Bitrate MP4'
+MEDIA_PROCESSOR_CACHE_KEY = 'azure_video_pipeline.media_processor.{}'
+MEDIA_PROCESSOR_CACHE_TTL = 24 * 60 * 60
+NOTIFICATION_ENDPOINT_NAME = u'OpenEdxVideoPipelineJobs_{}'
+NOTIFICATION_ENDPOINT_CACHE_KEY = 'azure_video_pipeline.notification_endpoint.{}'
+NOTIFICATION_ENDPOINT_CACHE_TTL = 24 * 60 * 60
+JOB_NAME = u'AssetEncodeJob:{}'
+
+# published Locators are valid for 10 years:
+PUBLISHED_ACCESS_POLICY_DURATION = 60 * 24 * 365 * 10
+
+_media_processors = LRUCache(max_size=100)
+_notification_endpoints = LRUCache(max_size=100)
+
 
 class LocatorTypes(object):
     SAS = 1
@@ -27,6 +62,42 @@ class AccessPolicyPermissions(object):
     DELETE = 3
 
 
+class NotificationEndPointType(object):
+    AzureQueue = 1
+
+
+class TargetJobState(object):
+    NONE = 0
+    FINAL_STATES_ONLY = 1
+    ALL = 2
+
+
+class JobStatus(object):
+    """
+    Azure Job entity status code enum.
+
+    ref: https://docs.microsoft.com/en-us/rest/api/media/operations/job#list_jobs
+    """
+
+    QUEUED = 0
+    SCHEDULED = 1
+    PROCESSING = 2
+    FINISHED = 3
+    ERROR = 4
+    CANCELED = 5
+    CANCELING = 6
+
+
+class JobAlreadySubmitted(Exception):
+    """
+    Raised before Job creation is retried if the previous attempt created the Job after all.
+    """
+
+    def __init__(self, job):
+        super(JobAlreadySubmitted, self).__init__(job['Id'])
+        self.job = job
+
+
 class MediaServiceClient(object):
     """
     Client to consume Azure Media service API.
@@ -45,11 +116,14 @@ class MediaServiceClient(object):
         self.storage_key = azure_config.get('storage_key')
         host = re.findall('[https|http]://(\w+.+)/api/', self.rest_api_endpoint, re.M)
         self.host = host[0] if host else None
-        self.credentials = ServicePrincipalCredentials(resource=self.RESOURCE, **azure_config)
+        self.credentials = CachedServicePrincipalCredentials(resource=self.RESOURCE, **azure_config)
+        self.session = get_session(self.rest_api_endpoint)
+        self.page_size = min(settings.FEATURES.get('AZURE_PAGE_SIZE', MAX_PAGE_SIZE), MAX_PAGE_SIZE)
         self.asset = {}
         self.client_video_id = ''
 
     def get_headers(self):
+        token = self.credentials.token
         return {
             'Content-Type': 'application/json',
             'DataServiceVersion': '1.0',
@@ -58,40 +132,38 @@ class MediaServiceClient(object):
             'Accept-Charset': 'UTF-8',
             'x-ms-version': '2.15',
             'Host': self.host,
-            'Authorization': '{} {}'.format(
-                self.credentials.token['token_type'],
-                self.credentials.token['access_token']
-            )
+            'Authorization': '{} {}'.format(token['token_type'], token['access_token'])
         }
 
     def set_metadata(self, metadata_name, value):
         setattr(self, metadata_name, value)
 
+    def batch(self):
+        """
+        Start batch of entity operations to be sent in one round trip.
+        """
+        return BatchRequest(self)
+
     def generate_url(self, expires_in, *args, **kwargs):
         mime_type = mimetypes.guess_type(self.client_video_id)[0]
-        self.create_asset_file(self.asset['Id'], self.client_video_id, mime_type)
-        access_policy = self.create_access_policy(
-            u'AccessPolicy_{}'.format(self.client_video_id.split('.')[0]),
-            permissions=AccessPolicyPermissions.WRITE
+        self.create_asset_file_with_locator(
+            self.asset['Id'], self.client_video_id, mime_type, duration_in_minutes=120
         )
-        self.create_locator(
-            access_policy['Id'],
-            self.asset['Id'],
-            locator_type=LocatorTypes.SAS
+        # input Asset is named after Edx video ID (see `create_asset`):
+        asset_name = self.asset.get('Name', '')
+        if '::' in asset_name:
+            record_stage(asset_name.split('::', 1)[1], 'upload_url_issued')
+
+        return get_sas_signer(self.storage_account_name, self.storage_key).make_blob_url(
+            'asset-{}'.format(self.asset['Id'].split(':')[-1]),
+            self.client_video_id,
+            BlobSharedAccessPermissions.WRITE,
+            expires_in
         )
 
-        blob_service = BlobServiceClient(self.storage_account_name, self.storage_key)
-        sas_url = blob_service.generate_url(
-            asset_id=self.asset['Id'],
-            blob_name=self.client_video_id,
-            expires_in=expires_in
-        )
-        return sas_url
-
     def upload_video_transcript(self, edx_video_id, transcript_file):
         file_name = transcript_file.name
         asset = self.get_input_asset_by_video_id(edx_video_id, asset_prefix='ENCODED')
-
         if not asset:
             raise ObjectDoesNotExist(
                 'Target Video to which you are trying to attach transcripts is no longer available on Azure'
@@ -101,80 +173,185 @@ class MediaServiceClient(object):
         mime_type = mimetypes.guess_type(file_name)[0]
 
         try:
-            asset_file = self.create_asset_file(asset['Id'], file_name, mime_type)
+            asset_file, locator = self.create_asset_file_with_locator(
+                asset['Id'], file_name, mime_type, duration_in_minutes=30
+            )
         except HTTPError:
             raise MultipleObjectsReturned(
                 'This may be happening because of file name conflict. Try to change the file name and upload again.'
             )
 
-        access_policy = self.create_access_policy(
-            u'AccessPolicy_{}'.format(file_name.split('.')[0]),
-            duration_in_minutes=30,
-            permissions=AccessPolicyPermissions.WRITE
-        )
-        locator = self.create_locator(
-            access_policy['Id'],
-            asset['Id'],
-            locator_type=LocatorTypes.SAS
-        )
         blob_service_client = BlobServiceClient(self.storage_account_name, self.storage_key)
-        blob_service_client.blob_service.put_block_blob_from_file(
+        blob_service_client.upload_file(
             'asset-{}'.format(asset['Id'].split(':')[-1]),
             file_name,
-            transcript_file.file
+            transcript_file
         )
 
-        self.delete_locator(locator['Id'])
-        self.delete_access_policy(access_policy['Id'])
-        self.update_asset_file(asset_file['Id'], file_data={
+        # clean up is best effort, so the Locator is deleted in its own changeset (AccessPolicy is pooled):
+        batch = self.batch()
+        batch.add('MERGE', "Files('{}')".format(asset_file['Id']), self.get_asset_file_update_data({
             "size": transcript_file._size,
             "ctype": transcript_file.content_type
-        })
+        }))
+        batch.new_changeset()
+        batch.add('DELETE', "Locators('{}')".format(locator['Id']))
+        asset_file_update = batch.execute(raise_for_status=False)[0]
+        self.invalidate_asset_responses(asset['Id'])
+        if isinstance(asset_file_update, HTTPError):
+            raise asset_file_update
+
+    def iter_collection(self, resource, page_size=None, select=None, expand=None):
+        """
+        Iterate over entities collection requesting it page by page.
+
+        Follows `odata.nextLink` if AMS provides it and pages with `$skip` otherwise.
+        :param resource: collection path relative to REST API endpoint, may contain query (e.g. `$filter`)
+        :param page_size: number of entities per request (capped by AMS limit of 1000)
+        :param select: list of entity properties to fetch (`$select` projection), all by default
+        :param expand: list of navigation properties to be inlined into entities (`$expand`)
+        """
+        page_size = min(page_size or self.page_size, MAX_PAGE_SIZE)
+        query = ['$top={}'.format(page_size)]
+        if select:
+            query.append('$select={}'.format(','.join(select)))
+        if expand:
+            query.append('$expand={}'.format(','.join(expand)))
+        base_url = '{}{}{}{}'.format(self.rest_api_endpoint, resource, '&' if '?' in resource else '?', '&'.join(query))
+
+        url, skip = base_url, 0
+        while url:
+            response = self.session.get(url, headers=self.get_headers())
+            if response.status_code != 200:
+                response.raise_for_status()
+            data = response.json()
+            entities = data.get('value', [])
+            for entity in entities:
+                yield entity
+
+            next_link = data.get('odata.nextLink')
+            skip += len(entities)
+            if next_link:
+                url = urljoin(self.rest_api_endpoint, next_link)
+            elif len(entities) < page_size:
+                url = None
+            else:
+                url = '{}&$skip={}'.format(base_url, skip)
+
+    def iter_locators(self, locator_type=LocatorTypes.OnDemandOrigin, page_size=None, select=None, expand=None):
+        return self.iter_collection('Locators?$filter=Type eq {}'.format(locator_type), page_size, select, expand)
+
+    def iter_asset_files(self, input_asset_id, page_size=None, select=None):
+        return self.iter_collection("Assets('{}')/Files".format(input_asset_id), page_size, select)
+
+    def get_cached_collection(self, resource, entity_type, page_size=None, cache_empty=True):
+        """
+        Read-through cached collection lookup.
+
+        Fresh entries are served from the response cache; expired ones carrying an ETag are revalidated
+        with `If-None-Match`. TTL depends on entity type (see `response_cache.DEFAULT_TTLS`).
+        :param resource: collection path relative to REST API endpoint, may contain query (e.g. `$filter`)
+        :param entity_type: `Assets`, `Files` or `Locators`
+        :param page_size: number of entities to fetch (all pages are fetched if omitted)
+        :param cache_empty: cache empty result too; lookups of entities which are yet to be created by others
+            (e.g. encoded Asset by name) aren't cached until they are found
+        :return: list of entities
+        """
+        response_cache = get_response_cache()
+        key = get_response_cache_key(self.rest_api_endpoint, resource)
+        ttl = get_ttl(entity_type)
+        entry = response_cache.get(key, entity_type)
+        if entry is not None and entry.is_fresh:
+            return entry.value
 
-    def get_locators_list(self, locator_type=LocatorTypes.OnDemandOrigin):
-        url = '{}Locators?$filter=Type eq {}'.format(self.rest_api_endpoint, locator_type)
         headers = self.get_headers()
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            locators = response.json().get('value', [])
-            return locators
-        else:
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        top = page_size or self.page_size
+        url = '{}{}{}$top={}'.format(self.rest_api_endpoint, resource, '&' if '?' in resource else '?', top)
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 304:
+            increment_metric('revalidations', entity_type)
+            entry.expires_at = time.time() + ttl
+            response_cache.set(key, entry, ttl)
+            return entry.value
+        if response.status_code != 200:
             response.raise_for_status()
 
+        increment_metric('misses', entity_type)
+        data = response.json()
+        value, etag = data.get('value', []), response.headers.get('ETag')
+        if page_size is None and (data.get('odata.nextLink') or len(value) >= top):
+            # collection doesn't fit into a single page:
+            value, etag = list(self.iter_collection(resource)), None
+        if value or cache_empty:
+            response_cache.set(key, CachedResponse(value, etag, time.time() + ttl), ttl)
+        return value
+
+    def get_asset_locator_resource(self, input_asset_id, type):
+        return "Assets('{}')/Locators?$filter=Type eq {}".format(input_asset_id, type)
+
+    def get_asset_files_resource(self, input_asset_id):
+        return "Assets('{}')/Files".format(input_asset_id)
+
+    def get_asset_by_name_resource(self, asset_name):
+        return "Assets?$filter=Name eq '{}'".format(asset_name)
+
+    def invalidate_asset_by_name_response(self, asset_name):
+        get_response_cache().delete_many([
+            get_response_cache_key(self.rest_api_endpoint, self.get_asset_by_name_resource(asset_name))
+        ])
+
+    def invalidate_asset_responses(self, input_asset_id):
+        """
+        Drop cached lookups of the Asset's Files and Locators after they were changed.
+        """
+        resources = [self.get_asset_files_resource(input_asset_id)] + [
+            self.get_asset_locator_resource(input_asset_id, locator_type)
+            for locator_type in (LocatorTypes.SAS, LocatorTypes.OnDemandOrigin)
+        ]
+        get_response_cache().delete_many([
+            get_response_cache_key(self.rest_api_endpoint, resource) for resource in resources
+        ])
+
+    def get_locators_list(self, locator_type=LocatorTypes.OnDemandOrigin):
+        return list(self.iter_locators(locator_type))
+
     def get_asset_locator(self, input_asset_id, type):
-        url = "{}Assets('{}')/Locators?$filter=Type eq {}".format(self.rest_api_endpoint, input_asset_id, type)
-        headers = self.get_headers()
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            locators = response.json().get('value', [])
-            return locators[0] if locators else None
-        else:
-            response.raise_for_status()
+        locators = self.get_cached_collection(
+            self.get_asset_locator_resource(input_asset_id, type), 'Locators', page_size=1
+        )
+        return locators[0] if locators else None
+
+    def find_asset_locator(self, input_asset_id, type):
+        """
+        Look up the Asset's Locator of the type bypassing the response cache, e.g. right before creating one.
+        """
+        return next(self.iter_collection(self.get_asset_locator_resource(input_asset_id, type), page_size=1), None)
 
     def get_asset_files(self, input_asset_id):
-        url = "{}Assets('{}')/Files".format(self.rest_api_endpoint, input_asset_id)
-        headers = self.get_headers()
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            files = response.json().get('value', [])
-            return files
-        else:
-            response.raise_for_status()
+        return self.get_cached_collection(self.get_asset_files_resource(input_asset_id), 'Files')
 
     def get_input_asset_by_video_id(self, video_id, asset_prefix='UPLOADED'):
         """
         Fetch input Asset by Edx video ID.
 
+        Assets which are not found are looked up again next time, e.g. encoded one before publishing.
         :param video_id: Edx video ID
+        :param asset_prefix: `UPLOADED` or `ENCODED`; videos published with encoded Asset of another video with
+            the same content (see `dedupe`) get that Asset
         """
-        url = "{}Assets?$filter=Name eq '{}::{}'".format(self.rest_api_endpoint, asset_prefix, video_id)
-        headers = self.get_headers()
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            assets = response.json().get('value', [])
-            return assets and assets[0]
-        else:
-            response.raise_for_status()
+        assets = self.get_cached_collection(
+            self.get_asset_by_name_resource('{}::{}'.format(asset_prefix, video_id)), 'Assets', page_size=1,
+            cache_empty=False,
+        )
+        if assets:
+            return assets[0]
+        if asset_prefix == 'ENCODED':
+            encoded_asset = AzureEncodedAsset.objects.filter(edx_video_id=video_id).first()
+            if encoded_asset is not None:
+                return {'Id': encoded_asset.asset_id}
+        return None
 
     def create_asset(self, asset_name):
         """
@@ -187,54 +364,69 @@ class MediaServiceClient(object):
         url = "{}Assets".format(self.rest_api_endpoint)
         headers = self.get_headers()
         data = {'Name': '{}::{}'.format(input_asset_prefix, asset_name)}
-        response = requests.post(url, headers=headers, json=data)
+        response = self.session.post(url, headers=headers, json=data)
         if response.status_code == 201:
+            self.invalidate_asset_by_name_response(data['Name'])
             return response.json()
         else:
             response.raise_for_status()
 
-    def create_asset_file(self, input_asset_id, file_name, mime_type):
-        url = "{}Files".format(self.rest_api_endpoint)
-        headers = self.get_headers()
-        data = {
+    def get_asset_file_data(self, input_asset_id, file_name, mime_type):
+        return {
             "IsEncrypted": "false",
             "IsPrimary": "false",
             "MimeType": mime_type,
             "Name": file_name,
             "ParentAssetId": input_asset_id
         }
-        response = requests.post(url, headers=headers, json=data)
+
+    def create_asset_file(self, input_asset_id, file_name, mime_type):
+        url = "{}Files".format(self.rest_api_endpoint)
+        headers = self.get_headers()
+        data = self.get_asset_file_data(input_asset_id, file_name, mime_type)
+        response = self.session.post(url, headers=headers, json=data)
         if response.status_code == 201:
+            self.invalidate_asset_responses(input_asset_id)
             return response.json()
         else:
             response.raise_for_status()
 
-    def update_asset_file(self, file_id, file_data):
+    def get_asset_file_update_data(self, file_data):
+        return {
+            "ContentFileSize": "{size}".format(**file_data),
+            "MimeType": "{ctype}".format(**file_data)
+        }
+
+    def update_asset_file(self, file_id, file_data, input_asset_id=None):
         """
         Update AssetFile with special MERGE request to set proper file size.
 
         :param file_id: Azure AssetFile identifier
         :param file_data: (dict) file info to be updated
+        :param input_asset_id: AssetFile's parent Asset ID, its cached Files are invalidated
         """
         url = "{}Files('{}')".format(self.rest_api_endpoint, file_id)
         headers = self.get_headers()
-        json_data = {
-            "ContentFileSize": "{size}".format(**file_data),
-            "MimeType": "{ctype}".format(**file_data)
-        }
-        response = requests.request('MERGE', url, headers=headers, json=json_data)
+        json_data = self.get_asset_file_update_data(file_data)
+        response = self.session.request('MERGE', url, headers=headers, json=json_data)
         if not response.status_code == 204:
             response.raise_for_status()
+        if input_asset_id is not None:
+            self.invalidate_asset_responses(input_asset_id)
 
-    def create_access_policy(self, policy_name, duration_in_minutes=120, permissions=AccessPolicyPermissions.NONE):
-        url = "{}AccessPolicies".format(self.rest_api_endpoint)
-        headers = self.get_headers()
-        data = {
+    def get_access_policy_data(self, policy_name, duration_in_minutes=120,
+                               permissions=AccessPolicyPermissions.NONE):
+        return {
             "Name": policy_name,
             "DurationInMinutes": duration_in_minutes,
             "Permissions": permissions
         }
-        response = requests.post(url, headers=headers, json=data)
+
+    def create_access_policy(self, policy_name, duration_in_minutes=120, permissions=AccessPolicyPermissions.NONE):
+        url = "{}AccessPolicies".format(self.rest_api_endpoint)
+        headers = self.get_headers()
+        data = self.get_access_policy_data(policy_name, duration_in_minutes, permissions)
+        response = self.session.post(url, headers=headers, json=data)
         if response.status_code == 201:
             return response.json()
         else:
@@ -243,33 +435,102 @@ class MediaServiceClient(object):
     def delete_access_policy(self, access_policy_id):
         url = "{}AccessPolicies('{}')".format(self.rest_api_endpoint, access_policy_id)
         headers = self.get_headers()
-        requests.delete(url, headers=headers)
+        self.session.delete(url, headers=headers)
 
-    def create_locator(self, access_policy_id, input_asset_id, locator_type):
-        url = "{}Locators".format(self.rest_api_endpoint)
-        headers = self.get_headers()
+    def get_access_policy_id(self, duration_in_minutes=120, permissions=AccessPolicyPermissions.NONE):
+        """
+        Get ID of pooled AccessPolicy, creating it only if Media Services account has none yet.
+        """
+        return AccessPolicyPool(self).acquire(duration_in_minutes, permissions)
+
+    def invalidate_access_policy_id(self, duration_in_minutes=120, permissions=AccessPolicyPermissions.NONE):
+        AccessPolicyPool(self).invalidate(duration_in_minutes, permissions)
+
+    def get_locator_data(self, access_policy_id, input_asset_id, locator_type):
         start_time = (datetime.utcnow() - timedelta(minutes=10)).replace(microsecond=0).isoformat()
-        data = {
+        return {
             "AccessPolicyId": access_policy_id,
             "AssetId": input_asset_id,
             "StartTime": start_time,
             "Type": locator_type
         }
-        response = requests.post(url, headers=headers, json=data)
+
+    def create_locator(self, access_policy_id, input_asset_id, locator_type):
+        url = "{}Locators".format(self.rest_api_endpoint)
+        headers = self.get_headers()
+        data = self.get_locator_data(access_policy_id, input_asset_id, locator_type)
+        response = self.session.post(url, headers=headers, json=data)
         if response.status_code == 201:
+            self.invalidate_asset_responses(input_asset_id)
             return response.json()
         else:
             response.raise_for_status()
 
+    def create_locators(self, access_policy_id, input_asset_id, locator_types):
+        """
+        Create several Locators for the Asset within one round trip.
+
+        :param access_policy_id: AccessPolicy ID shared by created locators
+        :param input_asset_id: Asset ID
+        :param locator_types: list of `LocatorTypes` values
+        :return: created Locators in `locator_types` order
+        """
+        batch = self.batch()
+        for locator_type in locator_types:
+            batch.add('POST', 'Locators', self.get_locator_data(access_policy_id, input_asset_id, locator_type))
+        locators = batch.execute()
+        self.invalidate_asset_responses(input_asset_id)
+        return locators
+
+    def create_pooled_locators(self, input_asset_id, locator_types, duration_in_minutes, permissions):
+        """
+        Create several Locators for the Asset with pooled AccessPolicy.
+
+        If the request fails (e.g. pooled AccessPolicy was deleted on Azure) the policy is looked up again
+        and Locators creation is retried once.
+        """
+        access_policy_id = self.get_access_policy_id(duration_in_minutes, permissions)
+        try:
+            return self.create_locators(access_policy_id, input_asset_id, locator_types)
+        except HTTPError:
+            LOGGER.warning('Locators creation with pooled AccessPolicy [%s] failed, refreshing it.', access_policy_id)
+            self.invalidate_access_policy_id(duration_in_minutes, permissions)
+            access_policy_id = self.get_access_policy_id(duration_in_minutes, permissions)
+            return self.create_locators(access_policy_id, input_asset_id, locator_types)
+
+    def create_asset_file_with_locator(self, input_asset_id, file_name, mime_type, duration_in_minutes):
+        """
+        Create AssetFile and SAS Locator (with pooled write AccessPolicy) to upload it within one round trip.
+
+        :return: (AssetFile, Locator) pair; HTTPError is raised if AssetFile creation fails
+        """
+        batch = self.batch()
+        batch.add('POST', 'Files', self.get_asset_file_data(input_asset_id, file_name, mime_type))
+        batch.new_changeset()
+        batch.add('POST', 'Locators', self.get_locator_data(
+            self.get_access_policy_id(duration_in_minutes, AccessPolicyPermissions.WRITE),
+            input_asset_id,
+            LocatorTypes.SAS
+        ))
+        asset_file, locator = batch.execute(raise_for_status=False)
+        self.invalidate_asset_responses(input_asset_id)
+        if isinstance(asset_file, HTTPError):
+            raise asset_file
+        if isinstance(locator, HTTPError):
+            locator, = self.create_pooled_locators(
+                input_asset_id, [LocatorTypes.SAS], duration_in_minutes, AccessPolicyPermissions.WRITE
+            )
+        return asset_file, locator
+
     def delete_locator(self, locator_id):
         url = "{}Locators('{}')".format(self.rest_api_endpoint, locator_id)
         headers = self.get_headers()
-        requests.delete(url, headers=headers)
+        self.session.delete(url, headers=headers)
 
-    def get_media_processor(self, name='Media Encoder Standard'):
+    def get_media_processor(self, name=DEFAULT_MEDIA_PROCESSOR):
         url = "{}MediaProcessors()?$filter=Name eq '{}'".format(self.rest_api_endpoint, name)
         headers = self.get_headers()
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
         if response.status_code == 200:
             try:
                 media_processor = response.json().get('value', [])[0]
@@ -280,20 +541,67 @@ class MediaServiceClient(object):
         else:
             response.raise_for_status()
 
-    def create_job(self, input_asset_id, video_id, media_processor_id=None):
+    def get_media_processor_cache_key(self, name):
+        digest = hashlib.md5(u'{}|{}'.format(self.rest_api_endpoint, name).encode('utf-8')).hexdigest()
+        return MEDIA_PROCESSOR_CACHE_KEY.format(digest)
+
+    def get_media_processor_id(self, name=DEFAULT_MEDIA_PROCESSOR):
+        """
+        Get media processor ID by its name.
+
+        Lookups are cached per REST API endpoint in-process and in the Django cache for
+        `AZURE_MEDIA_PROCESSOR_CACHE_TTL` seconds.
+        """
+        key = self.get_media_processor_cache_key(name)
+        media_processor_id = _media_processors.get(key)
+        if media_processor_id is None:
+            ttl = settings.FEATURES.get('AZURE_MEDIA_PROCESSOR_CACHE_TTL', MEDIA_PROCESSOR_CACHE_TTL)
+            media_processor_id = cache.get(key)
+            if media_processor_id is None:
+                media_processor_id = self.get_media_processor(name)[u'Id']
+                cache.set(key, media_processor_id, ttl)
+            _media_processors.set(key, media_processor_id, ttl)
+        return media_processor_id
+
+    def invalidate_media_processor_id(self, name=DEFAULT_MEDIA_PROCESSOR):
+        key = self.get_media_processor_cache_key(name)
+        _media_processors.delete(key)
+        cache.delete(key)
+
+    def create_job(self, input_asset_id, video_id, media_processor_id=None, notification_endpoint_id=None,
+                   preset=DEFAULT_ENCODING_PRESET):
         """
         Create encode Job on Azure Media Service for input Asset video.
 
         Output Asset Name format: `ENCODED::<Edx-video-ID>`
         :param input_asset_id:  AzureMS Asset ID which contains encode target video.
         :param video_id: Edx video ID
-        :param media_processor_id: ID of encode processor (defaults to Standard
+        :param media_processor_id: ID of encode processor (defaults to cached ID of Standard one)
+        :param notification_endpoint_id: NotificationEndPoint to be notified of Job final state
+        :param preset: Media Encoder Standard preset name (see `presets`)
         ref: https://docs.microsoft.com/en-us/azure/media-services/media-services-encode-asset
         """
+        if media_processor_id is not None:
+            return self.submit_job(input_asset_id, video_id, media_processor_id, notification_endpoint_id, preset)
+
+        try:
+            return self.submit_job(
+                input_asset_id, video_id, self.get_media_processor_id(), notification_endpoint_id, preset
+            )
+        except HTTPError as error:
+            response = error.response
+            if response is None or 'mediaprocessor' not in response.text.lower():
+                raise
+            # cached processor ID is no longer known to AMS - look it up again:
+            LOGGER.warning('AzureMS rejected cached media processor ID, refreshing it.')
+            self.invalidate_media_processor_id()
+            return self.submit_job(
+                input_asset_id, video_id, self.get_media_processor_id(), notification_endpoint_id, preset
+            )
+
+    def submit_job(self, input_asset_id, video_id, media_processor_id, notification_endpoint_id=None,
+                   preset=DEFAULT_ENCODING_PRESET):
         output_asset_prefix = 'ENCODED'
-        if media_processor_id is None:
-            media_processor_props = self.get_media_processor()
-            media_processor_id = media_processor_props[u'Id']
 
         input_asset_url = "{}Assets('{}')".format(self.rest_api_endpoint, input_asset_id)
         output_asset_name = '{}::{}'.format(output_asset_prefix, video_id)
@@ -303,8 +611,9 @@ class MediaServiceClient(object):
         headers.update({
             "Accept": "application/json;odata=verbose"
         })
+        job_name = JOB_NAME.format(input_asset_id)
         job_config_data = {
-            "Name": "AssetEncodeJob:{}".format(input_asset_id),
+            "Name": job_name,
             "InputMediaAssets": [
                 {
                     "__metadata": {
@@ -314,7 +623,7 @@ class MediaServiceClient(object):
             ],
             "Tasks": [
                 {
-                    "Configuration": "Content Adaptive Multiple Bitrate MP4",  # streaming and downloading
+                    "Configuration": preset,
                     "MediaProcessorId": media_processor_id,
                     "TaskBody":
                         "<?xml version=\"1.0\" encoding=\"utf-8\"?><taskBody><inputAsset>JobInputAsset(0)"
@@ -323,27 +632,138 @@ class MediaServiceClient(object):
                 }
             ]
         }
+        if notification_endpoint_id:
+            job_config_data["JobNotificationSubscriptions"] = [
+                {
+                    "NotificationEndPointId": notification_endpoint_id,
+                    "TargetJobState": TargetJobState.FINAL_STATES_ONLY
+                }
+            ]
+
+        def check_job_submitted():
+            job = self.find_submitted_job(job_name)
+            if job is not None:
+                raise JobAlreadySubmitted(job)
+
+        # Job creation is retried, unless the Job is found to be created by the failed attempt:
+        try:
+            response = self.session.post(
+                url, headers=headers, json=job_config_data,
+                dedupe_key=self.get_job_dedupe_key(input_asset_url, job_name), before_retry=check_job_submitted,
+            )
+        except JobAlreadySubmitted as submitted:
+            LOGGER.info('Job [%s] is created by the failed attempt, it is not submitted again.', submitted.job['Id'])
+            return {'d': submitted.job}
+        if response.status_code == 201:
+            return response.json()
+        else:
+            response.raise_for_status()
+
+    def get_job_dedupe_key(self, input_asset_url, job_name):
+        """
+        Get `x-ms-client-request-id` of Job creation: the same for every attempt to encode the input Asset.
+        """
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, u'{}#{}'.format(input_asset_url, job_name).encode('utf-8')))
+
+    def find_submitted_job(self, job_name):
+        """
+        Look up the Job of the name which isn't failed or canceled, e.g. created by an attempt whose response is lost.
+        """
+        jobs = self.iter_collection(
+            u"Jobs?$filter=Name eq '{}'".format(job_name), select=['Id', 'Name', 'State', 'Created']
+        )
+        failed_states = (JobStatus.ERROR, JobStatus.CANCELED, JobStatus.CANCELING)
+        return next((job for job in jobs if int(job['State']) not in failed_states), None)
+
+    def get_encoding_reserved_units(self):
+        """
+        Get number of encoding Reserved Units of the Media Services account (Tasks it processes concurrently).
 
-        response = requests.post(url, headers=headers, json=job_config_data)
+        ref: https://docs.microsoft.com/en-us/rest/api/media/operations/encodingreservedunittype
+        """
+        reserved_unit_type = next(self.iter_collection('EncodingReservedUnitTypes', page_size=1), None)
+        return int(reserved_unit_type['CurrentReservedUnits']) if reserved_unit_type else 0
+
+    def get_notification_endpoint(self, queue_name):
+        endpoints = self.iter_collection(
+            "NotificationEndPoints?$filter=Name eq '{}'".format(NOTIFICATION_ENDPOINT_NAME.format(queue_name))
+        )
+        return next(endpoints, None)
+
+    def create_notification_endpoint(self, queue_name):
+        """
+        Create NotificationEndPoint writing Job notifications into the storage account's queue.
+        """
+        url = "{}NotificationEndPoints".format(self.rest_api_endpoint)
+        data = {
+            'Name': NOTIFICATION_ENDPOINT_NAME.format(queue_name),
+            'EndPointType': NotificationEndPointType.AzureQueue,
+            'EndPointAddress': queue_name,
+        }
+        response = self.session.post(url, headers=self.get_headers(), json=data)
         if response.status_code == 201:
             return response.json()
         else:
             response.raise_for_status()
 
+    def get_notification_endpoint_cache_key(self, queue_name):
+        digest = hashlib.md5(u'{}|{}'.format(self.rest_api_endpoint, queue_name).encode('utf-8')).hexdigest()
+        return NOTIFICATION_ENDPOINT_CACHE_KEY.format(digest)
+
+    def get_notification_endpoint_id(self, queue_name):
+        """
+        Get ID of NotificationEndPoint of the queue, creating it if there is none.
+
+        Lookups are cached the same way media processor ones are (see `get_media_processor_id`) for
+        `AZURE_NOTIFICATION_ENDPOINT_CACHE_TTL` seconds.
+        """
+        key = self.get_notification_endpoint_cache_key(queue_name)
+        endpoint_id = _notification_endpoints.get(key)
+        if endpoint_id is None:
+            ttl = settings.FEATURES.get('AZURE_NOTIFICATION_ENDPOINT_CACHE_TTL', NOTIFICATION_ENDPOINT_CACHE_TTL)
+            endpoint_id = cache.get(key)
+            if endpoint_id is None:
+                endpoint = self.get_notification_endpoint(queue_name) or self.create_notification_endpoint(queue_name)
+                endpoint_id = endpoint[u'Id']
+                cache.set(key, endpoint_id, ttl)
+            _notification_endpoints.set(key, endpoint_id, ttl)
+        return endpoint_id
+
+    def invalidate_notification_endpoint_id(self, queue_name):
+        key = self.get_notification_endpoint_cache_key(queue_name)
+        _notification_endpoints.delete(key)
+        cache.delete(key)
+
     def get_job(self, job_id):
         url = "{}Jobs('{}')".format(self.rest_api_endpoint, job_id)
         headers = self.get_headers()
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
         if response.status_code == 200:
             job = response.json()
             return job
         else:
             response.raise_for_status()
 
+    def get_jobs(self, job_ids, select=None, expand=None):
+        """
+        Fetch several Jobs by their IDs, `JOBS_FILTER_SIZE` Jobs per request.
+
+        Jobs which don't exist (anymore) are not returned.
+        :param select: list of Job properties to fetch (see `iter_collection`)
+        :param expand: list of Job navigation properties to be inlined, e.g. `Tasks`
+        """
+        jobs = []
+        for start in range(0, len(job_ids), JOBS_FILTER_SIZE):
+            id_filter = ' or '.join(
+                "Id eq '{}'".format(job_id) for job_id in job_ids[start:start + JOBS_FILTER_SIZE]
+            )
+            jobs.extend(self.iter_collection('Jobs?$filter={}'.format(id_filter), select=select, expand=expand))
+        return jobs
+
     def get_output_media_asset(self, job_id):
         url = "{}Jobs('{}')/OutputMediaAssets".format(self.rest_api_endpoint, job_id)
         headers = self.get_headers()
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
         if response.status_code == 200:
             asset = response.json().get('value', [])[0]
             return asset
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AzureUploadSession',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('organization', models.CharField(help_text='Organization short name', max_length=255, blank=True)),
+                ('edx_video_id', models.CharField(db_index=True, max_length=100, blank=True)),
+                ('asset_id', models.CharField(help_text='Azure Asset ID', max_length=255)),
+                ('asset_file_id', models.CharField(help_text='Azure AssetFile ID', max_length=255, blank=True)),
+                ('blob_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=255, blank=True)),
+                ('file_size', models.BigIntegerField()),
+                ('block_size', models.PositiveIntegerField()),
+                ('block_manifest', models.TextField(blank=True)),
+                ('status', models.CharField(default='active', max_length=20, choices=[('active', 'Active'), ('committed', 'Committed')])),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='azureuploadsession',
+            unique_together=set([('asset_id', 'blob_name')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0002_azureuploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AzureEncodedAsset',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('organization', models.CharField(help_text='Organization short name', max_length=255, blank=True)),
+                ('edx_video_id', models.CharField(unique=True, max_length=100)),
+                ('asset_id', models.CharField(help_text='Azure encoded Asset ID', max_length=255, db_index=True)),
+                ('fingerprint', models.CharField(help_text='MD5 and size of the uploaded file', max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='azureencodedasset',
+            index_together=set([('organization', 'fingerprint')]),
+        ),
+    ]
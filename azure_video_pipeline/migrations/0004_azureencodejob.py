@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0003_azureencodedasset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AzureEncodeJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('job_id', models.CharField(help_text='Azure Job ID', unique=True, max_length=255)),
+                ('organization', models.CharField(help_text='Organization short name', max_length=255, blank=True)),
+                ('edx_video_id', models.CharField(db_index=True, max_length=100, blank=True)),
+                ('input_asset_id', models.CharField(help_text='Azure input Asset ID', max_length=255, blank=True)),
+                ('output_asset_id', models.CharField(help_text='Azure encoded Asset ID', max_length=255, blank=True)),
+                ('fingerprint', models.CharField(help_text='MD5 and size of the uploaded file', max_length=64, blank=True)),
+                ('state', models.PositiveSmallIntegerField(default=0, choices=[(0, 'Queued'), (1, 'Scheduled'), (2, 'Processing'), (3, 'Finished'), (4, 'Error'), (5, 'Canceled'), (6, 'Canceling')])),
+                ('queued', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(null=True, blank=True)),
+                ('finished', models.DateTimeField(null=True, blank=True)),
+                ('dispatched', models.DateTimeField(help_text='When final state processing was queued', null=True, blank=True)),
+                ('processed', models.DateTimeField(help_text='When final state was processed', null=True, db_index=True, blank=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='azureencodejob',
+            index_together=set([('organization', 'state')]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0004_azureencodejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='preset',
+            field=models.CharField(help_text='Encoding preset', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='input_size',
+            field=models.BigIntegerField(help_text='Size of the uploaded file', null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='progress',
+            field=models.FloatField(help_text='Percent of the Job processed', null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='polls',
+            field=models.PositiveIntegerField(default=0, help_text='Checks of the Job since its state changed'),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='next_poll',
+            field=models.DateTimeField(help_text='When Job is checked next', null=True, db_index=True, blank=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0005_azureencodejob_poll_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='publish_step',
+            field=models.PositiveSmallIntegerField(default=0, choices=[(0, 'Not published'), (1, 'AccessPolicy acquired'), (2, 'Streaming Locator created'), (3, 'Progressive Locator created'), (4, 'Published')]),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='access_policy_id',
+            field=models.CharField(help_text='Azure AccessPolicy ID', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='streaming_locator_id',
+            field=models.CharField(help_text='Azure OnDemandOrigin Locator ID', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='azureencodejob',
+            name='progressive_locator_id',
+            field=models.CharField(help_text='Azure SAS Locator ID', max_length=255, blank=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0006_azureencodejob_publish_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AzureEncodeRequest',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('organization', models.CharField(help_text='Organization short name', max_length=255, blank=True)),
+                ('edx_video_id', models.CharField(unique=True, max_length=100)),
+                ('input_asset_id', models.CharField(help_text='Azure input Asset ID', max_length=255)),
+                ('fingerprint', models.CharField(help_text='MD5 and size of the uploaded file', max_length=64, blank=True)),
+                ('preset', models.CharField(help_text='Encoding preset', max_length=255, blank=True)),
+                ('input_size', models.BigIntegerField(help_text='Size of the uploaded file', null=True, blank=True)),
+                ('lane', models.PositiveSmallIntegerField(default=1, choices=[(0, 'Priority'), (1, 'Normal')])),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('submitted', models.DateTimeField(help_text='When encode Job was submitted', null=True, blank=True)),
+                ('job_id', models.CharField(help_text='Azure Job ID', max_length=255, blank=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='azureencoderequest',
+            index_together=set([('organization', 'submitted')]),
+        ),
+    ]
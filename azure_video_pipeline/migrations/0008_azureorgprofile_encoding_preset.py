@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0007_azureencoderequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='azureorgprofile',
+            name='encoding_preset',
+            field=models.CharField(help_text='Media Encoder Standard preset for all videos, it is selected by video properties if empty', max_length=255, blank=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('azure_video_pipeline', '0008_azureorgprofile_encoding_preset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AzureVideoTelemetry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('edx_video_id', models.CharField(unique=True, max_length=100)),
+                ('organization', models.CharField(help_text='Organization short name', max_length=255, blank=True)),
+                ('preset', models.CharField(help_text='Encoding preset', max_length=255, blank=True)),
+                ('video_duration', models.FloatField(help_text='Video duration in seconds', null=True, blank=True)),
+                ('input_size', models.BigIntegerField(help_text='Size of the uploaded file', null=True, blank=True)),
+                ('upload_url_issued', models.DateTimeField(null=True, blank=True)),
+                ('upload_completed', models.DateTimeField(null=True, blank=True)),
+                ('job_created', models.DateTimeField(null=True, blank=True)),
+                ('processing_started', models.DateTimeField(null=True, blank=True)),
+                ('job_finished', models.DateTimeField(null=True, blank=True)),
+                ('published', models.DateTimeField(null=True, db_index=True, blank=True)),
+            ],
+        ),
+    ]
@@ -35,6 +35,11 @@ class AzureOrgProfile(models.Model):
         max_length=255,
         help_text=_('Azure Blobs service storage account key')
     )
+    encoding_preset = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text=_('Media Encoder Standard preset for all videos, it is selected by video properties if empty')
+    )
 
     def __str__(self):
         return "AzureProfile[ORG={}]".format(self.organization_id)
@@ -46,5 +51,280 @@ class AzureOrgProfile(models.Model):
             'tenant': self.tenant,
             'rest_api_endpoint': self.rest_api_endpoint,
             'storage_account_name': self.storage_account_name,
-            'storage_key': self.storage_key
+            'storage_key': self.storage_key,
+            'encoding_preset': self.encoding_preset,
         }
+
+
+@python_2_unicode_compatible
+class AzureUploadSession(models.Model):
+    """
+    Resumable upload of a file into Azure Asset's blob container.
+
+    The file is split into `block_size` blocks which are uploaded as uncommitted blob blocks and committed at once
+    when all of them are in place. Block manifest keeps one character per block: `1` - uploaded, `0` - missing.
+    """
+
+    ACTIVE = 'active'
+    COMMITTED = 'committed'
+    STATUS_CHOICES = (
+        (ACTIVE, _('Active')),
+        (COMMITTED, _('Committed')),
+    )
+
+    organization = models.CharField(max_length=255, blank=True, help_text=_('Organization short name'))
+    edx_video_id = models.CharField(max_length=100, blank=True, db_index=True)
+    asset_id = models.CharField(max_length=255, help_text=_('Azure Asset ID'))
+    asset_file_id = models.CharField(max_length=255, blank=True, help_text=_('Azure AssetFile ID'))
+    blob_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField()
+    block_size = models.PositiveIntegerField()
+    block_manifest = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """
+        One upload session per blob.
+        """
+
+        unique_together = ('asset_id', 'blob_name')
+
+    def __str__(self):
+        return "AzureUploadSession[ASSET={}, BLOB={}]".format(self.asset_id, self.blob_name)
+
+    def save(self, *args, **kwargs):
+        if len(self.block_manifest) != self.blocks_count:
+            self.block_manifest = '0' * self.blocks_count
+        super(AzureUploadSession, self).save(*args, **kwargs)
+
+    @property
+    def container_name(self):
+        return 'asset-{}'.format(self.asset_id.split(':')[-1])
+
+    @property
+    def blocks_count(self):
+        return (self.file_size + self.block_size - 1) // self.block_size
+
+    def get_block_length(self, index):
+        return min(self.block_size, self.file_size - index * self.block_size)
+
+    def set_uploaded_blocks(self, indexes):
+        """
+        Replace block manifest with given uploaded block indexes.
+        """
+        indexes = set(indexes)
+        self.block_manifest = ''.join('1' if index in indexes else '0' for index in range(self.blocks_count))
+
+    def mark_blocks_uploaded(self, indexes):
+        manifest = list(self.block_manifest or '0' * self.blocks_count)
+        for index in indexes:
+            manifest[index] = '1'
+        self.block_manifest = ''.join(manifest)
+
+    @property
+    def missing_blocks(self):
+        return [index for index, uploaded in enumerate(self.block_manifest) if uploaded != '1']
+
+    @property
+    def missing_bytes(self):
+        return sum(self.get_block_length(index) for index in self.missing_blocks)
+
+    def get_missing_ranges(self):
+        """
+        Get missing blocks grouped into contiguous byte ranges.
+
+        :return: list of dicts with `first_block`, `last_block` indexes and `start`, `end` (inclusive) byte offsets
+        """
+        ranges = []
+        for index in self.missing_blocks:
+            if ranges and ranges[-1]['last_block'] == index - 1:
+                ranges[-1]['last_block'] = index
+            else:
+                ranges.append({'first_block': index, 'last_block': index})
+        for block_range in ranges:
+            block_range['start'] = block_range['first_block'] * self.block_size
+            block_range['end'] = min((block_range['last_block'] + 1) * self.block_size, self.file_size) - 1
+        return ranges
+
+
+@python_2_unicode_compatible
+class AzureEncodedAsset(models.Model):
+    """
+    Encoded (`ENCODED::`) Asset an Edx video is published with, along with the fingerprint of uploaded content.
+
+    Videos uploaded with the same content (e.g. a lecture reused by several course runs) are published with
+    the Asset encoded first instead of being encoded again.
+    """
+
+    organization = models.CharField(max_length=255, blank=True, help_text=_('Organization short name'))
+    edx_video_id = models.CharField(max_length=100, unique=True)
+    asset_id = models.CharField(max_length=255, db_index=True, help_text=_('Azure encoded Asset ID'))
+    fingerprint = models.CharField(max_length=64, help_text=_('MD5 and size of the uploaded file'))
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """
+        Encoded Assets are looked up by fingerprint within the Organization.
+        """
+
+        index_together = ('organization', 'fingerprint')
+
+    def __str__(self):
+        return "AzureEncodedAsset[VIDEO={}, ASSET={}]".format(self.edx_video_id, self.asset_id)
+
+
+@python_2_unicode_compatible
+class AzureEncodeJob(models.Model):
+    """
+    Azure Media Services encode Job of an Edx video.
+
+    Job is in flight until its final state is processed (output Asset published or video status updated):
+    pollers and notification consumers look up in-flight Jobs here.
+    """
+
+    QUEUED = 0
+    SCHEDULED = 1
+    PROCESSING = 2
+    FINISHED = 3
+    ERROR = 4
+    CANCELED = 5
+    CANCELING = 6
+    STATE_CHOICES = (
+        (QUEUED, _('Queued')),
+        (SCHEDULED, _('Scheduled')),
+        (PROCESSING, _('Processing')),
+        (FINISHED, _('Finished')),
+        (ERROR, _('Error')),
+        (CANCELED, _('Canceled')),
+        (CANCELING, _('Canceling')),
+    )
+
+    # publishing checkpoints of finished Jobs (see `publishing`):
+    NOT_PUBLISHED = 0
+    POLICY_ACQUIRED = 1
+    STREAMING_LOCATOR_CREATED = 2
+    PROGRESSIVE_LOCATOR_CREATED = 3
+    PUBLISHED = 4
+    PUBLISH_STEP_CHOICES = (
+        (NOT_PUBLISHED, _('Not published')),
+        (POLICY_ACQUIRED, _('AccessPolicy acquired')),
+        (STREAMING_LOCATOR_CREATED, _('Streaming Locator created')),
+        (PROGRESSIVE_LOCATOR_CREATED, _('Progressive Locator created')),
+        (PUBLISHED, _('Published')),
+    )
+
+    job_id = models.CharField(max_length=255, unique=True, help_text=_('Azure Job ID'))
+    organization = models.CharField(max_length=255, blank=True, help_text=_('Organization short name'))
+    edx_video_id = models.CharField(max_length=100, blank=True, db_index=True)
+    input_asset_id = models.CharField(max_length=255, blank=True, help_text=_('Azure input Asset ID'))
+    output_asset_id = models.CharField(max_length=255, blank=True, help_text=_('Azure encoded Asset ID'))
+    fingerprint = models.CharField(max_length=64, blank=True, help_text=_('MD5 and size of the uploaded file'))
+    preset = models.CharField(max_length=255, blank=True, help_text=_('Encoding preset'))
+    input_size = models.BigIntegerField(null=True, blank=True, help_text=_('Size of the uploaded file'))
+    state = models.PositiveSmallIntegerField(choices=STATE_CHOICES, default=QUEUED)
+    progress = models.FloatField(null=True, blank=True, help_text=_('Percent of the Job processed'))
+    polls = models.PositiveIntegerField(default=0, help_text=_('Checks of the Job since its state changed'))
+    next_poll = models.DateTimeField(null=True, blank=True, db_index=True, help_text=_('When Job is checked next'))
+    queued = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    dispatched = models.DateTimeField(null=True, blank=True, help_text=_('When final state processing was queued'))
+    publish_step = models.PositiveSmallIntegerField(choices=PUBLISH_STEP_CHOICES, default=NOT_PUBLISHED)
+    access_policy_id = models.CharField(max_length=255, blank=True, help_text=_('Azure AccessPolicy ID'))
+    streaming_locator_id = models.CharField(max_length=255, blank=True, help_text=_('Azure OnDemandOrigin Locator ID'))
+    progressive_locator_id = models.CharField(max_length=255, blank=True, help_text=_('Azure SAS Locator ID'))
+    processed = models.DateTimeField(
+        null=True, blank=True, db_index=True, help_text=_('When final state was processed')
+    )
+
+    class Meta:
+        """
+        Jobs are listed by state within the Organization.
+        """
+
+        index_together = ('organization', 'state')
+
+    def __str__(self):
+        return "AzureEncodeJob[JOB={}, VIDEO={}]".format(self.job_id, self.edx_video_id)
+
+    @property
+    def duration(self):
+        """
+        Seconds from Job submission to its final state, None for Jobs in progress.
+        """
+        if self.finished is None:
+            return None
+        return (self.finished - self.queued).total_seconds()
+
+
+@python_2_unicode_compatible
+class AzureEncodeRequest(models.Model):
+    """
+    Uploaded video waiting for its encode Job to be submitted by the scheduler (see `encode_scheduler`).
+
+    Requests are kept after submission, so queue wait times are known per Organization.
+    """
+
+    PRIORITY = 0
+    NORMAL = 1
+    LANE_CHOICES = (
+        (PRIORITY, _('Priority')),
+        (NORMAL, _('Normal')),
+    )
+
+    organization = models.CharField(max_length=255, blank=True, help_text=_('Organization short name'))
+    edx_video_id = models.CharField(max_length=100, unique=True)
+    input_asset_id = models.CharField(max_length=255, help_text=_('Azure input Asset ID'))
+    fingerprint = models.CharField(max_length=64, blank=True, help_text=_('MD5 and size of the uploaded file'))
+    preset = models.CharField(max_length=255, blank=True, help_text=_('Encoding preset'))
+    input_size = models.BigIntegerField(null=True, blank=True, help_text=_('Size of the uploaded file'))
+    lane = models.PositiveSmallIntegerField(choices=LANE_CHOICES, default=NORMAL)
+    created = models.DateTimeField(auto_now_add=True)
+    submitted = models.DateTimeField(null=True, blank=True, help_text=_('When encode Job was submitted'))
+    job_id = models.CharField(max_length=255, blank=True, help_text=_('Azure Job ID'))
+
+    class Meta:
+        """
+        Pending requests are listed by Organization.
+        """
+
+        index_together = ('organization', 'submitted')
+
+    def __str__(self):
+        return "AzureEncodeRequest[VIDEO={}, ORG={}]".format(self.edx_video_id, self.organization)
+
+    @property
+    def wait(self):
+        """
+        Seconds the request waited for submission, None for pending ones.
+        """
+        if self.submitted is None:
+            return None
+        return (self.submitted - self.created).total_seconds()
+
+
+@python_2_unicode_compatible
+class AzureVideoTelemetry(models.Model):
+    """
+    When the Edx video reached every stage of the pipeline, from upload URL issued to published (see `telemetry`).
+
+    A single row per video: stages are timestamps, so durations of stages are aggregated with local queries.
+    """
+
+    edx_video_id = models.CharField(max_length=100, unique=True)
+    organization = models.CharField(max_length=255, blank=True, help_text=_('Organization short name'))
+    preset = models.CharField(max_length=255, blank=True, help_text=_('Encoding preset'))
+    video_duration = models.FloatField(null=True, blank=True, help_text=_('Video duration in seconds'))
+    input_size = models.BigIntegerField(null=True, blank=True, help_text=_('Size of the uploaded file'))
+    upload_url_issued = models.DateTimeField(null=True, blank=True)
+    upload_completed = models.DateTimeField(null=True, blank=True)
+    job_created = models.DateTimeField(null=True, blank=True)
+    processing_started = models.DateTimeField(null=True, blank=True)
+    job_finished = models.DateTimeField(null=True, blank=True)
+    published = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return "AzureVideoTelemetry[VIDEO={}]".format(self.edx_video_id)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+import struct
+
+
+# the first read is expected to cover `ftyp` and, for files optimized for streaming, `moov`:
+HEAD_SIZE = 64 * 1024
+# `moov` is read only if it isn't larger (it grows with number of samples, a few MB for hours of video):
+MAX_MOOV_SIZE = 16 * 1024 * 1024
+# top-level boxes walked at most looking for `moov`:
+MAX_BOXES = 64
+
+MediaInfo = namedtuple('MediaInfo', ['width', 'height', 'duration', 'bitrate'])
+
+
+class ProbeError(Exception):
+    """
+    Video file is not an MP4 one or its metadata can't be read.
+    """
+
+
+def parse_box_header(data, offset, end):
+    """
+    Parse ISO BMFF box header.
+
+    :param end: offset of the end of the enclosing box (or file)
+    :return: (box type, payload offset, box end offset)
+    """
+    size, box_type = struct.unpack_from('>I4s', data, offset)
+    header_size = 8
+    if size == 1:
+        size = struct.unpack_from('>Q', data, offset + 8)[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size:
+        raise ProbeError('Invalid box size.')
+    return box_type, offset + header_size, offset + size
+
+
+def find_moov(read, head, file_size):
+    """
+    Find `moov` box among top-level boxes, reading box headers only (`mdat` is skipped, not downloaded).
+
+    :return: (offset, size) of `moov` box
+    """
+    offset = 0
+    for _ in range(MAX_BOXES):
+        if offset + 8 > file_size:
+            break
+        data = head[offset:offset + 16]
+        if len(data) < 16 and offset + len(data) < file_size:
+            data = read(offset, min(offset + 16, file_size) - 1)
+        box_type, _, box_size = parse_box_header(data, 0, file_size - offset)
+        if box_type == b'moov':
+            return offset, box_size
+        offset += box_size
+    raise ProbeError('`moov` box is not found.')
+
+
+def iter_boxes(data, offset, end):
+    while offset < end:
+        box_type, payload_offset, box_end = parse_box_header(data, offset, end)
+        yield box_type, payload_offset, min(box_end, end)
+        offset = box_end
+
+
+def parse_mvhd(data, offset):
+    """
+    Get movie duration in seconds from `mvhd` box payload.
+    """
+    version = struct.unpack_from('>B', data, offset)[0]
+    if version == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, offset + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, offset + 12)
+    return float(duration) / timescale if timescale else 0
+
+
+def parse_trak(data, offset, end):
+    """
+    Get (handler type, width, height) of the track from `trak` box payload.
+    """
+    handler_type, width, height = None, 0, 0
+    for box_type, payload_offset, box_end in iter_boxes(data, offset, end):
+        if box_type == b'tkhd':
+            # width and height (16.16 fixed point) close `tkhd` of both versions:
+            width, height = (value >> 16 for value in struct.unpack_from('>II', data, box_end - 8))
+        elif box_type == b'mdia':
+            for child_type, child_offset, _ in iter_boxes(data, payload_offset, box_end):
+                if child_type == b'hdlr':
+                    handler_type = struct.unpack_from('>4s', data, child_offset + 8)[0]
+    return handler_type, width, height
+
+
+def parse_moov(moov, file_size):
+    _, offset, end = parse_box_header(moov, 0, len(moov))
+    duration, width, height = 0, 0, 0
+    for box_type, payload_offset, box_end in iter_boxes(moov, offset, min(end, len(moov))):
+        if box_type == b'mvhd':
+            duration = parse_mvhd(moov, payload_offset)
+        elif box_type == b'trak':
+            handler_type, track_width, track_height = parse_trak(moov, payload_offset, box_end)
+            if handler_type == b'vide' and track_width * track_height > width * height:
+                width, height = track_width, track_height
+    bitrate = int(file_size * 8 / duration) if duration else 0
+    return MediaInfo(width, height, duration, bitrate)
+
+
+def probe_mp4(read, file_size):
+    """
+    Read video metadata of MP4 file with a few ranged reads: the file head, top-level box headers and `moov`.
+
+    :param read: callable `(start, end)` returning file bytes of the inclusive range, e.g. ranged blob read
+    :param file_size: file size in bytes
+    :return: MediaInfo, bitrate (bits per second) is the average of the whole file
+    """
+    if file_size < 8:
+        raise ProbeError('File is too small.')
+    head = read(0, min(HEAD_SIZE, file_size) - 1)
+    try:
+        moov_offset, moov_size = find_moov(read, head, file_size)
+        if moov_size > MAX_MOOV_SIZE:
+            raise ProbeError('`moov` box is too large.')
+        if moov_offset + moov_size <= len(head):
+            moov = head[moov_offset:moov_offset + moov_size]
+        else:
+            moov = read(moov_offset, moov_offset + moov_size - 1)
+        return parse_moov(moov, file_size)
+    except struct.error:
+        raise ProbeError('Truncated box.')
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+
+from azure.common import AzureHttpError
+from django.conf import settings
+
+from .blobs_service import BlobServiceClient
+from .media_service import DEFAULT_ENCODING_PRESET
+from .mp4_probe import probe_mp4, ProbeError
+from .utils import get_azure_config
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Media Encoder Standard system presets by source height: (max height, multiple bitrate, single bitrate), 4x3 SD
+# sources have presets of their own; sources above the ladder are encoded with the content-adaptive ladder.
+# ref: https://docs.microsoft.com/en-us/azure/media-services/media-services-mes-presets-overview
+PRESET_LADDER = (
+    (480, 'H264 Multiple Bitrate 16x9 SD', 'H264 Single Bitrate SD 16x9'),
+    (720, 'H264 Multiple Bitrate 720p', 'H264 Single Bitrate 720p'),
+    (1080, 'H264 Multiple Bitrate 1080p', 'H264 Single Bitrate 1080p'),
+)
+SD_4X3_PRESETS = ('H264 Multiple Bitrate 4x3 SD', 'H264 Single Bitrate SD 4x3')
+# clips up to that many seconds are encoded with a single rendition:
+DEFAULT_SHORT_DURATION = 60
+# sources below that many bits per second (e.g. screen recordings) are encoded one rung lower:
+DEFAULT_LOW_BITRATE = 1500 * 1000
+PROBED_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+def get_org_preset(organization):
+    """
+    Get preset the Organization's videos are always encoded with, None if it is selected by video properties.
+
+    Profile's preset is read from the cached Azure config (see `utils.get_azure_config`), so it costs no query.
+    """
+    preset = get_azure_config(organization).get('encoding_preset')
+    return preset or settings.FEATURES.get('AZURE_ENCODING_PRESETS', {}).get(organization)
+
+
+def get_ladder_preset(media_info):
+    """
+    Get the smallest preset ladder covering the source: by its resolution, bitrate and duration.
+    """
+    features = settings.FEATURES
+    rungs = [index for index, (max_height, _, _) in enumerate(PRESET_LADDER) if media_info.height <= max_height]
+    if not media_info.height or not rungs:
+        return DEFAULT_ENCODING_PRESET
+    rung = rungs[0]
+    if media_info.bitrate and media_info.bitrate < features.get('AZURE_PRESET_LOW_BITRATE', DEFAULT_LOW_BITRATE):
+        rung = max(rung - 1, 0)
+
+    presets = PRESET_LADDER[rung][1:]
+    if rung == 0 and media_info.width * 3 <= media_info.height * 4:
+        presets = SD_4X3_PRESETS
+    short_duration = features.get('AZURE_PRESET_SHORT_DURATION', DEFAULT_SHORT_DURATION)
+    return presets[1] if 0 < media_info.duration <= short_duration else presets[0]
+
+
+def probe_asset(media_service_client, input_asset_id):
+    """
+    Read video metadata of the input Asset's MP4 file with ranged reads of its blob.
+
+    :return: MediaInfo or None if the Asset has no single MP4 file or its metadata can't be read
+    """
+    asset_files = media_service_client.get_asset_files(input_asset_id)
+    if len(asset_files) != 1 or os.path.splitext(asset_files[0]['Name'])[1].lower() not in PROBED_EXTENSIONS:
+        return None
+
+    blob_service_client = BlobServiceClient(media_service_client.storage_account_name, media_service_client.storage_key)
+    container_name, blob_name = 'asset-{}'.format(input_asset_id.split(':')[-1]), asset_files[0]['Name']
+    try:
+        return probe_mp4(
+            lambda start, end: blob_service_client.get_blob_range(container_name, blob_name, start, end),
+            blob_service_client.get_blob_size(container_name, blob_name),
+        )
+    except (AzureHttpError, ProbeError):
+        LOGGER.warning('Could not probe uploaded file of Asset [%s].', input_asset_id, exc_info=True)
+        return None
+
+
+def select_preset(media_service_client, organization, input_asset_id):
+    """
+    Select encoding preset of the uploaded video.
+
+    Organization's preset (`AzureOrgProfile.encoding_preset` or `AZURE_ENCODING_PRESETS`) is used when there is
+    one; otherwise the upload is probed and encoded with the smallest ladder covering it, so low resolution and
+    short videos aren't encoded with renditions they don't need.
+    :return: (preset, MediaInfo of the upload or None if it isn't probed)
+    """
+    preset = get_org_preset(organization)
+    if preset:
+        return preset, None
+    if not settings.FEATURES.get('AZURE_PRESET_SELECTION_ENABLED', True):
+        return DEFAULT_ENCODING_PRESET, None
+
+    media_info = probe_asset(media_service_client, input_asset_id)
+    if media_info is None:
+        return DEFAULT_ENCODING_PRESET, None
+    preset = get_ladder_preset(media_info)
+    LOGGER.info('Preset [%s] is selected for Asset [%s] (%sx%s, %.0f seconds, %s bps).', preset, input_asset_id,
+                media_info.width, media_info.height, media_info.duration, media_info.bitrate)
+    return preset, media_info
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from django.utils import timezone
+from requests import HTTPError, RequestException
+
+from .dedupe import register_encoded_asset
+from .job_poller import parse_job_time, track_job
+from .media_service import AccessPolicyPermissions, LocatorTypes, PUBLISHED_ACCESS_POLICY_DURATION
+from .models import AzureEncodeJob
+from .telemetry import record_stages
+
+
+LOGGER = logging.getLogger(__name__)
+
+# published Locators (created within one batch): (checkpoint, Locator type, AzureEncodeJob field of its ID)
+LOCATOR_STEPS = (
+    (AzureEncodeJob.STREAMING_LOCATOR_CREATED, LocatorTypes.OnDemandOrigin, 'streaming_locator_id'),
+    (AzureEncodeJob.PROGRESSIVE_LOCATOR_CREATED, LocatorTypes.SAS, 'progressive_locator_id'),
+)
+
+
+def checkpoint(encode_job, **fields):
+    AzureEncodeJob.objects.filter(pk=encode_job.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(encode_job, name, value)
+
+
+def get_encode_job(job_id, organization=None, fingerprint=None):
+    """
+    Get AzureEncodeJob of the Job whose final state is processed.
+
+    Jobs monitored by tasks queued by previous versions have no record yet, it is created.
+    """
+    encode_job = AzureEncodeJob.objects.filter(job_id=job_id).first()
+    if encode_job is None:
+        encode_job = track_job(job_id, organization, fingerprint)
+    return encode_job
+
+
+def resolve_output_asset(media_service_client, encode_job):
+    """
+    Look up the Job's output Asset (and Edx video ID it is named after) unless it is checkpointed already.
+    """
+    if not encode_job.output_asset_id:
+        output_media_asset = media_service_client.get_output_media_asset(encode_job.job_id)
+        checkpoint(
+            encode_job,
+            output_asset_id=output_media_asset['Id'],
+            edx_video_id=output_media_asset['Name'].split('::')[1],
+        )
+
+
+def acquire_access_policy(media_service_client, encode_job):
+    access_policy_id = media_service_client.get_access_policy_id(
+        PUBLISHED_ACCESS_POLICY_DURATION, AccessPolicyPermissions.READ
+    )
+    checkpoint(encode_job, publish_step=AzureEncodeJob.POLICY_ACQUIRED, access_policy_id=access_policy_id)
+
+
+def create_locators(media_service_client, encode_job):
+    """
+    Create the output Asset's Locators of the steps left within one batch, reusing ones left by interrupted attempts.
+
+    Locators are created in one changeset, so they fail as a whole and all of them are checkpointed at once.
+    """
+    steps = [locator_step for locator_step in LOCATOR_STEPS if encode_job.publish_step < locator_step[0]]
+    locator_ids, missing = {}, []
+    for step, locator_type, field in steps:
+        locator = media_service_client.find_asset_locator(encode_job.output_asset_id, locator_type)
+        if locator is None:
+            missing.append((locator_type, field))
+        else:
+            LOGGER.info('Reusing Locator [%s] of Asset [%s].', locator['Id'], encode_job.output_asset_id)
+            locator_ids[field] = locator['Id']
+    if missing:
+        try:
+            locators = media_service_client.create_locators(
+                encode_job.access_policy_id, encode_job.output_asset_id, [locator_type for locator_type, _ in missing]
+            )
+        except HTTPError:
+            # checkpointed pooled AccessPolicy may be deleted on Azure, it is acquired again by the next attempt:
+            media_service_client.invalidate_access_policy_id(
+                PUBLISHED_ACCESS_POLICY_DURATION, AccessPolicyPermissions.READ
+            )
+            checkpoint(encode_job, publish_step=AzureEncodeJob.NOT_PUBLISHED, access_policy_id='')
+            raise
+        locator_ids.update((field, locator['Id']) for (_, field), locator in zip(missing, locators))
+    checkpoint(encode_job, publish_step=steps[-1][0], **locator_ids)
+
+
+def resolve_job_times(media_service_client, encode_job):
+    """
+    Look up processing start/end times of the Job unless they are known, e.g. its final state is notified.
+
+    They are telemetry only (see `telemetry`), so a failed lookup doesn't fail publishing.
+    """
+    if encode_job.started is None:
+        try:
+            job = media_service_client.get_job(encode_job.job_id)
+        except RequestException:
+            LOGGER.warning('Could not look up processing times of Job [%s].', encode_job.job_id, exc_info=True)
+            return
+        checkpoint(
+            encode_job,
+            started=parse_job_time(job.get('StartTime')),
+            finished=parse_job_time(job.get('EndTime')) or encode_job.finished,
+        )
+
+
+def publish_job(media_service_client, encode_job, update_status):
+    """
+    Publish output Asset of the finished Job: AccessPolicy, streaming Locator, progressive Locator, video status.
+
+    Every step is checkpointed in AzureEncodeJob and steps look up entities left by interrupted attempts
+    before creating them, so publishing failed half-way resumes with the steps which are left and never
+    creates duplicate Locators.
+    :param update_status: callable `(edx_video_id, status)`
+    """
+    resolve_output_asset(media_service_client, encode_job)
+    if encode_job.publish_step < AzureEncodeJob.POLICY_ACQUIRED:
+        acquire_access_policy(media_service_client, encode_job)
+    if encode_job.publish_step < LOCATOR_STEPS[-1][0]:
+        create_locators(media_service_client, encode_job)
+    if encode_job.publish_step < AzureEncodeJob.PUBLISHED:
+        if encode_job.fingerprint:
+            register_encoded_asset(
+                encode_job.organization, encode_job.edx_video_id, encode_job.output_asset_id, encode_job.fingerprint
+            )
+        # playback lookups of the encoded Asset made before it was published are dropped:
+        media_service_client.invalidate_asset_by_name_response(u'ENCODED::{}'.format(encode_job.edx_video_id))
+        update_status(encode_job.edx_video_id, 'file_complete')
+        checkpoint(encode_job, publish_step=AzureEncodeJob.PUBLISHED)
+        resolve_job_times(media_service_client, encode_job)
+        record_stages(encode_job.edx_video_id, {
+            'processing_started': encode_job.started, 'job_finished': encode_job.finished, 'published': timezone.now(),
+        }, organization=encode_job.organization, preset=encode_job.preset)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .caching import LRUCache
+
+
+RESPONSE_CACHE_KEY = 'azure_video_pipeline.ams_response.{}'
+DEFAULT_BACKEND = 'azure_video_pipeline.response_cache.TieredResponseCache'
+DEFAULT_SIZE = 10000
+DEFAULT_LOCAL_TTL = 60
+# seconds per entity type, overridden by `AZURE_RESPONSE_CACHE_TTLS`:
+DEFAULT_TTLS = {
+    'Assets': 24 * 60 * 60,
+    'Files': 60 * 60,
+    'Locators': 60 * 60,
+}
+
+_response_caches = {}
+_metrics = Counter()
+_lock = threading.Lock()
+
+
+def increment_metric(name, entity_type):
+    with _lock:
+        _metrics[(name, entity_type)] += 1
+
+
+def get_metrics():
+    """
+    Get response cache counters of the current process.
+
+    :return: dict of `{(name, entity_type): count}`, names are `local_hits`, `shared_hits`, `misses`
+        and `revalidations` (cached value confirmed by AMS with `304 Not Modified`)
+    """
+    with _lock:
+        return dict(_metrics)
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+def get_ttl(entity_type):
+    ttls = dict(DEFAULT_TTLS, **settings.FEATURES.get('AZURE_RESPONSE_CACHE_TTLS', {}))
+    return ttls.get(entity_type, min(DEFAULT_TTLS.values()))
+
+
+def get_response_cache_key(endpoint, resource):
+    digest = hashlib.md5(u'{}|{}'.format(endpoint, resource).encode('utf-8')).hexdigest()
+    return RESPONSE_CACHE_KEY.format(digest)
+
+
+class CachedResponse(object):
+    """
+    Cached collection lookup result along with its ETag (if AMS provided one).
+    """
+
+    def __init__(self, value, etag=None, expires_at=None):
+        self.value = value
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self):
+        return self.expires_at is not None and time.time() < self.expires_at
+
+
+class TieredResponseCache(object):
+    """
+    Response cache with an in-process LRU tier in front of the Django cache tier.
+
+    Entries stay in the Django cache twice as long as their TTL, so expired ones still can be revalidated
+    with their ETag. In-process entries live for `AZURE_RESPONSE_CACHE_LOCAL_TTL` seconds at most, which
+    bounds staleness after another process invalidated the shared entry.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(max_size=settings.FEATURES.get('AZURE_RESPONSE_CACHE_SIZE', DEFAULT_SIZE))
+
+    def get(self, key, entity_type):
+        entry = self.local.get(key)
+        if entry is not None:
+            increment_metric('local_hits', entity_type)
+            return entry
+        entry = cache.get(key)
+        if entry is not None and entry.is_fresh:
+            increment_metric('shared_hits', entity_type)
+            self.set_local(key, entry)
+        return entry
+
+    def set(self, key, entry, ttl):
+        cache.set(key, entry, ttl * 2)
+        self.set_local(key, entry)
+
+    def set_local(self, key, entry):
+        ttl = min(entry.expires_at - time.time(), settings.FEATURES.get(
+            'AZURE_RESPONSE_CACHE_LOCAL_TTL', DEFAULT_LOCAL_TTL
+        ))
+        if ttl > 0:
+            self.local.set(key, entry, ttl)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.local.delete(key)
+        cache.delete_many(keys)
+
+
+class NullResponseCache(object):
+    """
+    Response cache backend which caches nothing (`AZURE_RESPONSE_CACHE_BACKEND` to switch caching off).
+    """
+
+    def get(self, key, entity_type):
+        return None
+
+    def set(self, key, entry, ttl):
+        pass
+
+    def delete_many(self, keys):
+        pass
+
+
+def get_response_cache():
+    """
+    Get process-wide response cache backend configured by `AZURE_RESPONSE_CACHE_BACKEND` (dotted class path).
+    """
+    backend = settings.FEATURES.get('AZURE_RESPONSE_CACHE_BACKEND', DEFAULT_BACKEND)
+    response_cache = _response_caches.get(backend)
+    if response_cache is None:
+        with _lock:
+            response_cache = _response_caches.get(backend)
+            if response_cache is None:
+                response_cache = _response_caches[backend] = import_string(backend)()
+    return response_cache
+
+
+def reset_response_caches():
+    with _lock:
+        _response_caches.clear()
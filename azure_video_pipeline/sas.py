@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import base64
+from datetime import datetime
+import hashlib
+import hmac
+import threading
+import time
+
+from azure.storage.constants import BLOB_SERVICE_HOST_BASE, X_MS_VERSION
+from django.conf import settings
+from django.utils.six.moves.urllib.parse import quote
+
+from .caching import LRUCache
+
+
+DEFAULT_EXPIRY_BUCKET = 5 * 60
+DEFAULT_CACHE_SIZE = 100000
+# start is moved back for the clock skew between the application and Azure:
+CLOCK_SKEW = 60
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+_signers = {}
+_signers_lock = threading.Lock()
+
+
+def format_time(timestamp):
+    return datetime.utcfromtimestamp(timestamp).strftime(DATE_FORMAT)
+
+
+class SasSigner(object):
+    """
+    Blob service Shared Access Signature signer working off the storage account key.
+
+    HMAC-SHA256 key schedule is computed once per account and copied for every signature. Signed tokens
+    are cached by (container, blob, permission, expiry bucket): expiry is rounded up to
+    `AZURE_SAS_EXPIRY_BUCKET` seconds, so every request within a bucket gets the same token, which stays
+    valid at least as long as requested.
+    ref: https://docs.microsoft.com/en-us/rest/api/storageservices/constructing-a-service-sas
+    """
+
+    def __init__(self, account_name, account_key):
+        self.account_name = account_name
+        self.hmac = hmac.new(base64.b64decode(account_key), digestmod=hashlib.sha256)
+        self.expiry_bucket = settings.FEATURES.get('AZURE_SAS_EXPIRY_BUCKET', DEFAULT_EXPIRY_BUCKET)
+        self.tokens = LRUCache(max_size=settings.FEATURES.get('AZURE_SAS_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+        self.base_url = 'https://{}{}'.format(account_name, BLOB_SERVICE_HOST_BASE)
+
+    def sign(self, string_to_sign):
+        signature = self.hmac.copy()
+        signature.update(string_to_sign.encode('utf-8'))
+        return base64.b64encode(signature.digest())
+
+    def get_blob_token(self, container_name, blob_name, permission, expires_in):
+        """
+        Get SAS token (query string) granting `permission` on the blob for `expires_in` seconds at least.
+        """
+        expiry = -(-int(time.time() + expires_in) // self.expiry_bucket) * self.expiry_bucket
+        key = (container_name, blob_name, permission, expiry)
+        token = self.tokens.get(key)
+        if token is None:
+            token = self.sign_blob_token(
+                container_name, blob_name, permission, expiry - expires_in - self.expiry_bucket - CLOCK_SKEW, expiry
+            )
+            self.tokens.set(key, token, ttl=expiry - time.time())
+        return token
+
+    def sign_blob_token(self, container_name, blob_name, permission, start, expiry):
+        start, expiry = format_time(start), format_time(expiry)
+        string_to_sign = u'\n'.join([
+            permission,
+            start,
+            expiry,
+            u'/{}/{}/{}'.format(self.account_name, container_name, blob_name),
+            u'',  # signed identifier
+            X_MS_VERSION,
+            u'', u'', u'', u'', u'',  # response headers overrides
+        ])
+        return 'se={}&sp={}&st={}&sr=b&sv={}&sig={}'.format(
+            quote(expiry), permission, quote(start), X_MS_VERSION, quote(self.sign(string_to_sign))
+        )
+
+    def make_blob_url(self, container_name, blob_name, permission, expires_in):
+        return u'{}/{}/{}?{}'.format(
+            self.base_url,
+            container_name,
+            blob_name,
+            self.get_blob_token(container_name, blob_name, permission, expires_in),
+        )
+
+
+def get_sas_signer(account_name, account_key):
+    """
+    Get process-wide SasSigner of the storage account.
+    """
+    key = (account_name, account_key)
+    signer = _signers.get(key)
+    if signer is None:
+        with _signers_lock:
+            signer = _signers.get(key)
+            if signer is None:
+                signer = _signers[key] = SasSigner(account_name, account_key)
+    return signer
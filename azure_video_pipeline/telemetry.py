@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+import math
+
+from django.utils import timezone
+
+from .models import AzureVideoTelemetry
+
+
+# pipeline stages: (name, timestamp it starts at, timestamp it ends at)
+STAGES = (
+    ('upload', 'upload_url_issued', 'upload_completed'),
+    ('scheduling', 'upload_completed', 'job_created'),
+    ('ams_queue', 'job_created', 'processing_started'),
+    ('encoding', 'processing_started', 'job_finished'),
+    ('publishing', 'job_finished', 'published'),
+)
+TIMESTAMPS = ('upload_url_issued', 'upload_completed', 'job_created', 'processing_started', 'job_finished', 'published')
+PERCENTILES = (50, 90, 99)
+
+
+def record_stages(edx_video_id, stages=None, **fields):
+    """
+    Record when the video reached the stages; only the first time counts (e.g. retried steps are not recorded).
+
+    :param stages: `{timestamp field: datetime}`, see `TIMESTAMPS`
+    :param fields: video properties to store, e.g. `organization`, `preset`, `video_duration`
+    """
+    telemetry, _ = AzureVideoTelemetry.objects.get_or_create(edx_video_id=edx_video_id)
+    changed = {
+        name: at for name, at in (stages or {}).items() if at is not None and getattr(telemetry, name) is None
+    }
+    changed.update((name, value) for name, value in fields.items() if value not in (None, ''))
+    if changed:
+        AzureVideoTelemetry.objects.filter(pk=telemetry.pk).update(**changed)
+
+
+def record_stage(edx_video_id, stage, **fields):
+    record_stages(edx_video_id, {stage: timezone.now()}, **fields)
+
+
+def get_video_duration(edx_video_id):
+    """
+    Get recorded duration (seconds) of the video, None if it is unknown.
+    """
+    return AzureVideoTelemetry.objects.filter(edx_video_id=edx_video_id).values_list(
+        'video_duration', flat=True
+    ).first()
+
+
+def percentile(values, percent):
+    """
+    Get nearest-rank percentile of the values, None if there are none.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)]
+
+
+def get_stage_durations(timestamps):
+    """
+    Get seconds the video spent in every stage it has both timestamps of, and in total.
+    """
+    timestamps = dict(zip(TIMESTAMPS, timestamps))
+    durations = {
+        name: (timestamps[end] - timestamps[start]).total_seconds()
+        for name, start, end in STAGES if timestamps[start] and timestamps[end]
+    }
+    known = [at for at in (timestamps[name] for name in TIMESTAMPS) if at]
+    if len(known) > 1:
+        durations['total'] = (max(known) - min(known)).total_seconds()
+    return durations
+
+
+def summarize(videos, window_hours):
+    """
+    Aggregate stage durations of the published videos.
+
+    :param videos: list of (video duration, `{stage: seconds}`) pairs
+    :return: dict of `videos`, `video_minutes`, `throughput` (video minutes published per hour), `stages` (their
+        percentiles), `slowest_stage` (with the largest median) and `unknown_duration` (videos of unknown
+        duration, e.g. not probed ones; they are left out of `video_minutes` and `throughput`)
+    """
+    durations = defaultdict(list)
+    for _, stage_durations in videos:
+        for name, seconds in stage_durations.items():
+            durations[name].append(seconds)
+    video_minutes = sum(video_duration or 0 for video_duration, _ in videos) / 60.0
+    stages = {
+        name: {'p{}'.format(percent): percentile(values, percent) for percent in PERCENTILES}
+        for name, values in durations.items()
+    }
+    medians = [(stages[name]['p50'], name) for name, _, _ in STAGES if name in stages]
+    return {
+        'videos': len(videos),
+        'video_minutes': video_minutes,
+        'throughput': video_minutes / window_hours if window_hours else None,
+        'stages': stages,
+        'slowest_stage': max(medians)[1] if medians else None,
+        'unknown_duration': sum(1 for video_duration, _ in videos if video_duration is None),
+    }
+
+
+def get_report(since, until, organization=None):
+    """
+    Report pipeline throughput and stage durations of videos published within the window.
+
+    :return: `{'organizations': {organization: summary}, 'presets': {preset: summary}, 'all': summary}`, see
+        `summarize`
+    """
+    telemetry = AzureVideoTelemetry.objects.filter(published__gte=since, published__lt=until)
+    if organization is not None:
+        telemetry = telemetry.filter(organization=organization)
+    by_organization, by_preset, all_videos = defaultdict(list), defaultdict(list), []
+    for row in telemetry.values_list('organization', 'preset', 'video_duration', *TIMESTAMPS).iterator():
+        video = (row[2], get_stage_durations(row[3:]))
+        by_organization[row[0]].append(video)
+        by_preset[row[1]].append(video)
+        all_videos.append(video)
+
+    window_hours = (until - since).total_seconds() / 3600
+    return {
+        'organizations': {name: summarize(videos, window_hours) for name, videos in by_organization.items()},
+        'presets': {name: summarize(videos, window_hours) for name, videos in by_preset.items()},
+        'all': summarize(all_videos, window_hours),
+    }
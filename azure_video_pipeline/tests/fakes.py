@@ -0,0 +1,151 @@
+"""
+Local stand-ins of Azure services for tests.
+"""
+import base64
+from collections import OrderedDict
+import hashlib
+import itertools
+import threading
+import time
+
+from azure.common import AzureHttpError
+from azure.storage.blob.models import BlobBlock, BlobBlockList
+from azure.storage.queue.models import QueueMessage
+
+
+class LocalBlobService(object):
+    """
+    In-memory stand-in of `azure.storage.blob.BlobService` block blob API.
+
+    Keeps uncommitted blocks apart from blob content the way Azure does, so partial and resumed uploads
+    behave as they would against Blob storage. `fail_after_blocks` emulates connection loss: Put Block
+    requests beyond that number fail.
+    """
+
+    def __init__(self, fail_after_blocks=None):
+        self.blobs = {}
+        self.uncommitted_blocks = {}
+        self.put_block_calls = []
+        self.fail_after_blocks = fail_after_blocks
+        self._lock = threading.Lock()
+
+    def put_block(self, container_name, blob_name, block, blockid, content_md5=None, x_ms_lease_id=None):
+        with self._lock:
+            if self.fail_after_blocks is not None and len(self.put_block_calls) >= self.fail_after_blocks:
+                raise AzureHttpError('Connection lost', 500)
+            self.put_block_calls.append(blockid)
+            if content_md5 is not None and content_md5 != base64.b64encode(hashlib.md5(block).digest()):
+                raise AzureHttpError('Md5Mismatch', 400)
+            self.uncommitted_blocks.setdefault((container_name, blob_name), OrderedDict())[blockid] = block
+
+    def put_block_list(self, container_name, blob_name, block_list, content_md5=None, x_ms_blob_content_type=None,
+                       x_ms_blob_content_md5=None, **kwargs):
+        with self._lock:
+            key = (container_name, blob_name)
+            available = dict(self.blobs.get(key, {}).get('blocks', []))
+            available.update(self.uncommitted_blocks.get(key, {}))
+            if any(block_id not in available for block_id in block_list):
+                raise AzureHttpError('InvalidBlockList', 400)
+            blocks = [(block_id, available[block_id]) for block_id in block_list]
+            content = b''.join(block for _, block in blocks)
+            if x_ms_blob_content_md5 is not None and (
+                    x_ms_blob_content_md5 != base64.b64encode(hashlib.md5(content).digest())):
+                raise AzureHttpError('Md5Mismatch', 400)
+            self.blobs[key] = {
+                'blocks': blocks, 'content': content, 'content_type': x_ms_blob_content_type,
+                'content_md5': x_ms_blob_content_md5,
+            }
+            self.uncommitted_blocks.pop(key, None)
+
+    def put_blob(self, container_name, blob_name, blob, x_ms_blob_type, x_ms_blob_content_type=None, **kwargs):
+        with self._lock:
+            # Azure computes Content-MD5 of blobs sent with a single Put Blob:
+            self.blobs[(container_name, blob_name)] = {
+                'blocks': [], 'content': blob, 'content_type': x_ms_blob_content_type,
+                'content_md5': base64.b64encode(hashlib.md5(blob).digest()),
+            }
+
+    def get_block_list(self, container_name, blob_name, snapshot=None, blocklisttype=None, x_ms_lease_id=None):
+        key = (container_name, blob_name)
+        if key not in self.blobs and key not in self.uncommitted_blocks:
+            raise AzureHttpError('BlobNotFound', 404)
+        block_list = BlobBlockList()
+        block_list.committed_blocks = [
+            BlobBlock(block_id, len(block)) for block_id, block in self.blobs.get(key, {}).get('blocks', [])
+        ]
+        block_list.uncommitted_blocks = [
+            BlobBlock(block_id, len(block)) for block_id, block in self.uncommitted_blocks.get(key, {}).items()
+        ]
+        return block_list
+
+    def get_blob_to_bytes(self, container_name, blob_name):
+        return self.blobs[(container_name, blob_name)]['content']
+
+    def get_blob_properties(self, container_name, blob_name, x_ms_lease_id=None):
+        blob = self.blobs.get((container_name, blob_name))
+        if blob is None:
+            raise AzureHttpError('BlobNotFound', 404)
+        properties = {'content-length': str(len(blob['content']))}
+        if blob.get('content_md5'):
+            properties['content-md5'] = blob['content_md5']
+        return properties
+
+    def get_blob(self, container_name, blob_name, snapshot=None, x_ms_range=None, **kwargs):
+        content = self.blobs[(container_name, blob_name)]['content']
+        if x_ms_range is None:
+            return content
+        start, end = x_ms_range.split('=')[1].split('-')
+        return content[int(start):int(end) + 1]
+
+
+class LocalQueueService(object):
+    """
+    In-memory stand-in of `azure.storage.queue.QueueService` messages API.
+
+    Received messages become invisible for `visibilitytimeout` seconds and are delivered again unless
+    they are deleted with their pop receipt, the way Azure Storage queues behave.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_queue(self, queue_name, x_ms_meta_name_values=None, fail_on_exist=False):
+        with self._lock:
+            created = queue_name not in self.queues
+            self.queues.setdefault(queue_name, [])
+        return created
+
+    def put_message(self, queue_name, message_text, visibilitytimeout=None, messagettl=None):
+        with self._lock:
+            self.queues[queue_name].append({
+                'id': str(next(self.ids)), 'text': message_text, 'visible_at': 0, 'pop_receipt': None
+            })
+
+    def get_messages(self, queue_name, numofmessages=None, visibilitytimeout=None):
+        now = time.time()
+        messages = []
+        with self._lock:
+            for stored in self.queues[queue_name]:
+                if len(messages) >= (numofmessages or 1):
+                    break
+                if stored['visible_at'] > now:
+                    continue
+                stored['visible_at'] = now + (visibilitytimeout or 30)
+                stored['pop_receipt'] = str(next(self.ids))
+                message = QueueMessage()
+                message.message_id = stored['id']
+                message.pop_receipt = stored['pop_receipt']
+                message.message_text = stored['text']
+                messages.append(message)
+        return messages
+
+    def delete_message(self, queue_name, message_id, popreceipt):
+        with self._lock:
+            queue = self.queues[queue_name]
+            for stored in queue:
+                if stored['id'] == message_id and stored['pop_receipt'] == popreceipt:
+                    queue.remove(stored)
+                    return
+        raise AzureHttpError('MessageNotFound', 404)
@@ -0,0 +1,62 @@
+import unittest
+
+from azure_video_pipeline import access_policies
+from azure_video_pipeline.media_service import AccessPolicyPermissions
+from django.core.cache import cache
+import mock
+
+
+class AccessPolicyPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        access_policies._access_policies.clear()
+        self.client = mock.Mock(rest_api_endpoint='https://rest_api_endpoint/api/')
+        self.client.iter_collection.return_value = iter([])
+        self.client.create_access_policy.return_value = {'Id': 'created_policy_id'}
+        self.pool = access_policies.AccessPolicyPool(self.client)
+
+    def test_existing_policy_is_discovered(self):
+        self.client.iter_collection.return_value = iter([
+            {'Id': 'other_duration_policy_id', 'DurationInMinutes': '60.0', 'Permissions': 2},
+            {'Id': 'policy_id', 'DurationInMinutes': '120.0', 'Permissions': 2},
+        ])
+
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'policy_id')
+        self.client.iter_collection.assert_called_once_with(
+            "AccessPolicies?$filter=Name eq 'OpenEdxVideoPipelineAccessPolicy_2_120'",
+            select=['Id', 'DurationInMinutes', 'Permissions'],
+        )
+        self.client.create_access_policy.assert_not_called()
+
+    def test_policy_is_created_once_and_shared(self):
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'created_policy_id')
+        access_policies._access_policies.clear()  # emulate another process
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'created_policy_id')
+
+        self.client.create_access_policy.assert_called_once_with(
+            'OpenEdxVideoPipelineAccessPolicy_2_120', 120, AccessPolicyPermissions.WRITE
+        )
+        self.assertIsNone(cache.get('{}.lock'.format(self.pool.get_cache_key(120, AccessPolicyPermissions.WRITE))))
+
+    def test_pool_is_keyed_by_duration_and_permissions(self):
+        self.client.create_access_policy.side_effect = [{'Id': 'write_policy_id'}, {'Id': 'read_policy_id'}]
+
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'write_policy_id')
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.READ), 'read_policy_id')
+
+    @mock.patch('azure_video_pipeline.access_policies.sleep')
+    def test_waits_for_concurrent_creation(self, sleep):
+        key = self.pool.get_cache_key(120, AccessPolicyPermissions.WRITE)
+        cache.add('{}.lock'.format(key), True)
+        sleep.side_effect = lambda seconds: cache.set(key, 'concurrent_policy_id')
+
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'concurrent_policy_id')
+        self.client.create_access_policy.assert_not_called()
+
+    def test_invalidate(self):
+        self.pool.acquire(120, AccessPolicyPermissions.WRITE)
+        self.pool.invalidate(120, AccessPolicyPermissions.WRITE)
+        self.client.create_access_policy.return_value = {'Id': 'new_policy_id'}
+
+        self.assertEqual(self.pool.acquire(120, AccessPolicyPermissions.WRITE), 'new_policy_id')
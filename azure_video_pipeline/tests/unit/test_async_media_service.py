@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+
+from azure_video_pipeline import async_media_service
+from azure_video_pipeline.async_media_service import AsyncMediaServiceClient, gather
+from azure_video_pipeline.media_service import LocatorTypes
+import mock
+
+
+class AsyncMediaServiceClientTests(unittest.TestCase):
+
+    def setUp(self):
+        # shared pool's workers are stopped, so calls of a test never outlive it:
+        self.addCleanup(async_media_service.terminate_pools)
+
+    def make_one(self):
+        client = mock.Mock(host='rest_api_endpoint')
+        client.get_job.side_effect = lambda job_id: {'Id': job_id, 'State': 3}
+        return AsyncMediaServiceClient(client=client)
+
+    def test_methods_return_async_results(self):
+        async_client = self.make_one()
+        results = [async_client.get_job('job_{}'.format(index)) for index in range(50)]
+
+        jobs = gather(results, timeout=5)
+
+        self.assertEqual([job['Id'] for job in jobs], ['job_{}'.format(index) for index in range(50)])
+
+    def test_method_arguments_are_passed_through(self):
+        async_client = self.make_one()
+        async_client.client.create_locator.return_value = {'Id': 'locator_id'}
+
+        locator = async_client.create_locator('policy_id', 'asset_id', locator_type=LocatorTypes.SAS).get(5)
+
+        self.assertEqual(locator, {'Id': 'locator_id'})
+        async_client.client.create_locator.assert_called_once_with(
+            'policy_id', 'asset_id', locator_type=LocatorTypes.SAS
+        )
+
+    def test_errors_are_raised_on_get(self):
+        async_client = self.make_one()
+        async_client.client.get_job.side_effect = ValueError
+
+        result = async_client.get_job('job_id')
+
+        with self.assertRaises(ValueError):
+            result.get(5)
+
+    def test_host_concurrency_limit(self):
+        async_client = self.make_one()
+        lock = threading.Lock()
+        state = {'running': 0, 'max_running': 0}
+
+        def get_job(job_id):
+            with lock:
+                state['running'] += 1
+                state['max_running'] = max(state['max_running'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+
+        async_client.client.get_job.side_effect = get_job
+        with mock.patch.dict(async_media_service._host_semaphores), \
+                mock.patch.dict('azure_video_pipeline.async_media_service.settings.FEATURES',
+                                {'AZURE_ASYNC_HOST_CONCURRENCY': 2}):
+            async_media_service._host_semaphores.clear()
+            gather([async_client.get_job(index) for index in range(10)], timeout=5)
+
+        self.assertEqual(state['max_running'], 2)
+
+    def test_refresh_token(self):
+        async_client = self.make_one()
+        async_client.client.credentials.token = {'access_token': 'access_token'}
+
+        self.assertEqual(async_client.refresh_token().get(5), {'access_token': 'access_token'})
+
+    def test_pool_is_kept_per_process(self):
+        pool = async_media_service.get_pool()
+        self.assertIs(async_media_service.get_pool(), pool)
+        with mock.patch('azure_video_pipeline.async_media_service.os.getpid', return_value=-1), \
+                mock.patch.dict(async_media_service._pools):
+            child_pool = async_media_service.get_pool()
+            self.addCleanup(child_pool.join)
+            self.addCleanup(child_pool.terminate)
+        self.assertIsNot(child_pool, pool)
@@ -0,0 +1,140 @@
+import json
+import unittest
+
+from azure_video_pipeline.batch import BatchRequest, parse_batch_response
+import mock
+from requests import HTTPError
+
+
+BATCH_RESPONSE = '\r\n'.join([
+    '--batchresponse_1',
+    'Content-Type: multipart/mixed; boundary=changesetresponse_1',
+    '',
+    '--changesetresponse_1',
+    'Content-Type: application/http',
+    'Content-Transfer-Encoding: binary',
+    '',
+    'HTTP/1.1 201 Created',
+    'Content-ID: 2',
+    'Content-Type: application/json;odata=minimalmetadata',
+    '',
+    '{"Id": "access_policy_id"}',
+    '--changesetresponse_1',
+    'Content-Type: application/http',
+    'Content-Transfer-Encoding: binary',
+    '',
+    'HTTP/1.1 201 Created',
+    'Content-ID: 1',
+    'Content-Type: application/json;odata=minimalmetadata',
+    '',
+    '{"Id": "file_id"}',
+    '--changesetresponse_1--',
+    '--batchresponse_1',
+    'Content-Type: application/http',
+    'Content-Transfer-Encoding: binary',
+    '',
+    'HTTP/1.1 404 Not Found',
+    'Content-Type: application/json',
+    '',
+    '{"odata.error": {"code": "ResourceNotFound"}}',
+    '--batchresponse_1--',
+    '',
+])
+
+
+class BatchRequestTests(unittest.TestCase):
+
+    def make_one(self, response_body=BATCH_RESPONSE, status_code=202):
+        client = mock.Mock(rest_api_endpoint='https://rest_api_endpoint/api/')
+        client.get_headers.return_value = {
+            'Accept': 'application/json',
+            'Authorization': 'token_type access_token',
+            'x-ms-version': '2.15',
+        }
+        client.session.post.return_value = mock.Mock(
+            status_code=status_code,
+            text=response_body,
+            headers={'Content-Type': 'multipart/mixed; boundary=batchresponse_1'},
+        )
+        return BatchRequest(client)
+
+    def test_parse_batch_response(self):
+        changesets = parse_batch_response('multipart/mixed; boundary=batchresponse_1', BATCH_RESPONSE)
+
+        self.assertEqual(len(changesets), 2)
+        self.assertEqual(changesets[0], [{'Id': 'file_id'}, {'Id': 'access_policy_id'}])
+        self.assertIsInstance(changesets[1][0], HTTPError)
+
+    def test_execute(self):
+        batch = self.make_one()
+        file_operation = batch.add('POST', 'Files', {'Name': 'file_name'})
+        access_policy_operation = batch.add('POST', 'AccessPolicies', {'Name': 'policy_name'})
+        batch.new_changeset()
+        batch.add('DELETE', "Locators('locator_id')")
+
+        results = batch.execute(raise_for_status=False)
+
+        self.assertEqual(results[file_operation], {'Id': 'file_id'})
+        self.assertEqual(results[access_policy_operation], {'Id': 'access_policy_id'})
+        self.assertIsInstance(results[2], HTTPError)
+
+        url = batch.client.session.post.call_args[0][0]
+        headers = batch.client.session.post.call_args[1]['headers']
+        body = batch.client.session.post.call_args[1]['data'].decode('utf-8')
+        self.assertEqual(url, 'https://rest_api_endpoint/api/$batch')
+        self.assertTrue(headers['Content-Type'].startswith('multipart/mixed; boundary=batch_'))
+        self.assertEqual(headers['Authorization'], 'token_type access_token')
+        self.assertIn('POST https://rest_api_endpoint/api/Files HTTP/1.1\r\n', body)
+        self.assertIn("DELETE https://rest_api_endpoint/api/Locators('locator_id') HTTP/1.1\r\n", body)
+        self.assertIn('\r\n\r\n{}\r\n'.format(json.dumps({'Name': 'policy_name'})), body)
+        self.assertIn('Content-ID: 3\r\n', body)
+        self.assertEqual(body.count('Content-Type: multipart/mixed; boundary=changeset_'), 2)
+        self.assertNotIn('Authorization', body)
+        self.assertIsNone(batch.client.session.post.call_args[1]['dedupe_key'])
+
+    def test_idempotent_batch_is_retried(self):
+        batch = self.make_one()
+        batch.add('MERGE', "Files('file_id')", {'ContentFileSize': '1'})
+        batch.new_changeset()
+        batch.add('DELETE', "Locators('locator_id')")
+
+        batch.execute(raise_for_status=False)
+
+        dedupe_key = batch.client.session.post.call_args[1]['dedupe_key']
+        self.assertTrue(dedupe_key.startswith('batch_'))
+
+    def test_execute_raises_for_failed_operation(self):
+        batch = self.make_one()
+        batch.add('POST', 'Files', {'Name': 'file_name'})
+        batch.add('POST', 'AccessPolicies', {'Name': 'policy_name'})
+        batch.new_changeset()
+        batch.add('DELETE', "Locators('locator_id')")
+
+        with self.assertRaises(HTTPError):
+            batch.execute()
+
+    def test_failed_changeset_error_is_shared_by_its_operations(self):
+        batch = self.make_one()
+        batch.add('POST', 'Files', {'Name': 'file_name'})
+        batch.add('POST', 'AccessPolicies', {'Name': 'policy_name'})
+        batch.new_changeset()
+        batch.add('DELETE', "Locators('first_locator_id')")
+        batch.add('DELETE', "Locators('second_locator_id')")
+
+        results = batch.execute(raise_for_status=False)
+
+        self.assertIsInstance(results[2], HTTPError)
+        self.assertIs(results[2], results[3])
+
+    def test_execute_failed_batch(self):
+        batch = self.make_one(status_code=400)
+        batch.client.session.post.return_value.raise_for_status.side_effect = HTTPError
+        batch.add('POST', 'Files', {'Name': 'file_name'})
+
+        with self.assertRaises(HTTPError):
+            batch.execute()
+
+    def test_execute_empty_batch(self):
+        batch = self.make_one()
+        self.assertEqual(batch.execute(), [])
+        batch.client.session.post.assert_not_called()
@@ -1,43 +1,50 @@
+import base64
+import hashlib
+import threading
 import unittest
 
+from azure.common import AzureHttpError
 from azure.storage.blob import BlobSharedAccessPermissions
 from azure_video_pipeline.blobs_service import BlobServiceClient
+from azure_video_pipeline.tests.fakes import LocalBlobService
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
 from freezegun import freeze_time
 import mock
 
 
 class BlobServiceClientTests(unittest.TestCase):
 
-    @mock.patch('azure_video_pipeline.blobs_service.CloudStorageAccount')
-    def make_one(self, cloud_storage_account):
+    def make_one(self):
         blobs_service_client = BlobServiceClient('account_name', 'account_key')
-        blobs_service_client.blob_service = mock.Mock(
-            generate_shared_access_signature=mock.Mock(return_value='sas_token'),
-            make_blob_url=mock.Mock(return_value='sas_url')
-        )
+        blobs_service_client.blob_service = mock.Mock()
         return blobs_service_client
 
-    @mock.patch('azure_video_pipeline.blobs_service.BlobServiceClient.get_shared_access_policy',
-                return_value={'id': 'shared_access_policy'})
-    def test_generate_url(self, get_shared_access_policy):
+    @mock.patch('azure_video_pipeline.blobs_service.get_sas_signer')
+    def test_generate_url(self, get_sas_signer):
+        get_sas_signer.return_value.make_blob_url.return_value = 'sas_url'
         blobs_service_client = self.make_one()
         sas_url = blobs_service_client.generate_url('uid:asset_id', 'blob_name', 123456789)
 
-        get_shared_access_policy.assert_called_once_with(
-            BlobSharedAccessPermissions.WRITE,
-            123456789
-        )
-        blobs_service_client.blob_service.generate_shared_access_signature.assert_called_once_with(
+        get_sas_signer.assert_called_once_with('account_name', 'account_key')
+        get_sas_signer().make_blob_url.assert_called_once_with(
             'asset-asset_id',
             'blob_name',
-            {'id': 'shared_access_policy'}
+            BlobSharedAccessPermissions.WRITE,
+            123456789
         )
-        blobs_service_client.blob_service.make_blob_url.assert_called_once_with(
-            'asset-asset_id',
-            'blob_name',
-            sas_token='sas_token')
         self.assertEqual(sas_url, 'sas_url')
 
+    @mock.patch('azure_video_pipeline.blobs_service.BlobService')
+    @mock.patch('azure_video_pipeline.blobs_service.get_session')
+    def test_blob_service_uses_pooled_session(self, get_session, blob_service):
+        blobs_service_client = BlobServiceClient('account_name', 'account_key')
+        blob_service.assert_not_called()
+
+        self.assertIs(blobs_service_client.blob_service, blob_service.return_value)
+        self.assertIs(blobs_service_client.blob_service, blob_service.return_value)
+        get_session.assert_called_once_with('https://account_name.blob.core.windows.net')
+        blob_service.assert_called_once_with('account_name', 'account_key', request_session=get_session())
+
     @mock.patch('azure_video_pipeline.blobs_service.SharedAccessPolicy',
                 return_value={'id': 'shared_access_policy'})
     @mock.patch('azure_video_pipeline.blobs_service.AccessPolicy',
@@ -59,3 +66,129 @@ class BlobServiceClientTests(unittest.TestCase):
             'w'
         )
         self.assertEqual(shared_access_policy_obj, {'id': 'shared_access_policy'})
+
+
+class BlobServiceClientUploadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BlobServiceClient('account_name', 'account_key')
+        self.client.blob_service = mock.Mock()
+        self.blocks = {}
+        self.client.blob_service.put_block.side_effect = self.put_block
+
+    def put_block(self, container_name, blob_name, block, block_id, content_md5):
+        self.assertEqual(content_md5, base64.b64encode(hashlib.md5(block).digest()))
+        self.blocks[block_id] = block
+
+    def assert_uploaded(self, block_ids, content):
+        self.assertEqual(b''.join(self.blocks[block_id] for block_id in block_ids), content)
+        self.client.blob_service.put_block_list.assert_called_once_with(
+            'container', 'blob', block_ids,
+            x_ms_blob_content_type='video/mp4',
+            x_ms_blob_content_md5=base64.b64encode(hashlib.md5(content).digest()),
+        )
+
+    def test_upload_in_memory_file(self):
+        content = b'0123456789' * 10
+        uploaded_file = SimpleUploadedFile('video.mp4', content, content_type='video/mp4')
+
+        block_ids = self.client.upload_file('container', 'blob', uploaded_file, block_size=16, workers=3)
+
+        self.assertEqual(block_ids, ['block-{:08d}'.format(index) for index in range(7)])
+        self.assert_uploaded(block_ids, content)
+
+    def test_upload_file_on_disk_is_memory_mapped(self):
+        content = b'0123456789' * 10
+        uploaded_file = TemporaryUploadedFile('video.mp4', 'video/mp4', len(content), None)
+        uploaded_file.write(content)
+        uploaded_file.flush()
+
+        with mock.patch('azure_video_pipeline.blobs_service.mmap.mmap', wraps=__import__('mmap').mmap) as mmap:
+            block_ids = self.client.upload_file('container', 'blob', uploaded_file, block_size=32, workers=2)
+        uploaded_file.close()
+
+        self.assertTrue(mmap.called)
+        self.assertEqual(len(block_ids), 4)
+        self.assert_uploaded(block_ids, content)
+
+    def test_small_file_is_uploaded_with_single_request(self):
+        uploaded_file = SimpleUploadedFile('captions.vtt', b'WEBVTT', content_type='text/vtt')
+
+        self.assertEqual(self.client.upload_file('container', 'blob', uploaded_file, block_size=16), [])
+
+        content_md5 = base64.b64encode(hashlib.md5(b'WEBVTT').digest())
+        self.client.blob_service.put_blob.assert_called_once_with(
+            'container', 'blob', b'WEBVTT', 'BlockBlob',
+            content_md5=content_md5, x_ms_blob_content_type='text/vtt', x_ms_blob_content_md5=content_md5,
+        )
+        self.client.blob_service.put_block.assert_not_called()
+
+    def test_failed_block_is_not_retried_on_top_of_session(self):
+        self.client.blob_service.put_block.side_effect = AzureHttpError('Server busy', 503)
+        uploaded_file = SimpleUploadedFile('video.mp4', b'x' * 16, content_type='video/mp4')
+
+        with self.assertRaises(AzureHttpError):
+            self.client.upload_file('container', 'blob', uploaded_file, block_size=16, workers=2)
+        self.assertEqual(self.client.blob_service.put_block.call_count, 1)
+
+    def test_permanent_failure_stops_upload(self):
+        self.client.blob_service.put_block.side_effect = AzureHttpError('Forbidden', 403)
+        uploaded_file = SimpleUploadedFile('video.mp4', b'x' * 1000, content_type='video/mp4')
+
+        with self.assertRaises(AzureHttpError):
+            self.client.upload_file('container', 'blob', uploaded_file, block_size=10, workers=2)
+        self.assertLess(self.client.blob_service.put_block.call_count, 100)
+        self.client.blob_service.put_block_list.assert_not_called()
+
+    def test_blocks_in_flight_are_bounded_by_workers(self):
+        in_flight = []
+        lock = threading.Lock()
+        peak = [0]
+
+        def put_block(container_name, blob_name, block, block_id, content_md5):
+            with lock:
+                in_flight.append(block_id)
+                peak[0] = max(peak[0], len(in_flight))
+            threading.Event().wait(0.001)
+            with lock:
+                in_flight.remove(block_id)
+
+        self.client.blob_service.put_block.side_effect = put_block
+        uploaded_file = SimpleUploadedFile('video.mp4', b'x' * 400, content_type='video/mp4')
+
+        self.client.upload_file('container', 'blob', uploaded_file, block_size=10, workers=3)
+
+        self.assertLessEqual(peak[0], 3)
+
+
+class BlobServiceClientContentMD5Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = BlobServiceClient('account_name', 'account_key')
+        self.client.blob_service = LocalBlobService()
+        self.content = b'0123456789' * 10
+        self.content_md5 = base64.b64encode(hashlib.md5(self.content).digest())
+
+    def test_stored_content_md5_is_used(self):
+        self.client.blob_service.put_blob('container', 'blob', self.content, 'BlockBlob')
+
+        with mock.patch.object(self.client.blob_service, 'get_blob') as get_blob:
+            self.assertEqual(self.client.get_content_md5('container', 'blob'), (self.content_md5, 100))
+        get_blob.assert_not_called()
+
+    @mock.patch('azure_video_pipeline.blobs_service.MAX_BLOCK_SIZE', 16)
+    def test_blob_without_content_md5_is_hashed_by_ranges(self):
+        self.client.blob_service.put_block('container', 'blob', self.content, 'block-00000000')
+        self.client.commit_blocks('container', 'blob', ['block-00000000'])
+
+        blob_service = self.client.blob_service
+        with mock.patch.object(blob_service, 'get_blob', wraps=blob_service.get_blob) as get_blob:
+            self.assertEqual(self.client.get_content_md5('container', 'blob'), (self.content_md5, 100))
+        self.assertEqual(get_blob.call_count, 7)
+        self.assertEqual(get_blob.call_args[1], {'x_ms_range': 'bytes=96-99'})
+
+    def test_large_blob_is_not_hashed(self):
+        self.client.blob_service.put_block('container', 'blob', self.content, 'block-00000000')
+        self.client.commit_blocks('container', 'blob', ['block-00000000'])
+
+        self.assertEqual(self.client.get_content_md5('container', 'blob', max_size=99), (None, 100))
@@ -0,0 +1,44 @@
+import unittest
+
+from azure_video_pipeline.caching import LRUCache
+from freezegun import freeze_time
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_set_delete(self):
+        lru_cache = LRUCache()
+        lru_cache.set('key', 'value')
+        self.assertEqual(lru_cache.get('key'), 'value')
+        self.assertIn('key', lru_cache)
+
+        lru_cache.delete('key')
+        self.assertIsNone(lru_cache.get('key'))
+        self.assertEqual(lru_cache.get('key', 'default'), 'default')
+
+    def test_least_recently_used_evicted(self):
+        lru_cache = LRUCache(max_size=2)
+        lru_cache.set('first', 1)
+        lru_cache.set('second', 2)
+        lru_cache.get('first')
+        lru_cache.set('third', 3)
+
+        self.assertEqual(len(lru_cache), 2)
+        self.assertNotIn('second', lru_cache)
+        self.assertEqual(lru_cache.get('first'), 1)
+        self.assertEqual(lru_cache.get('third'), 3)
+
+    def test_expired_entries(self):
+        lru_cache = LRUCache(ttl=60)
+        with freeze_time('2017-11-01 00:00:00'):
+            lru_cache.set('key', 'value')
+            lru_cache.set('long_living_key', 'value', ttl=600)
+        with freeze_time('2017-11-01 00:01:00'):
+            self.assertIsNone(lru_cache.get('key'))
+            self.assertEqual(lru_cache.get('long_living_key'), 'value')
+
+    def test_clear(self):
+        lru_cache = LRUCache()
+        lru_cache.set('key', 'value')
+        lru_cache.clear()
+        self.assertEqual(len(lru_cache), 0)
@@ -0,0 +1,130 @@
+import base64
+import hashlib
+
+from azure_video_pipeline import dedupe
+from azure_video_pipeline.media_service import AccessPolicyPermissions, LocatorTypes, MediaServiceClient
+from azure_video_pipeline.models import AzureEncodedAsset
+from azure_video_pipeline.tests.fakes import LocalBlobService
+from django.test import TestCase
+import mock
+from requests import HTTPError
+
+
+CONTENT = b'lecture video' * 100
+
+
+class AssetFingerprintTests(TestCase):
+
+    def setUp(self):
+        self.blob_service = LocalBlobService()
+        patcher = mock.patch('azure_video_pipeline.blobs_service.BlobService', return_value=self.blob_service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.media_service_client = mock.Mock(storage_account_name='account_name', storage_key='account_key')
+        self.media_service_client.get_asset_files.return_value = [{'Name': 'video.mp4'}]
+
+    def test_fingerprint_is_md5_and_size(self):
+        self.blob_service.put_blob('asset-asset_id', 'video.mp4', CONTENT, 'BlockBlob')
+
+        fingerprint = dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id')
+
+        self.assertEqual(fingerprint, u'{}-{}'.format(hashlib.md5(CONTENT).hexdigest(), len(CONTENT)))
+        self.media_service_client.get_asset_files.assert_called_once_with('nb:cid:UUID:asset_id')
+
+    def test_blob_without_content_md5_is_hashed(self):
+        self.blob_service.put_block('asset-asset_id', 'video.mp4', CONTENT, 'block-00000000')
+        self.blob_service.put_block_list('asset-asset_id', 'video.mp4', ['block-00000000'])
+
+        self.assertEqual(
+            dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id'),
+            u'{}-{}'.format(hashlib.md5(CONTENT).hexdigest(), len(CONTENT))
+        )
+
+    @mock.patch.dict('azure_video_pipeline.dedupe.settings.FEATURES', {'AZURE_DEDUPE_MAX_HASH_SIZE': 100})
+    def test_large_blob_without_content_md5_is_not_fingerprinted(self):
+        self.blob_service.put_block('asset-asset_id', 'video.mp4', CONTENT, 'block-00000000')
+        self.blob_service.put_block_list('asset-asset_id', 'video.mp4', ['block-00000000'])
+
+        self.assertIsNone(dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id'))
+
+    def test_missing_blob_is_not_fingerprinted(self):
+        self.assertIsNone(dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id'))
+
+    @mock.patch.dict('azure_video_pipeline.dedupe.settings.FEATURES', {'AZURE_DEDUPE_ENABLED': False})
+    def test_dedupe_can_be_disabled(self):
+        self.blob_service.put_blob('asset-asset_id', 'video.mp4', CONTENT, 'BlockBlob')
+
+        self.assertIsNone(dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id'))
+        self.media_service_client.get_asset_files.assert_not_called()
+
+    def test_content_md5_is_decoded(self):
+        content_md5 = base64.b64encode(hashlib.md5(b'').digest())
+        with mock.patch.object(dedupe.BlobServiceClient, 'get_content_md5', return_value=(content_md5, 0)):
+            self.assertEqual(
+                dedupe.get_asset_fingerprint(self.media_service_client, 'nb:cid:UUID:asset_id'),
+                u'd41d8cd98f00b204e9800998ecf8427e-0'
+            )
+
+
+class ReuseEncodedAssetTests(TestCase):
+
+    def setUp(self):
+        self.media_service_client = mock.Mock()
+        dedupe.register_encoded_asset('org', 'video_1', 'encoded_asset_id', 'fingerprint')
+
+    def test_nothing_to_reuse(self):
+        self.assertIsNone(dedupe.reuse_encoded_asset(self.media_service_client, 'other_org', 'video_2', 'fingerprint'))
+        self.assertIsNone(dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'other'))
+        self.media_service_client.create_pooled_locators.assert_not_called()
+
+    def test_published_asset_is_reused(self):
+        self.media_service_client.get_asset_locator.return_value = {'Id': 'locator_id'}
+
+        encoded_asset = dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'fingerprint')
+
+        self.assertEqual(encoded_asset.edx_video_id, 'video_1')
+        self.media_service_client.create_pooled_locators.assert_not_called()
+        self.assertEqual(AzureEncodedAsset.objects.get(edx_video_id='video_2').asset_id, 'encoded_asset_id')
+
+    @mock.patch('azure_video_pipeline.media_service.CachedServicePrincipalCredentials')
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_cached_collection', return_value=[])
+    def test_reused_asset_is_played(self, get_cached_collection, _credentials):
+        self.media_service_client.get_asset_locator.return_value = {'Id': 'locator_id'}
+        dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'fingerprint')
+        media_service_client = MediaServiceClient({'rest_api_endpoint': 'https://account/api/'})
+
+        self.assertEqual(
+            media_service_client.get_input_asset_by_video_id('video_2', 'ENCODED'), {'Id': 'encoded_asset_id'}
+        )
+        self.assertIsNone(media_service_client.get_input_asset_by_video_id('video_2'))
+        self.assertIsNone(media_service_client.get_input_asset_by_video_id('video_3', 'ENCODED'))
+
+    def test_missing_locators_are_created(self):
+        self.media_service_client.get_asset_locator.side_effect = [None, {'Id': 'locator_id'}]
+
+        self.assertIsNotNone(dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'fingerprint'))
+
+        self.media_service_client.create_pooled_locators.assert_called_once_with(
+            'encoded_asset_id',
+            locator_types=[LocatorTypes.OnDemandOrigin],
+            duration_in_minutes=dedupe.PUBLISHED_ACCESS_POLICY_DURATION,
+            permissions=AccessPolicyPermissions.READ
+        )
+
+    def test_unavailable_asset_is_forgotten(self):
+        self.media_service_client.get_asset_locator.side_effect = HTTPError(
+            'Not Found', response=mock.Mock(status_code=404)
+        )
+
+        self.assertIsNone(dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'fingerprint'))
+
+        self.assertFalse(AzureEncodedAsset.objects.exists())
+
+    def test_asset_is_kept_on_failed_check(self):
+        for status_code in (429, 503):
+            self.media_service_client.get_asset_locator.side_effect = HTTPError(
+                'Service Unavailable', response=mock.Mock(status_code=status_code)
+            )
+            self.assertIsNone(dedupe.reuse_encoded_asset(self.media_service_client, 'org', 'video_2', 'fingerprint'))
+
+        self.assertEqual(AzureEncodedAsset.objects.get(edx_video_id='video_1').asset_id, 'encoded_asset_id')
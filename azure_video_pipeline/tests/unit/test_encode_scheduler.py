@@ -0,0 +1,130 @@
+from azure_video_pipeline import encode_scheduler, job_poller
+from azure_video_pipeline.models import AzureEncodeJob, AzureEncodeRequest
+from django.core.cache import cache
+from django.test import TestCase
+from freezegun import freeze_time
+import mock
+from requests import ConnectionError
+
+
+class EncodeSchedulerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        encode_scheduler.reset_metrics()
+        self.clients = {}
+        self.submitted = []
+        self.features = mock.patch.dict('azure_video_pipeline.encode_scheduler.settings.FEATURES', {
+            'AZURE_ENCODE_ACCOUNT_CONCURRENCY': 4
+        })
+        self.features.start()
+        self.addCleanup(self.features.stop)
+
+    def get_client(self, organization):
+        return self.clients.setdefault(organization, mock.Mock(rest_api_endpoint='https://account/api/'))
+
+    def submit(self, client, encode_request):
+        self.submitted.append(encode_request.edx_video_id)
+        job_id = 'job_{}'.format(encode_request.edx_video_id)
+        job_poller.track_job(job_id, encode_request.organization)
+        return job_id
+
+    def enqueue(self, organization, count, input_size=None):
+        for index in range(count):
+            encode_scheduler.enqueue_encode(
+                organization, '{}_{}'.format(organization, index), 'asset_id', input_size=input_size
+            )
+
+    def test_account_concurrency_is_shared_fairly(self):
+        with freeze_time('2017-11-01 00:00:00'):
+            self.enqueue('bulk_org', 10)
+        with freeze_time('2017-11-01 00:01:00'):
+            self.enqueue('other_org', 2)
+            self.assertEqual(encode_scheduler.submit_pending_encodes(self.get_client, self.submit), 4)
+
+        self.assertEqual(sorted(self.submitted), ['bulk_org_0', 'bulk_org_1', 'other_org_0', 'other_org_1'])
+        self.assertEqual(encode_scheduler.get_pending_requests().count(), 8)
+        self.assertEqual(encode_scheduler.get_metrics()[('wait_seconds', 'bulk_org')], 120)
+
+    def test_finished_jobs_free_slots(self):
+        self.enqueue('org', 6)
+        encode_scheduler.submit_pending_encodes(self.get_client, self.submit)
+        AzureEncodeJob.objects.filter(job_id='job_org_0').update(state=AzureEncodeJob.FINISHED)
+
+        self.assertEqual(encode_scheduler.submit_pending_encodes(self.get_client, self.submit), 1)
+        self.assertEqual(encode_scheduler.submit_pending_encodes(self.get_client, self.submit), 0)
+        self.assertEqual(self.submitted, ['org_{}'.format(index) for index in range(5)])
+
+    def test_organization_concurrency_and_weights(self):
+        self.enqueue('org_1', 5)
+        self.enqueue('org_2', 5)
+        with mock.patch.dict('azure_video_pipeline.encode_scheduler.settings.FEATURES', {
+            'AZURE_ENCODE_ACCOUNT_CONCURRENCY': 10, 'AZURE_ENCODE_ORG_CONCURRENCY': 3,
+            'AZURE_ENCODE_ORG_WEIGHTS': {'org_1': 2},
+        }):
+            encode_scheduler.submit_pending_encodes(self.get_client, self.submit)
+
+        self.assertEqual(self.submitted[:3], ['org_1_0', 'org_2_0', 'org_1_1'])
+        self.assertEqual(encode_scheduler.get_running_jobs(), {'org_1': 3, 'org_2': 3})
+
+    def test_short_videos_are_submitted_first(self):
+        self.enqueue('long', 1, input_size=10 ** 10)
+        self.enqueue('short', 1, input_size=10 ** 6)
+        with mock.patch.dict('azure_video_pipeline.encode_scheduler.settings.FEATURES', {
+            'AZURE_ENCODE_ACCOUNT_CONCURRENCY': 1
+        }):
+            encode_scheduler.submit_pending_encodes(self.get_client, self.submit)
+
+        self.assertEqual(self.submitted, ['short_0'])
+        self.assertEqual(AzureEncodeRequest.objects.get(edx_video_id='short_0').lane, AzureEncodeRequest.PRIORITY)
+
+    def test_failed_submission_stays_pending(self):
+        self.enqueue('org', 2)
+
+        encode_scheduler.submit_pending_encodes(self.get_client, mock.Mock(side_effect=ConnectionError))
+
+        self.assertEqual(encode_scheduler.get_pending_requests().count(), 2)
+        self.assertEqual(encode_scheduler.get_metrics(), {})
+
+    def test_rejected_submission_is_dropped(self):
+        self.enqueue('org', 2)
+
+        submitted = encode_scheduler.submit_pending_encodes(
+            self.get_client, lambda client, encode_request: None if encode_request.edx_video_id == 'org_0' else
+            self.submit(client, encode_request)
+        )
+
+        self.assertEqual(submitted, 1)
+        self.assertEqual(
+            list(AzureEncodeRequest.objects.values_list('edx_video_id', 'job_id')), [('org_1', 'job_org_1')]
+        )
+        self.assertEqual(encode_scheduler.get_metrics()[('failed', 'org')], 1)
+
+    def test_concurrency_defaults_to_reserved_units(self):
+        client = self.get_client('org')
+        client.get_encoding_reserved_units.return_value = 3
+        with mock.patch.dict('azure_video_pipeline.encode_scheduler.settings.FEATURES', {
+            'AZURE_ENCODE_ACCOUNT_CONCURRENCY': None
+        }):
+            self.assertEqual(encode_scheduler.get_account_concurrency(client), 3)
+            self.assertEqual(encode_scheduler.get_account_concurrency(client), 3)
+            client.get_encoding_reserved_units.return_value = 0
+            cache.clear()
+            self.assertEqual(encode_scheduler.get_account_concurrency(client), 1)
+        self.assertEqual(client.get_encoding_reserved_units.call_count, 2)
+
+    def test_single_scheduler_runs_at_a_time(self):
+        self.enqueue('org', 1)
+        cache.add(encode_scheduler.SCHEDULER_LOCK_KEY, True)
+
+        self.assertEqual(encode_scheduler.submit_pending_encodes(self.get_client, self.submit), 0)
+        self.assertEqual(self.submitted, [])
+
+    def test_queue_stats(self):
+        with freeze_time('2017-11-01 00:00:00'):
+            self.enqueue('org', 6)
+        with freeze_time('2017-11-01 00:00:30'):
+            encode_scheduler.submit_pending_encodes(self.get_client, self.submit)
+            self.assertEqual(encode_scheduler.get_queue_stats(), {
+                'org': {'pending': 2, 'wait': 30, 'running': 4}
+            })
@@ -0,0 +1,114 @@
+import base64
+import json
+
+from azure_video_pipeline import job_notifications, job_poller
+from azure_video_pipeline.media_service import JobStatus
+from azure_video_pipeline.tests.fakes import LocalQueueService
+from django.core.cache import cache
+from django.test import TestCase
+import mock
+from requests import HTTPError
+
+
+def make_notification(job_id, new_state, old_state='Processing'):
+    return json.dumps({
+        'MessageVersion': '1.0',
+        'EventType': 'JobStateChange',
+        'TimeStamp': '2017-11-01T00:00:00',
+        'Properties': {'JobId': job_id, 'OldState': old_state, 'NewState': new_state},
+    })
+
+
+@mock.patch.dict('azure_video_pipeline.job_notifications.settings.FEATURES', {'AZURE_JOB_NOTIFICATIONS_QUEUE': 'jobs'})
+class JobNotificationsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        job_notifications._created_queues.clear()
+        self.queue_service = LocalQueueService()
+        self.queue_service.create_queue('jobs')
+        patcher = mock.patch('azure_video_pipeline.job_notifications.QueueService', return_value=self.queue_service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.media_service_client = mock.Mock(storage_account_name='account_name', storage_key='account_key')
+        self.dispatched = []
+
+    def dispatch(self, job_id, state, organization, fingerprint):
+        self.dispatched.append((job_id, state, organization, fingerprint))
+
+    def get_client(self, organization):
+        return self.media_service_client
+
+    def test_parse_notification(self):
+        notification = make_notification('job_id', 'Finished')
+
+        self.assertEqual(job_notifications.parse_notification(notification), ('job_id', JobStatus.FINISHED))
+        self.assertEqual(
+            job_notifications.parse_notification(base64.b64encode(notification)), ('job_id', JobStatus.FINISHED)
+        )
+        self.assertIsNone(job_notifications.parse_notification('garbage'))
+        self.assertIsNone(job_notifications.parse_notification(json.dumps({'EventType': 'TaskStateChange'})))
+
+    def test_final_states_are_dispatched_in_batches(self):
+        for index in range(40):
+            job_poller.track_job('job_{}'.format(index), 'org')
+            self.queue_service.put_message('jobs', make_notification('job_{}'.format(index), 'Finished'))
+        self.queue_service.put_message('jobs', make_notification('unknown_job', 'Finished'))
+        self.queue_service.put_message('jobs', 'garbage')
+
+        queue_service = self.queue_service
+        with mock.patch.object(queue_service, 'get_messages', wraps=queue_service.get_messages) as get_messages:
+            consumed = job_notifications.consume_job_notifications(self.get_client, self.dispatch)
+
+        self.assertEqual(consumed, 42)
+        self.assertEqual(get_messages.call_count, 2)
+        self.assertEqual(sorted(self.dispatched), sorted(
+            ('job_{}'.format(index), JobStatus.FINISHED, 'org', '') for index in range(40)
+        ))
+        self.assertEqual(self.queue_service.queues['jobs'], [])
+
+    def test_polled_job_is_not_dispatched_again(self):
+        job_poller.track_job('job_id', 'org')
+        client = mock.Mock()
+        client.get_jobs.return_value = [{'Id': 'job_id', 'State': JobStatus.FINISHED}]
+        job_poller.poll_jobs(lambda organization: client, self.dispatch)
+        self.queue_service.put_message('jobs', make_notification('job_id', 'Finished'))
+
+        job_notifications.consume_job_notifications(self.get_client, self.dispatch)
+
+        self.assertEqual(len(self.dispatched), 1)
+
+    def test_failed_dispatch_leaves_messages_in_queue(self):
+        job_poller.track_job('job_id', 'org')
+        self.queue_service.put_message('jobs', make_notification('job_id', 'Error'))
+
+        with self.assertRaises(RuntimeError):
+            job_notifications.consume_job_notifications(self.get_client, mock.Mock(side_effect=RuntimeError))
+
+        self.assertEqual(len(self.queue_service.queues['jobs']), 1)
+
+    def test_nothing_is_consumed_without_jobs_in_flight(self):
+        self.queue_service.put_message('jobs', make_notification('job_id', 'Finished'))
+
+        self.assertEqual(job_notifications.consume_job_notifications(self.get_client, self.dispatch), 0)
+
+    def test_notification_endpoint_is_registered_with_queue(self):
+        self.queue_service.queues.clear()
+        self.media_service_client.get_notification_endpoint_id.return_value = 'endpoint_id'
+
+        self.assertEqual(job_notifications.get_notification_endpoint_id(self.media_service_client), 'endpoint_id')
+
+        self.assertIn('jobs', self.queue_service.queues)
+        self.media_service_client.get_notification_endpoint_id.assert_called_once_with('jobs')
+
+    def test_unavailable_notification_endpoint_falls_back_to_polling(self):
+        self.media_service_client.get_notification_endpoint_id.side_effect = HTTPError('Forbidden')
+
+        self.assertIsNone(job_notifications.get_notification_endpoint_id(self.media_service_client))
+
+    def test_notifications_can_be_off(self):
+        with mock.patch.dict('azure_video_pipeline.job_notifications.settings.FEATURES', {
+            'AZURE_JOB_NOTIFICATIONS_QUEUE': None
+        }):
+            self.assertIsNone(job_notifications.get_notification_endpoint_id(self.media_service_client))
+        self.media_service_client.get_notification_endpoint_id.assert_not_called()
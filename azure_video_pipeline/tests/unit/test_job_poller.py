@@ -0,0 +1,182 @@
+from datetime import datetime
+
+from azure_video_pipeline import job_poller
+from azure_video_pipeline.media_service import JobStatus
+from azure_video_pipeline.models import AzureEncodeJob
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from freezegun import freeze_time
+import mock
+from requests import HTTPError
+
+
+class JobPollerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {}
+        self.dispatched = []
+
+    def get_client(self, organization):
+        return self.clients.setdefault(organization, mock.Mock())
+
+    def dispatch(self, job_id, state, organization, fingerprint):
+        self.dispatched.append((job_id, state, organization, fingerprint))
+
+    def set_states(self, organization, states):
+        self.get_client(organization).get_jobs.return_value = [
+            {'Id': job_id, 'State': state} for job_id, state in states.items()
+        ]
+
+    def test_track_job(self):
+        job_poller.track_job('job_id', 'org', 'fingerprint', edx_video_id='video_id', input_asset_id='asset_id')
+        job_poller.track_job('job_id', 'org')
+
+        encode_job = AzureEncodeJob.objects.get(job_id='job_id')
+        self.assertEqual(encode_job.edx_video_id, 'video_id')
+        self.assertEqual(encode_job.input_asset_id, 'asset_id')
+        self.assertEqual(encode_job.state, JobStatus.QUEUED)
+        self.assertEqual(list(job_poller.get_tracked_jobs()), [encode_job])
+
+    def test_jobs_are_fetched_in_bulk_per_organization(self):
+        job_poller.track_job('job_1', 'org_1')
+        job_poller.track_job('job_2', 'org_1')
+        job_poller.track_job('job_3', 'org_2')
+        self.set_states('org_1', {'job_1': JobStatus.PROCESSING, 'job_2': JobStatus.QUEUED})
+        self.set_states('org_2', {'job_3': JobStatus.SCHEDULED})
+
+        with freeze_time('2017-11-01 00:01:00'):
+            self.assertEqual(job_poller.poll_jobs(self.get_client, self.dispatch), 3)
+
+        self.assertEqual(sorted(self.get_client('org_1').get_jobs.call_args[0][0]), ['job_1', 'job_2'])
+        self.get_client('org_2').get_jobs.assert_called_once_with(
+            ['job_3'], select=['Id', 'State', 'StartTime', 'EndTime', 'Tasks/Progress'], expand=['Tasks']
+        )
+        self.assertEqual(self.dispatched, [])
+        encode_job = AzureEncodeJob.objects.get(job_id='job_1')
+        self.assertEqual(encode_job.state, JobStatus.PROCESSING)
+        self.assertEqual(encode_job.started.strftime('%H:%M'), '00:01')
+        self.assertIsNone(AzureEncodeJob.objects.get(job_id='job_2').started)
+
+    def test_final_states_are_dispatched_once(self):
+        with freeze_time('2017-11-01 00:00:00'):
+            job_poller.track_job('job_1', 'org', fingerprint='fingerprint')
+            job_poller.track_job('job_2', 'org')
+        self.set_states('org', {'job_1': JobStatus.FINISHED, 'job_2': JobStatus.PROCESSING})
+
+        with freeze_time('2017-11-01 00:10:00'):
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+
+        self.assertEqual(self.dispatched, [('job_1', JobStatus.FINISHED, 'org', 'fingerprint')])
+        self.assertEqual(AzureEncodeJob.objects.get(job_id='job_1').duration, 600)
+
+    def test_unprocessed_final_state_is_dispatched_again(self):
+        job_poller.track_job('job_1', 'org')
+        self.set_states('org', {'job_1': JobStatus.ERROR})
+
+        with freeze_time('2017-11-01 00:00:00'):
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+        with freeze_time('2017-11-01 00:11:00'):
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+            job_poller.untrack_job('job_1', output_asset_id='output_asset_id')
+            self.assertEqual(job_poller.poll_jobs(self.get_client, self.dispatch), 0)
+
+        self.assertEqual(len(self.dispatched), 2)
+        self.assertEqual(AzureEncodeJob.objects.get(job_id='job_1').output_asset_id, 'output_asset_id')
+
+    def test_missing_job_is_not_tracked_anymore(self):
+        job_poller.track_job('job_1', 'org')
+        self.set_states('org', {})
+
+        self.assertEqual(job_poller.poll_jobs(self.get_client, self.dispatch), 0)
+        self.assertFalse(job_poller.get_tracked_jobs().exists())
+
+    def test_failed_lookup_keeps_jobs_tracked(self):
+        job_poller.track_job('job_1', 'org_1')
+        job_poller.track_job('job_2', 'org_2')
+        self.get_client('org_1').get_jobs.side_effect = HTTPError('Service Unavailable')
+        self.set_states('org_2', {'job_2': JobStatus.CANCELED})
+
+        self.assertEqual(job_poller.poll_jobs(self.get_client, self.dispatch), 2)
+        self.assertEqual(self.dispatched, [('job_2', JobStatus.CANCELED, 'org_2', '')])
+
+    @mock.patch('azure_video_pipeline.job_poller.QUERY_CHUNK_SIZE', 2)
+    def test_states_are_stored_in_chunks(self):
+        for index in range(5):
+            job_poller.track_job('job_{}'.format(index), 'org')
+        self.set_states('org', {'job_{}'.format(index): JobStatus.FINISHED for index in range(5)})
+
+        job_poller.poll_jobs(self.get_client, self.dispatch)
+
+        self.assertEqual(len(self.dispatched), 5)
+
+    def test_single_poller_is_scheduled(self):
+        self.assertTrue(job_poller.acquire_schedule(job_poller.POLLER_SCHEDULED_KEY, 30))
+        self.assertFalse(job_poller.acquire_schedule(job_poller.POLLER_SCHEDULED_KEY, 30))
+        job_poller.release_schedule(job_poller.POLLER_SCHEDULED_KEY)
+        self.assertTrue(job_poller.acquire_schedule(job_poller.POLLER_SCHEDULED_KEY, 30))
+
+    def test_polling_is_fallback_when_notifications_are_enabled(self):
+        self.assertEqual(job_poller.get_poll_interval(), job_poller.DEFAULT_POLL_INTERVAL)
+        with mock.patch.dict('azure_video_pipeline.job_poller.settings.FEATURES', {
+            'AZURE_JOB_NOTIFICATIONS_QUEUE': 'jobs'
+        }):
+            self.assertEqual(job_poller.get_poll_interval(), job_poller.DEFAULT_FALLBACK_POLL_INTERVAL)
+
+    def test_video_encoding_is_queued_once(self):
+        self.assertTrue(job_poller.acquire_video_encoding(u'video_id'))
+        self.assertFalse(job_poller.acquire_video_encoding(u'video_id'))
+        self.assertTrue(job_poller.acquire_video_encoding(u'other_video_id'))
+        job_poller.release_video_encoding(u'video_id')
+        self.assertTrue(job_poller.acquire_video_encoding(u'video_id'))
+
+    def test_due_jobs_are_polled_only(self):
+        with freeze_time('2017-11-01 00:00:00'):
+            job_poller.track_job('job_1', 'org')
+            job_poller.track_job('job_2', 'org')
+        self.set_states('org', {'job_1': JobStatus.QUEUED, 'job_2': JobStatus.QUEUED})
+        polled = []
+
+        for second in (0, 10, 20, 30, 60, 70):
+            with freeze_time('2017-11-01 00:{:02}:{:02}'.format(*divmod(second, 60))):
+                job_poller.poll_jobs(self.get_client, self.dispatch)
+                polled.append(len(self.get_client('org').get_jobs.call_args_list))
+
+        # Jobs still queued are checked with exponential back-off (20, 40 seconds):
+        self.assertEqual(polled, [1, 1, 2, 2, 3, 3])
+        self.assertEqual(AzureEncodeJob.objects.get(job_id='job_1').polls, 3)
+
+    def test_job_times_reported_by_ams_are_stored(self):
+        job_poller.track_job('job_1', 'org')
+        job_poller.track_job('job_2', 'org')
+        self.get_client('org').get_jobs.return_value = [
+            {'Id': 'job_1', 'State': JobStatus.FINISHED, 'StartTime': '2017-11-01T00:01:00.1234567Z',
+             'EndTime': '2017-11-01T00:07:00Z'},
+            {'Id': 'job_2', 'State': JobStatus.QUEUED, 'StartTime': '0001-01-01T00:00:00', 'EndTime': None},
+        ]
+
+        with freeze_time('2017-11-01 00:20:00'):
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+
+        encode_job = AzureEncodeJob.objects.get(job_id='job_1')
+        # UTC times are stored in local time zone as USE_TZ is off:
+        self.assertEqual(encode_job.started, timezone.make_naive(datetime(2017, 11, 1, 0, 1, 0, 123456, timezone.utc)))
+        self.assertEqual(encode_job.finished, timezone.make_naive(datetime(2017, 11, 1, 0, 7, 0, 0, timezone.utc)))
+        encode_job = AzureEncodeJob.objects.get(job_id='job_2')
+        self.assertEqual((encode_job.started, encode_job.finished), (None, None))
+
+    def test_job_progress_is_stored(self):
+        job_poller.track_job('job_1', 'org')
+        self.get_client('org').get_jobs.return_value = [{
+            'Id': 'job_1', 'State': JobStatus.PROCESSING, 'Tasks': [{'Progress': 20.0}, {'Progress': 40.0}]
+        }]
+
+        with freeze_time('2017-11-01 00:00:00'):
+            job_poller.poll_jobs(self.get_client, self.dispatch)
+
+        encode_job = AzureEncodeJob.objects.get(job_id='job_1')
+        self.assertEqual(encode_job.progress, 30)
+        self.assertEqual(encode_job.polls, 0)
+        self.assertEqual(encode_job.next_poll.strftime('%H:%M:%S'), '00:00:10')
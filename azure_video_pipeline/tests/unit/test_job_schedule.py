@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from azure_video_pipeline import job_schedule
+from azure_video_pipeline.models import AzureEncodeJob
+from django.core.cache import cache
+from django.test import TestCase
+
+
+NOW = datetime(2017, 11, 1)
+
+
+class JobScheduleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def make_job(self, job_id, duration=None, input_size=None, **kwargs):
+        fields = {'organization': 'org', 'preset': 'preset', 'input_size': input_size}
+        if duration is not None:
+            fields.update(state=AzureEncodeJob.FINISHED, started=NOW, finished=NOW + timedelta(seconds=duration))
+        fields.update(kwargs)
+        return AzureEncodeJob.objects.create(job_id=job_id, **fields)
+
+    def test_size_range(self):
+        self.assertIsNone(job_schedule.get_size_range(None))
+        self.assertEqual(job_schedule.get_size_range(1024), (1024, 2048))
+        self.assertEqual(job_schedule.get_size_range(2047), (1024, 2048))
+
+    def test_estimate_prefers_uploads_of_similar_size(self):
+        self.make_job('job_1', duration=100, input_size=1000)
+        self.make_job('job_2', duration=200, input_size=1000)
+        self.make_job('job_3', duration=900, input_size=5000)
+        self.make_job('job_4', duration=50, input_size=1000, organization='other_org')
+
+        self.assertEqual(job_schedule.estimate_duration('org', 'preset', 600), 150)
+        self.assertEqual(job_schedule.estimate_duration('org', 'preset', 5000), 900)
+        self.assertEqual(job_schedule.estimate_duration('org', 'preset', 100000), 200)
+        self.assertIsNone(job_schedule.estimate_duration('org', 'other_preset'))
+
+    def test_waiting_jobs_back_off(self):
+        encode_job = self.make_job('job_id', state=AzureEncodeJob.SCHEDULED)
+
+        delays = []
+        for polls in range(7):
+            encode_job.polls = polls
+            delays.append(job_schedule.get_poll_delay(encode_job, NOW, 10, 300))
+
+        self.assertEqual(delays, [10, 20, 40, 80, 160, 300, 300])
+
+    def test_processed_job_is_checked_when_expected_to_finish(self):
+        self.make_job('job_1', duration=1000, input_size=1000)
+        encode_job = self.make_job(
+            'job_2', input_size=1000, state=AzureEncodeJob.PROCESSING, started=NOW - timedelta(seconds=100)
+        )
+
+        self.assertEqual(job_schedule.get_poll_delay(encode_job, NOW, 10, 3600), 900 * job_schedule.ESTIMATE_MARGIN)
+        # overdue Jobs are checked after half of the time they are overdue:
+        self.assertEqual(job_schedule.get_poll_delay(encode_job, NOW + timedelta(seconds=1300), 10, 3600), 200)
+
+    def test_reported_progress_is_preferred(self):
+        encode_job = self.make_job(
+            'job_id', state=AzureEncodeJob.PROCESSING, started=NOW - timedelta(seconds=100), progress=25
+        )
+
+        self.assertEqual(job_schedule.get_poll_delay(encode_job, NOW, 10, 3600), 300 * job_schedule.ESTIMATE_MARGIN)
+        encode_job.progress = None
+        self.assertEqual(job_schedule.get_poll_delay(encode_job, NOW, 10, 3600), 10)
@@ -0,0 +1,68 @@
+import struct
+import unittest
+
+from azure_video_pipeline import mp4_probe
+
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def make_trak(handler_type, width, height):
+    tkhd = b'\0' * 76 + struct.pack('>II', width << 16, height << 16)
+    hdlr = b'\0' * 8 + handler_type + b'\0' * 12
+    return box(b'trak', box(b'tkhd', tkhd) + box(b'mdia', box(b'mdhd', b'\0' * 24) + box(b'hdlr', hdlr)))
+
+
+def make_moov(duration, width, height, version=0):
+    if version == 1:
+        mvhd = struct.pack('>B3xQQIQ', 1, 0, 0, 1000, duration * 1000)
+    else:
+        mvhd = struct.pack('>B3xIIII', 0, 0, 0, 1000, duration * 1000)
+    return box(b'moov', box(b'mvhd', mvhd + b'\0' * 80) + make_trak(b'soun', 0, 0) + make_trak(b'vide', width, height))
+
+
+def make_mp4(mdat_size, moov, moov_first=False):
+    ftyp = box(b'ftyp', b'isom\0\0\0\0isommp41')
+    mdat = box(b'mdat', b'\0' * mdat_size)
+    return ftyp + moov + mdat if moov_first else ftyp + mdat + moov
+
+
+class Mp4ProbeTests(unittest.TestCase):
+
+    def probe(self, data):
+        self.reads = []
+
+        def read(start, end):
+            self.reads.append((start, end))
+            return data[start:end + 1]
+        return mp4_probe.probe_mp4(read, len(data))
+
+    def test_moov_at_the_end_is_found_without_reading_mdat(self):
+        data = make_mp4(10 ** 6, make_moov(100, 1280, 720))
+
+        media_info = self.probe(data)
+
+        self.assertEqual((media_info.width, media_info.height, media_info.duration), (1280, 720, 100))
+        self.assertEqual(media_info.bitrate, len(data) * 8 // 100)
+        self.assertEqual(len(self.reads), 3)
+        self.assertLess(sum(end - start + 1 for start, end in self.reads), mp4_probe.HEAD_SIZE + 1024)
+
+    def test_moov_in_the_head_is_read_once(self):
+        media_info = self.probe(make_mp4(10 ** 6, make_moov(30, 640, 480, version=1), moov_first=True))
+
+        self.assertEqual(media_info, mp4_probe.MediaInfo(640, 480, 30, media_info.bitrate))
+        self.assertEqual(len(self.reads), 1)
+
+    def test_large_box_size(self):
+        ftyp = box(b'ftyp', b'isom')
+        mdat = struct.pack('>I4sQ', 1, b'mdat', 16 + 1000) + b'\0' * 1000
+        media_info = self.probe(ftyp + mdat + make_moov(10, 320, 240))
+
+        self.assertEqual(media_info.height, 240)
+
+    def test_not_mp4(self):
+        with self.assertRaises(mp4_probe.ProbeError):
+            self.probe(b'\0' * 4 + b'RIFF' + b'\0' * 100)
+        with self.assertRaises(mp4_probe.ProbeError):
+            self.probe(make_mp4(100, b'')[:-50])
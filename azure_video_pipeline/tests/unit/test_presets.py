@@ -0,0 +1,75 @@
+from azure_video_pipeline import presets, utils
+from azure_video_pipeline.media_service import DEFAULT_ENCODING_PRESET
+from azure_video_pipeline.models import AzureOrgProfile
+from azure_video_pipeline.mp4_probe import MediaInfo
+from django.core.cache import cache
+from django.test import TestCase
+import mock
+from organizations.models import Organization
+
+from .test_mp4_probe import make_moov, make_mp4
+from ..fakes import LocalBlobService
+
+
+class PresetsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        utils._azure_configs.clear()
+
+    def test_ladder_preset(self):
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(1920, 1080, 600, 5 * 10 ** 6)),
+                         'H264 Multiple Bitrate 1080p')
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(1280, 720, 30, 3 * 10 ** 6)), 'H264 Single Bitrate 720p')
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(854, 480, 600, 10 ** 6)),
+                         'H264 Multiple Bitrate 16x9 SD')
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(640, 480, 600, 10 ** 6)), 'H264 Multiple Bitrate 4x3 SD')
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(3840, 2160, 600, 20 * 10 ** 6)), DEFAULT_ENCODING_PRESET)
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(0, 0, 0, 0)), DEFAULT_ENCODING_PRESET)
+
+    def test_low_bitrate_source_is_encoded_one_rung_lower(self):
+        # e.g. 1080p screen recording:
+        self.assertEqual(presets.get_ladder_preset(MediaInfo(1920, 1080, 600, 800 * 1000)),
+                         'H264 Multiple Bitrate 720p')
+
+    def test_uploaded_video_is_probed(self):
+        client = mock.Mock(storage_account_name='account_name', storage_key='YWNjb3VudF9rZXk=')
+        client.get_asset_files.return_value = [{'Name': 'video.mp4'}]
+        blob_service = LocalBlobService()
+        blob_service.put_blob(
+            'asset-asset_id', 'video.mp4', make_mp4(10 ** 5, make_moov(600, 1280, 720)), 'BlockBlob'
+        )
+
+        with mock.patch('azure_video_pipeline.blobs_service.BlobServiceClient.blob_service', blob_service), \
+                mock.patch.dict('azure_video_pipeline.presets.settings.FEATURES', {'AZURE_PRESET_LOW_BITRATE': 1000}):
+            preset, media_info = presets.select_preset(client, 'org', 'nb:cid:UUID:asset_id')
+            self.assertEqual(preset, 'H264 Multiple Bitrate 720p')
+            self.assertEqual(media_info.duration, 600)
+            client.get_asset_files.return_value = [{'Name': 'video.avi'}]
+            self.assertEqual(
+                presets.select_preset(client, 'org', 'nb:cid:UUID:asset_id'), (DEFAULT_ENCODING_PRESET, None)
+            )
+
+    def test_organization_preset_overrides_selection(self):
+        organization = Organization.objects.create(name='Org', short_name='org')
+        AzureOrgProfile.objects.create(organization=organization, encoding_preset='H264 Single Bitrate 720p')
+        client = mock.Mock()
+
+        self.assertEqual(presets.select_preset(client, 'org', 'asset_id'), ('H264 Single Bitrate 720p', None))
+        with self.assertNumQueries(0):
+            self.assertEqual(presets.get_org_preset('org'), 'H264 Single Bitrate 720p')
+        with mock.patch.dict('azure_video_pipeline.presets.settings.FEATURES', {
+            'AZURE_ENCODING_PRESETS': {'other_org': 'H264 Multiple Bitrate 1080p'}
+        }):
+            self.assertEqual(presets.select_preset(client, 'other_org', 'asset_id')[0], 'H264 Multiple Bitrate 1080p')
+        self.assertFalse(client.get_asset_files.called)
+
+    def test_changed_organization_preset_is_picked_up(self):
+        organization = Organization.objects.create(name='Org', short_name='org')
+        profile = AzureOrgProfile.objects.create(organization=organization, encoding_preset='H264 Single Bitrate 720p')
+        self.assertEqual(presets.get_org_preset('org'), 'H264 Single Bitrate 720p')
+
+        profile.encoding_preset = ''
+        profile.save()
+
+        self.assertIsNone(presets.get_org_preset('org'))
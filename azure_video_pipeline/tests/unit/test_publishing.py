@@ -0,0 +1,108 @@
+from datetime import datetime
+
+from azure_video_pipeline import publishing
+from azure_video_pipeline.media_service import LocatorTypes
+from azure_video_pipeline.models import AzureEncodedAsset, AzureEncodeJob, AzureVideoTelemetry
+from django.test import TestCase
+from django.utils import timezone
+import mock
+from requests import HTTPError
+
+
+class PublishingTests(TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.get_output_media_asset.return_value = {'Id': 'output_asset_id', 'Name': 'ENCODED::video_id'}
+        self.client.get_access_policy_id.return_value = 'policy_id'
+        self.client.find_asset_locator.return_value = None
+        self.client.create_locators.side_effect = lambda policy_id, asset_id, locator_types: [
+            {'Id': 'locator_{}'.format(locator_type)} for locator_type in locator_types
+        ]
+        self.client.get_job.return_value = {'StartTime': '2017-11-01T00:01:00.5Z', 'EndTime': '2017-11-01T00:11:00Z'}
+        self.update_status = mock.Mock()
+        self.encode_job = AzureEncodeJob.objects.create(job_id='job_id', organization='org', fingerprint='md5-1')
+
+    def publish(self):
+        publishing.publish_job(self.client, self.encode_job, self.update_status)
+        return AzureEncodeJob.objects.get(job_id='job_id')
+
+    def test_publish(self):
+        encode_job = self.publish()
+
+        self.assertEqual(encode_job.publish_step, AzureEncodeJob.PUBLISHED)
+        self.assertEqual(encode_job.edx_video_id, 'video_id')
+        self.assertEqual(encode_job.access_policy_id, 'policy_id')
+        self.assertEqual(encode_job.streaming_locator_id, 'locator_{}'.format(LocatorTypes.OnDemandOrigin))
+        self.assertEqual(encode_job.progressive_locator_id, 'locator_{}'.format(LocatorTypes.SAS))
+        self.client.create_locators.assert_called_once_with(
+            'policy_id', 'output_asset_id', [LocatorTypes.OnDemandOrigin, LocatorTypes.SAS]
+        )
+        self.assertFalse(self.client.create_locator.called)
+        self.update_status.assert_called_once_with('video_id', 'file_complete')
+        self.assertEqual(AzureEncodedAsset.objects.get(edx_video_id='video_id').asset_id, 'output_asset_id')
+        self.client.invalidate_asset_by_name_response.assert_called_once_with(u'ENCODED::video_id')
+        self.assertEqual((encode_job.started, encode_job.finished), (
+            timezone.make_naive(datetime(2017, 11, 1, 0, 1, 0, 500000, timezone.utc)),
+            timezone.make_naive(datetime(2017, 11, 1, 0, 11, 0, 0, timezone.utc)),
+        ))
+        telemetry = AzureVideoTelemetry.objects.get(edx_video_id='video_id')
+        self.assertEqual(telemetry.processing_started, encode_job.started)
+        self.assertEqual(telemetry.job_finished, encode_job.finished)
+
+    def test_polled_job_times_are_not_looked_up(self):
+        self.encode_job.started = datetime(2017, 11, 1, 0, 1, 0)
+        self.client.get_job.side_effect = HTTPError('Service Unavailable')
+
+        self.assertEqual(self.publish().publish_step, AzureEncodeJob.PUBLISHED)
+        self.client.get_job.assert_not_called()
+
+    def test_interrupted_publishing_resumes_without_duplicates(self):
+        create_locators = self.client.create_locators.side_effect
+        self.client.create_locators.side_effect = HTTPError('Bad Request')
+
+        with self.assertRaises(HTTPError):
+            self.publish()
+
+        self.assertEqual(self.encode_job.publish_step, AzureEncodeJob.NOT_PUBLISHED)
+        self.client.invalidate_access_policy_id.assert_called_once_with(
+            publishing.PUBLISHED_ACCESS_POLICY_DURATION, publishing.AccessPolicyPermissions.READ
+        )
+        # e.g. Locator created by a batch whose response was lost:
+        self.client.find_asset_locator.side_effect = lambda asset_id, locator_type: (
+            {'Id': 'streaming_locator_id'} if locator_type == LocatorTypes.OnDemandOrigin else None
+        )
+        self.client.create_locators.side_effect = create_locators
+
+        encode_job = self.publish()
+
+        self.assertEqual(encode_job.publish_step, AzureEncodeJob.PUBLISHED)
+        self.assertEqual(encode_job.streaming_locator_id, 'streaming_locator_id')
+        self.assertEqual(encode_job.progressive_locator_id, 'locator_{}'.format(LocatorTypes.SAS))
+        self.assertEqual(self.client.create_locators.call_args_list[-1], mock.call(
+            'policy_id', 'output_asset_id', [LocatorTypes.SAS]
+        ))
+        self.assertEqual(self.client.create_locators.call_count, 2)
+        self.client.get_output_media_asset.assert_called_once_with('job_id')
+
+    def test_checkpointed_steps_are_skipped(self):
+        publishing.checkpoint(
+            self.encode_job, output_asset_id='output_asset_id', edx_video_id='video_id',
+            publish_step=AzureEncodeJob.PROGRESSIVE_LOCATOR_CREATED
+        )
+        self.update_status.side_effect = [ValueError, None]
+
+        with self.assertRaises(ValueError):
+            self.publish()
+        self.publish()
+        self.publish()
+
+        self.assertFalse(self.client.get_access_policy_id.called)
+        self.assertFalse(self.client.find_asset_locator.called)
+        self.assertEqual(self.update_status.call_count, 2)
+
+    def test_job_monitored_by_previous_versions_is_recorded(self):
+        encode_job = publishing.get_encode_job('other_job_id', 'org', 'fingerprint')
+
+        self.assertEqual(encode_job.fingerprint, 'fingerprint')
+        self.assertEqual(publishing.get_encode_job('job_id'), self.encode_job)
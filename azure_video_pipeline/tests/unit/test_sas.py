@@ -0,0 +1,63 @@
+import unittest
+
+from azure.storage import AccessPolicy, SharedAccessPolicy
+from azure.storage.blob import BlobService
+from azure_video_pipeline import sas
+from django.utils.six.moves.urllib.parse import parse_qs, urlsplit
+from freezegun import freeze_time
+import mock
+
+
+ACCOUNT_KEY = 'c2VjcmV0LXN0b3JhZ2Uta2V5'
+
+
+@freeze_time('2017-11-01')
+class SasSignerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.signer = sas.SasSigner('account', ACCOUNT_KEY)
+
+    def test_token_matches_azure_storage_signature(self):
+        token = self.signer.sign_blob_token(
+            'asset-id', u'video.mp4', 'r', 1509494400, 1509498000
+        )
+        sas_policy = SharedAccessPolicy(AccessPolicy('2017-11-01T00:00:00Z', '2017-11-01T01:00:00Z', 'r'))
+        expected = BlobService('account', ACCOUNT_KEY).generate_shared_access_signature(
+            'asset-id', u'video.mp4', sas_policy
+        )
+
+        self.assertEqual(parse_qs(token), parse_qs(expected))
+
+    def test_make_blob_url(self):
+        url = self.signer.make_blob_url('asset-id', 'video.mp4', 'w', 3600)
+
+        parts = urlsplit(url)
+        self.assertEqual(parts.netloc, 'account.blob.core.windows.net')
+        self.assertEqual(parts.path, '/asset-id/video.mp4')
+        query = parse_qs(parts.query)
+        self.assertEqual(query['sp'], ['w'])
+        self.assertEqual(query['sr'], ['b'])
+        self.assertEqual(query['se'], ['2017-11-01T01:00:00Z'])
+        self.assertEqual(query['st'], ['2017-10-31T23:54:00Z'])
+
+    def test_tokens_are_cached_per_expiry_bucket(self):
+        with mock.patch.object(self.signer, 'sign', wraps=self.signer.sign) as sign:
+            with freeze_time('2017-11-01 00:00:01'):
+                token = self.signer.get_blob_token('asset-id', 'video.mp4', 'r', 3600)
+            with freeze_time('2017-11-01 00:04:59'):
+                self.assertEqual(self.signer.get_blob_token('asset-id', 'video.mp4', 'r', 3600), token)
+                self.assertNotEqual(self.signer.get_blob_token('asset-id', 'other.mp4', 'r', 3600), token)
+                self.assertNotEqual(self.signer.get_blob_token('asset-id', 'video.mp4', 'w', 3600), token)
+            with freeze_time('2017-11-01 00:05:01'):
+                self.assertNotEqual(self.signer.get_blob_token('asset-id', 'video.mp4', 'r', 3600), token)
+
+        self.assertEqual(sign.call_count, 4)
+
+    def test_cached_token_lives_as_long_as_requested(self):
+        with freeze_time('2017-11-01 00:04:59'):
+            query = parse_qs(self.signer.get_blob_token('asset-id', 'video.mp4', 'r', 3600))
+        self.assertEqual(query['se'], ['2017-11-01T01:05:00Z'])
+        self.assertEqual(query['st'], ['2017-10-31T23:59:00Z'])
+
+    def test_get_sas_signer_is_shared(self):
+        self.assertIs(sas.get_sas_signer('account', ACCOUNT_KEY), sas.get_sas_signer('account', ACCOUNT_KEY))
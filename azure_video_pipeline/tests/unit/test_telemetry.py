@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from azure_video_pipeline import telemetry
+from azure_video_pipeline.models import AzureVideoTelemetry
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from freezegun import freeze_time
+
+
+START = datetime(2017, 11, 1, 10, 0, 0)
+
+
+class TelemetryTests(TestCase):
+
+    def create_video(self, edx_video_id, organization='org', preset='H264 Multiple Bitrate 720p',
+                     offsets=(60, 30, 600, 300, 10), video_duration=600):
+        timestamps, at = {'upload_url_issued': START}, START
+        for name, seconds in zip(telemetry.TIMESTAMPS[1:], offsets):
+            at += timedelta(seconds=seconds)
+            timestamps[name] = at
+        telemetry.record_stages(
+            edx_video_id, timestamps, organization=organization, preset=preset, video_duration=video_duration
+        )
+
+    def test_record_stage_keeps_first_timestamp(self):
+        with freeze_time(START):
+            telemetry.record_stage('video_id', 'upload_completed', organization='org')
+        with freeze_time(START + timedelta(hours=1)):
+            telemetry.record_stage('video_id', 'upload_completed', preset='')
+            telemetry.record_stage('video_id', 'job_created', preset='preset')
+
+        video = AzureVideoTelemetry.objects.get(edx_video_id='video_id')
+        self.assertEqual(video.upload_completed, START)
+        self.assertEqual(video.job_created, START + timedelta(hours=1))
+        self.assertEqual((video.organization, video.preset), ('org', 'preset'))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(telemetry.percentile(values, 50), 50)
+        self.assertEqual(telemetry.percentile(values, 99), 99)
+        self.assertEqual(telemetry.percentile([7], 90), 7)
+        self.assertIsNone(telemetry.percentile([], 50))
+
+    def test_stage_durations_skip_missing_timestamps(self):
+        durations = telemetry.get_stage_durations((START, None, START + timedelta(seconds=90), None, None, None))
+        self.assertEqual(durations, {'total': 90})
+
+    def test_report(self):
+        self.create_video('video_1')
+        self.create_video('video_2', offsets=(60, 30, 60, 900, 10))
+        self.create_video('video_3', organization='other_org', preset='H264 Single Bitrate 720p', video_duration=60)
+        self.create_video('unpublished', offsets=(60, 30))
+        self.create_video('not_probed', organization='other_org', video_duration=None)
+
+        report = telemetry.get_report(START, START + timedelta(hours=2))
+
+        self.assertEqual(report['all']['videos'], 4)
+        self.assertEqual(report['all']['video_minutes'], 21)
+        self.assertEqual(report['all']['throughput'], 10.5)
+        self.assertEqual(report['all']['unknown_duration'], 1)
+        self.assertEqual(report['organizations']['org']['unknown_duration'], 0)
+        self.assertEqual(report['all']['stages']['encoding'], {'p50': 300, 'p90': 900, 'p99': 900})
+        self.assertEqual(report['all']['slowest_stage'], 'ams_queue')
+        self.assertEqual(report['organizations']['org']['videos'], 2)
+        self.assertEqual(report['organizations']['org']['slowest_stage'], 'encoding')
+        self.assertEqual(report['presets']['H264 Single Bitrate 720p']['video_minutes'], 1)
+
+        report = telemetry.get_report(START, START + timedelta(hours=2), organization='other_org')
+        self.assertEqual(list(report['organizations']), ['other_org'])
+
+    def test_video_duration(self):
+        self.create_video('video_1', video_duration=90)
+        self.assertEqual(telemetry.get_video_duration('video_1'), 90)
+        self.assertIsNone(telemetry.get_video_duration('video_2'))
+
+    def test_report_command(self):
+        self.create_video('video_1')
+        self.create_video('not_probed', video_duration=None)
+        stdout = StringIO()
+
+        with freeze_time(START + timedelta(hours=1)):
+            call_command('azure_encode_report', hours=2, organization='org', stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('All videos: 2 videos, 10.0 video minutes, 5.00 video minutes per hour', output)
+        self.assertIn('(1 videos of unknown duration are not counted in video minutes)', output)
+        self.assertIn('slowest stage: ams_queue', output)
+        self.assertIn('Preset [H264 Multiple Bitrate 720p]', output)
+        self.assertIn('encoding    p50=300 p90=300 p99=300', output)
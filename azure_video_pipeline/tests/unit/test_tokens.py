@@ -0,0 +1,94 @@
+import unittest
+
+from azure_video_pipeline import tokens
+from django.core.cache import cache
+from freezegun import freeze_time
+import mock
+
+
+@freeze_time('2017-11-01')
+class CachedServicePrincipalCredentialsTests(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        tokens._local_tokens.clear()
+        patcher = mock.patch('azure_video_pipeline.tokens.ServicePrincipalCredentials')
+        self.service_principal_credentials = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.set_aad_token(3600)
+
+    def set_aad_token(self, expires_in, access_token='access_token'):
+        self.service_principal_credentials.return_value.token = {
+            'token_type': 'Bearer',
+            'access_token': access_token,
+            'expires_at': tokens.time.time() + expires_in,
+        }
+
+    def make_one(self):
+        return tokens.CachedServicePrincipalCredentials(
+            'client_id', 'secret', tenant='tenant', resource='https://rest.media.azure.net'
+        )
+
+    def test_token_is_fetched_once_and_shared(self):
+        token = self.make_one().token
+        self.assertEqual(token['access_token'], 'access_token')
+
+        tokens._local_tokens.clear()  # emulate another process
+        self.assertEqual(self.make_one().token['access_token'], 'access_token')
+
+        self.service_principal_credentials.assert_called_once_with(
+            'client_id', 'secret', tenant='tenant', resource='https://rest.media.azure.net', cached=True
+        )
+        self.service_principal_credentials().set_token.assert_called_once_with()
+
+    def test_cache_key_depends_on_tenant_client_and_resource(self):
+        self.assertNotEqual(
+            tokens.get_token_cache_key('tenant', 'client_id', 'resource'),
+            tokens.get_token_cache_key('tenant', 'client_id', 'other_resource')
+        )
+
+    @mock.patch('azure_video_pipeline.tokens.CachedServicePrincipalCredentials.refresh_in_background')
+    def test_token_refreshed_ahead_of_expiration(self, refresh_in_background):
+        self.set_aad_token(60, access_token='expiring_token')
+        credentials = self.make_one()
+        credentials.token
+
+        self.assertEqual(credentials.token['access_token'], 'expiring_token')
+        refresh_in_background.assert_called_once_with()
+
+    @mock.patch('azure_video_pipeline.tokens.CachedServicePrincipalCredentials.refresh_in_background')
+    def test_token_refreshed_by_single_process(self, refresh_in_background):
+        self.set_aad_token(60)
+        credentials = self.make_one()
+        credentials.token
+        tokens._local_tokens.clear()
+
+        self.make_one().token
+
+        refresh_in_background.assert_called_once_with()
+
+    def test_expired_token_is_replaced(self):
+        self.set_aad_token(-1, access_token='expired_token')
+        self.make_one().token
+        self.set_aad_token(3600, access_token='new_token')
+
+        self.assertEqual(self.make_one().token['access_token'], 'new_token')
+        self.assertIsNone(cache.get(self.make_one().lock_key))
+
+    @mock.patch('azure_video_pipeline.tokens.sleep')
+    def test_waits_for_concurrent_refresh(self, sleep):
+        credentials = self.make_one()
+        credentials.acquire_refresh_lock()
+
+        def concurrent_refresh(seconds):
+            token = {'access_token': 'concurrent_token', 'expires_at': tokens.time.time() + 60}
+            cache.set(credentials.cache_key, token)
+
+        sleep.side_effect = concurrent_refresh
+
+        self.assertEqual(credentials.token['access_token'], 'concurrent_token')
+        self.service_principal_credentials.assert_not_called()
+
+    def test_get_token_expiry(self):
+        self.assertEqual(tokens.get_token_expiry({'expires_on': '1509494400'}), 1509494400.0)
+        self.assertEqual(tokens.get_token_expiry({'expires_in': '60'}), tokens.time.time() + 60)
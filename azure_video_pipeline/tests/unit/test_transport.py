@@ -0,0 +1,178 @@
+import socket
+import unittest
+
+from azure_video_pipeline import transport
+import mock
+
+
+class TransportTests(unittest.TestCase):
+
+    def setUp(self):
+        transport.reset_sessions()
+        self.addCleanup(transport.reset_sessions)
+
+    def test_get_base_url(self):
+        self.assertEqual(
+            transport.get_base_url('https://account.restv2.westeurope.media.azure.net/api/'),
+            'https://account.restv2.westeurope.media.azure.net'
+        )
+        self.assertEqual(transport.get_base_url('http://localhost:8000/api/Jobs'), 'http://localhost:8000')
+
+    def test_get_session_is_shared_per_host(self):
+        session = transport.get_session('https://host/api/')
+        self.assertIs(transport.get_session('https://host/api/Jobs'), session)
+        self.assertIsNot(transport.get_session('https://other-host/api/'), session)
+
+    def test_get_session_is_not_shared_across_processes(self):
+        with mock.patch('azure_video_pipeline.transport.os.getpid', return_value=1):
+            parent_session = transport.get_session('https://host/api/')
+        with mock.patch('azure_video_pipeline.transport.os.getpid', return_value=2):
+            child_session = transport.get_session('https://host/api/')
+        self.assertIsNot(parent_session, child_session)
+
+    def test_create_session_pool_settings(self):
+        with mock.patch.dict('azure_video_pipeline.transport.settings.FEATURES', {
+            'AZURE_HTTP_POOL_CONNECTIONS': 2,
+            'AZURE_HTTP_POOL_MAXSIZE': 20,
+        }):
+            session = transport.create_session('https://host')
+
+        adapter = session.get_adapter('https://host/api/')
+        self.assertIsInstance(adapter, transport.PooledHTTPAdapter)
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertIn(
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            adapter.poolmanager.connection_pool_kw['socket_options']
+        )
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
+
+    def test_create_session_without_keep_alive(self):
+        with mock.patch.dict('azure_video_pipeline.transport.settings.FEATURES', {'AZURE_HTTP_KEEP_ALIVE': False}):
+            session = transport.create_session('https://host')
+
+        adapter = session.get_adapter('https://host/api/')
+        self.assertNotIn('socket_options', adapter.poolmanager.connection_pool_kw)
+        self.assertEqual(session.headers['Connection'], 'close')
+
+
+@mock.patch('azure_video_pipeline.transport.requests.Session.request')
+class RetrySessionTests(unittest.TestCase):
+
+    def setUp(self):
+        transport.reset_sessions()
+        transport.reset_metrics()
+        self.addCleanup(transport.reset_sessions)
+        self.sleep = mock.Mock()
+        self.session = transport.RetrySession('https://host', sleep=self.sleep)
+
+    def response(self, status_code, headers=None):
+        return mock.Mock(status_code=status_code, headers=headers or {})
+
+    def test_throttled_get_is_retried(self, request):
+        request.side_effect = [self.response(503), transport.requests.ConnectionError(), self.response(200)]
+
+        response = self.session.get('https://host/api/Jobs')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(transport.get_metrics(), {('retries', 'https://host'): 2})
+
+    def test_retry_after_is_respected(self, request):
+        request.side_effect = [self.response(429, {'Retry-After': '7'}), self.response(200)]
+
+        self.session.get('https://host/api/Jobs')
+
+        self.sleep.assert_called_once_with(7.0)
+
+    def test_backoff_grows_exponentially_with_jitter(self, request):
+        with mock.patch('azure_video_pipeline.transport.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([transport.get_backoff(attempt) for attempt in range(3)], [0.5, 1.0, 2.0])
+            self.assertEqual(transport.get_backoff(10), transport.DEFAULT_RETRY_BACKOFF_MAX)
+
+    def test_last_response_is_returned_when_retries_exhausted(self, request):
+        request.return_value = self.response(503)
+
+        response = self.session.delete('https://host/api/Locators(1)')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(request.call_count, transport.DEFAULT_RETRY_TOTAL + 1)
+
+    def test_post_is_retried_only_with_dedupe_key(self, request):
+        request.return_value = self.response(503)
+        self.session.post('https://host/api/Jobs', json={})
+        self.assertEqual(request.call_count, 1)
+
+        request.reset_mock()
+        request.side_effect = [self.response(503), self.response(201)]
+        response = self.session.post('https://host/api/Jobs', json={}, headers={'Accept': 'json'}, dedupe_key='key')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args[1]['headers'], {'Accept': 'json', 'x-ms-client-request-id': 'key'})
+
+    def test_before_retry_stops_retries(self, request):
+        request.return_value = self.response(503)
+        before_retry = mock.Mock(side_effect=[None, ValueError])
+
+        with self.assertRaises(ValueError):
+            self.session.post('https://host/api/Jobs', json={}, dedupe_key='key', before_retry=before_retry)
+
+        self.assertEqual(request.call_count, 2)
+        self.assertNotIn('before_retry', request.call_args[1])
+
+    def test_file_like_body_is_not_retried(self, request):
+        request.return_value = self.response(503)
+        self.session.put('https://host/blob', data=mock.Mock(read=mock.Mock()))
+        self.assertEqual(request.call_count, 1)
+
+    def test_circuit_breaker(self, request):
+        request.return_value = self.response(503)
+        with mock.patch.dict('azure_video_pipeline.transport.settings.FEATURES', {
+            'AZURE_RETRY_TOTAL': 0,
+            'AZURE_CIRCUIT_BREAKER_THRESHOLD': 2,
+        }):
+            with mock.patch('azure_video_pipeline.transport.time.time', return_value=1000):
+                self.session.get('https://host/api/Jobs')
+                self.session.get('https://host/api/Jobs')
+                with self.assertRaises(transport.CircuitBreakerOpen):
+                    self.session.get('https://host/api/Jobs')
+                # other endpoints are not affected:
+                transport.get_session('https://other-host/api/').get('https://other-host/api/Jobs')
+
+            request.return_value = self.response(200)
+            with mock.patch('azure_video_pipeline.transport.time.time', return_value=1000 + 30):
+                self.assertEqual(self.session.get('https://host/api/Jobs').status_code, 200)
+                self.session.get('https://host/api/Jobs')
+
+        self.assertEqual(request.call_count, 5)
+        self.assertEqual(transport.get_metrics(), {
+            ('breaker_trips', 'https://host'): 1,
+            ('breaker_rejections', 'https://host'): 1,
+        })
+
+    def test_failed_trial_request_opens_breaker_again(self, request):
+        breaker = transport.CircuitBreaker('https://host', threshold=1, reset_timeout=30)
+        with mock.patch('azure_video_pipeline.transport.time.time', return_value=1000):
+            breaker.record_failure()
+            self.assertFalse(breaker.allow_request())
+        with mock.patch('azure_video_pipeline.transport.time.time', return_value=1030):
+            self.assertTrue(breaker.allow_request())
+            self.assertFalse(breaker.allow_request())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow_request())
+
+    def test_get_retry_after(self, request):
+        self.assertIsNone(transport.get_retry_after(self.response(503)))
+        self.assertEqual(transport.get_retry_after(self.response(503, {'Retry-After': '2'})), 2.0)
+        with mock.patch('azure_video_pipeline.transport.time.time', return_value=1509494400):
+            self.assertEqual(
+                transport.get_retry_after(self.response(503, {'Retry-After': 'Wed, 01 Nov 2017 00:00:10 GMT'})), 10
+            )
+
+    def test_is_transient_error(self, request):
+        self.assertTrue(transport.is_transient_error(transport.requests.ConnectionError()))
+        self.assertTrue(transport.is_transient_error(transport.CircuitBreakerOpen()))
+        self.assertTrue(transport.is_transient_error(transport.requests.HTTPError(response=self.response(429))))
+        self.assertFalse(transport.is_transient_error(transport.requests.HTTPError(response=self.response(400))))
@@ -0,0 +1,130 @@
+from azure_video_pipeline import upload_sessions
+from azure_video_pipeline.blobs_service import BlobServiceClient
+from azure_video_pipeline.models import AzureUploadSession
+from azure_video_pipeline.tests.fakes import LocalBlobService
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+import mock
+
+
+BLOCK_SIZE = 16
+CONTENT = b''.join(chr(ord('a') + index) * BLOCK_SIZE for index in range(10))[:-5]
+
+
+@mock.patch.dict('azure_video_pipeline.upload_sessions.settings.FEATURES', {'AZURE_UPLOAD_BLOCK_SIZE': BLOCK_SIZE})
+class UploadSessionTests(TestCase):
+
+    def setUp(self):
+        self.blob_service = LocalBlobService()
+        patcher = mock.patch('azure_video_pipeline.blobs_service.BlobService', return_value=self.blob_service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.media_service_client = mock.Mock(
+            storage_account_name='account_name',
+            storage_key='YWNjb3VudF9rZXk=',
+            asset={'Id': 'nb:cid:UUID:asset_id'},
+            client_video_id='video.mp4',
+        )
+        self.media_service_client.create_asset_file_with_locator.return_value = ({'Id': 'asset_file_id'}, {})
+
+    def start_session(self):
+        return upload_sessions.start_upload_session(
+            self.media_service_client, len(CONTENT), organization='org', edx_video_id='video_id'
+        )
+
+    def upload(self, upload_session, block_indexes):
+        """
+        Emulate browser sending blocks with SAS URL.
+        """
+        blob_service_client = BlobServiceClient('account_name', 'account_key')
+        for index in block_indexes:
+            block = CONTENT[index * BLOCK_SIZE:(index + 1) * BLOCK_SIZE]
+            blob_service_client.put_block(
+                'asset-asset_id', 'video.mp4', block, upload_sessions.get_block_id(index)
+            )
+
+    def test_start_upload_session(self):
+        upload_session = self.start_session()
+
+        self.media_service_client.create_asset_file_with_locator.assert_called_once_with(
+            'nb:cid:UUID:asset_id', 'video.mp4', 'video/mp4', duration_in_minutes=24 * 60
+        )
+        self.assertEqual(upload_session.asset_file_id, 'asset_file_id')
+        self.assertEqual(upload_session.blocks_count, 10)
+        self.assertEqual(upload_session.block_manifest, '0' * 10)
+        self.assertEqual(upload_session.container_name, 'asset-asset_id')
+
+    def test_interrupted_upload_is_resumed_with_missing_blocks_only(self):
+        upload_session = self.start_session()
+        self.blob_service.fail_after_blocks = 6
+        with self.assertRaises(Exception):
+            self.upload(upload_session, range(10))
+        # the connection was lost in the middle of the 4th block:
+        self.blob_service.uncommitted_blocks[('asset-asset_id', 'video.mp4')]['block-00000003'] = b'd' * 3
+
+        info = upload_sessions.get_upload_session_info(
+            self.media_service_client, AzureUploadSession.objects.get(pk=upload_session.pk)
+        )
+
+        self.assertEqual(AzureUploadSession.objects.get(pk=upload_session.pk).block_manifest, '1110110000')
+        self.assertEqual(info['missing_ranges'], [
+            {'first_block': 3, 'last_block': 3, 'start': 48, 'end': 63, 'block_ids': ['block-00000003']},
+            {'first_block': 6, 'last_block': 9, 'start': 96, 'end': 154, 'block_ids': [
+                'block-00000006', 'block-00000007', 'block-00000008', 'block-00000009'
+            ]},
+        ])
+        self.assertEqual(info['block_size'], BLOCK_SIZE)
+        self.assertEqual(info['expires_in'], upload_sessions.DEFAULT_MIN_URL_EXPIRY)
+        self.assertTrue(info['upload_url'].startswith(
+            'https://account_name.blob.core.windows.net/asset-asset_id/video.mp4?'
+        ))
+
+        self.blob_service.fail_after_blocks = None
+        self.blob_service.put_block_calls = []
+        self.upload(upload_session, [3, 6, 7, 8, 9])
+        upload_session = upload_sessions.complete_upload_session(self.media_service_client, upload_session)
+
+        self.assertEqual(self.blob_service.put_block_calls, [
+            'block-00000003', 'block-00000006', 'block-00000007', 'block-00000008', 'block-00000009'
+        ])
+        self.assertEqual(self.blob_service.get_blob_to_bytes('asset-asset_id', 'video.mp4'), CONTENT)
+        self.assertEqual(upload_session.status, AzureUploadSession.COMMITTED)
+        self.media_service_client.update_asset_file.assert_called_once_with(
+            'asset_file_id', {'size': len(CONTENT), 'ctype': 'video/mp4'}, input_asset_id='nb:cid:UUID:asset_id'
+        )
+
+    def test_incomplete_upload_is_not_committed(self):
+        upload_session = self.start_session()
+        self.upload(upload_session, [0, 1])
+
+        with self.assertRaises(ValidationError):
+            upload_sessions.complete_upload_session(self.media_service_client, upload_session)
+        self.assertEqual(upload_session.status, AzureUploadSession.ACTIVE)
+
+    def test_server_side_upload_can_be_completed(self):
+        upload_session = self.start_session()
+        BlobServiceClient('account_name', 'account_key').upload_file(
+            'asset-asset_id', 'video.mp4', SimpleUploadedFile('video.mp4', CONTENT), block_size=BLOCK_SIZE
+        )
+
+        upload_session = upload_sessions.sync_upload_session(self.media_service_client, upload_session)
+
+        self.assertEqual(upload_session.missing_blocks, [])
+
+    def test_url_expiry_depends_on_missing_bytes(self):
+        self.assertEqual(upload_sessions.get_url_expiry(0), upload_sessions.DEFAULT_MIN_URL_EXPIRY)
+        self.assertEqual(
+            upload_sessions.get_url_expiry(upload_sessions.DEFAULT_UPLOAD_THROUGHPUT * 3600), 3600
+        )
+        self.assertEqual(upload_sessions.get_url_expiry(4 * 1024 ** 4), upload_sessions.DEFAULT_MAX_URL_EXPIRY)
+
+    def test_too_large_file_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            upload_sessions.get_block_size(BLOCK_SIZE * upload_sessions.MAX_BLOCKS_COUNT + 1)
+
+    def test_block_size_is_capped(self):
+        with mock.patch.dict('azure_video_pipeline.upload_sessions.settings.FEATURES', {
+            'AZURE_UPLOAD_BLOCK_SIZE': 2 * upload_sessions.MAX_BLOCK_SIZE
+        }):
+            self.assertEqual(upload_sessions.get_block_size(1024), upload_sessions.MAX_BLOCK_SIZE)
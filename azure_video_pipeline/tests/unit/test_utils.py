@@ -1,20 +1,69 @@
 import unittest
 
+from azure_video_pipeline import utils
+from azure_video_pipeline.models import AzureOrgProfile
 from azure_video_pipeline.utils import (
-    get_azure_config, get_media_service_client
+    azure_org_profile_changed, get_async_media_service_client, get_azure_config, get_azure_configs,
+    get_media_service_client, get_streaming_video_list, iter_concurrently
 )
+from django.core.cache import cache
+from django.test import TestCase
 import mock
+from organizations.models import Organization
+from requests import HTTPError
 
 
 class UtilsTests(unittest.TestCase):
 
+    def setUp(self):
+        cache.clear()
+        utils._media_service_clients.clear()
+        utils._azure_configs.clear()
+
     @mock.patch('azure_video_pipeline.utils.MediaServiceClient')
     @mock.patch('azure_video_pipeline.utils.get_azure_config', return_value={})
     def test_get_media_services(self, get_azure_config, media_services_client):
+        media_services_client.return_value = mock.Mock(spec=['get_job'])
         media_services = get_media_service_client('org')
         get_azure_config.assert_called_once_with('org')
         media_services_client.assert_called_once_with({})
-        self.assertEqual(media_services, media_services_client())
+        self.assertIsInstance(media_services, mock.Mock)
+        self.assertIsNot(media_services, media_services_client())
+
+    @mock.patch('azure_video_pipeline.utils.MediaServiceClient')
+    @mock.patch('azure_video_pipeline.utils.get_azure_config', return_value={})
+    def test_get_media_services_from_registry(self, get_azure_config, media_services_client):
+        get_media_service_client('org')
+        get_media_service_client('org')
+        get_media_service_client('other_org')
+
+        self.assertEqual(get_azure_config.call_count, 2)
+        self.assertEqual(media_services_client.call_count, 2)
+
+    @mock.patch('azure_video_pipeline.utils.get_media_service_client')
+    def test_get_async_media_services(self, get_media_service_client):
+        async_media_services = get_async_media_service_client('org')
+        get_media_service_client.assert_called_once_with('org')
+        self.assertIs(async_media_services.client, get_media_service_client.return_value)
+
+    @mock.patch('azure_video_pipeline.utils.MediaServiceClient')
+    @mock.patch('azure_video_pipeline.utils.get_azure_config', return_value={})
+    def test_media_services_registry_invalidation(self, get_azure_config, media_services_client):
+        get_media_service_client('org')
+        azure_org_profile_changed(sender=None, instance=mock.Mock(organization=mock.Mock(short_name='org')))
+        get_media_service_client('org')
+
+        self.assertEqual(media_services_client.call_count, 2)
+
+    @mock.patch('azure_video_pipeline.utils.MediaServiceClient')
+    @mock.patch('azure_video_pipeline.utils.get_azure_config', return_value={})
+    def test_media_services_registry_invalidated_by_other_process(self, get_azure_config, media_services_client):
+        get_media_service_client('org')
+        cache.set(utils.ORG_PROFILE_VERSION_KEY.format('org'), 'new_version')
+        get_media_service_client('org')
+        get_media_service_client('org')
+
+        self.assertEqual(media_services_client.call_count, 2)
 
     def test_get_azure_config_for_organization(self):
         with mock.patch('azure_video_pipeline.models.AzureOrgProfile.objects.filter',
@@ -67,3 +116,153 @@ class UtilsTests(unittest.TestCase):
             with mock.patch.dict('azure_video_pipeline.utils.settings.FEATURES', {}):
                 azure_config = get_azure_config('name_org')
                 self.assertEqual(azure_config, {})
+
+    @mock.patch('azure_video_pipeline.utils.get_media_service_client')
+    def test_get_streaming_video_list(self, get_media_service_client):
+        media_service = get_media_service_client.return_value
+        media_service.iter_locators.return_value = iter([
+            {'AssetId': 'asset_id', 'Path': 'https://streaming/locator_id/'},
+        ])
+        media_service.iter_asset_files.return_value = iter([
+            {'Name': 'video.mp4', 'MimeType': 'video/mp4'},
+            {'Name': 'video.ism', 'MimeType': 'application/octet-stream'},
+        ])
+
+        videos = get_streaming_video_list('org', bulk=False)
+        self.assertEqual(list(videos), [{
+            'smooth_streaming_url': '//streaming/locator_id/video.ism/manifest',
+            'file_name': 'video.ism',
+            'asset_id': 'asset_id',
+        }])
+        media_service.iter_locators.assert_called_once_with(2, select=['AssetId', 'Path'])
+        media_service.iter_asset_files.assert_called_once_with('asset_id', select=['Name', 'MimeType'])
+
+    @mock.patch('azure_video_pipeline.utils.get_media_service_client')
+    def test_get_streaming_video_list_with_expanded_files(self, get_media_service_client):
+        media_service = get_media_service_client.return_value
+        media_service.iter_locators.return_value = iter([
+            {'AssetId': 'asset_{}'.format(index), 'Path': 'https://streaming/locator_{}/'.format(index), 'Asset': {
+                'Files': [{'Name': 'video_{}.ism'.format(index), 'MimeType': 'application/octet-stream'}]
+            }} for index in range(20)
+        ])
+
+        with mock.patch('azure_video_pipeline.utils.ThreadPool') as thread_pool:
+            videos = list(get_streaming_video_list('org'))
+
+        thread_pool.assert_not_called()
+        self.assertEqual([video['file_name'] for video in videos], ['video_{}.ism'.format(i) for i in range(20)])
+        media_service.iter_locators.assert_called_once_with(
+            2,
+            select=['AssetId', 'Path', 'Asset/Files/Name', 'Asset/Files/MimeType'],
+            expand=['Asset/Files']
+        )
+        media_service.iter_asset_files.assert_not_called()
+
+    @mock.patch('azure_video_pipeline.utils.get_media_service_client')
+    def test_get_streaming_video_list_expand_fallback(self, get_media_service_client):
+        def iter_rejected_expand():
+            raise HTTPError('400 Bad Request')
+            yield
+
+        media_service = get_media_service_client.return_value
+        media_service.iter_locators.side_effect = [iter_rejected_expand(), iter([
+            {'AssetId': 'asset_{}'.format(index), 'Path': 'https://streaming/locator_{}/'.format(index)}
+            for index in range(20)
+        ])]
+        media_service.iter_asset_files.side_effect = lambda asset_id, select: iter([
+            {'Name': '{}.ism'.format(asset_id), 'MimeType': 'application/octet-stream'}
+        ])
+
+        with mock.patch('azure_video_pipeline.utils.ThreadPool', wraps=utils.ThreadPool) as thread_pool:
+            videos = list(get_streaming_video_list('org'))
+
+        thread_pool.assert_called_once_with(8)
+        self.assertEqual([video['file_name'] for video in videos], ['asset_{}.ism'.format(i) for i in range(20)])
+        media_service.iter_locators.assert_called_with(2, select=['AssetId', 'Path'])
+        self.assertEqual(media_service.iter_asset_files.call_count, 20)
+
+    def test_iter_concurrently_keeps_order_and_bounds_items_in_flight(self):
+        consumed = []
+
+        def items():
+            for index in range(10):
+                consumed.append(index)
+                yield index
+
+        results = iter_concurrently(lambda item: item * 2, items(), workers=2)
+
+        self.assertEqual(next(results), (0, 0))
+        self.assertEqual(len(consumed), 4)
+        self.assertEqual(list(results), [(index, index * 2) for index in range(1, 10)])
+
+
+class AzureConfigCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        utils._azure_configs.clear()
+        self.organization = Organization.objects.create(name='Org', short_name='org')
+        AzureOrgProfile.objects.create(
+            organization=self.organization, client_id='client_id', client_secret='secret', tenant='tenant',
+            rest_api_endpoint='https://account/api/', storage_account_name='account', storage_key='key'
+        )
+        self.features = mock.patch.dict('azure_video_pipeline.utils.settings.FEATURES', {
+            'AZURE_CLIENT_ID': 'platform_client_id',
+            'AZURE_CLIENT_SECRET': 'platform_secret',
+            'AZURE_TENANT': 'platform_tenant',
+            'AZURE_REST_API_ENDPOINT': 'https://platform/api/',
+            'STORAGE_ACCOUNT_NAME': 'platform_account',
+            'STORAGE_KEY': 'platform_key'
+        })
+        self.features.start()
+        self.addCleanup(self.features.stop)
+
+    def test_configs_are_cached_in_both_tiers(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(get_azure_config('org')['client_id'], 'client_id')
+            self.assertEqual(get_azure_config('other_org')['client_id'], 'platform_client_id')
+            get_azure_config('org')['client_id'] = 'changed'
+            self.assertEqual(get_azure_config('org')['client_id'], 'client_id')
+            self.assertEqual(get_azure_config('other_org')['client_id'], 'platform_client_id')
+
+        # another process has empty local tier:
+        utils._azure_configs.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_azure_config('org')['client_id'], 'client_id')
+            self.assertEqual(get_azure_config('other_org')['client_id'], 'platform_client_id')
+        self.assertEqual(
+            cache.get(utils.AZURE_CONFIG_CACHE_KEY.format('other_org', None)), utils.NO_AZURE_PROFILE
+        )
+
+    def test_configs_are_invalidated_by_signals(self):
+        get_azure_config('org')
+        get_azure_config('other_org')
+
+        AzureOrgProfile.objects.filter(organization=self.organization).update(client_id='new_client_id')
+        self.assertEqual(get_azure_config('org')['client_id'], 'client_id')
+        AzureOrgProfile.objects.get(organization=self.organization).save()
+        self.assertEqual(get_azure_config('org')['client_id'], 'new_client_id')
+
+        other_organization = Organization.objects.create(name='Other Org', short_name='other_org')
+        AzureOrgProfile.objects.create(organization=other_organization, client_id='other_client_id')
+        self.assertEqual(get_azure_config('other_org')['client_id'], 'other_client_id')
+
+        self.organization.delete()
+        self.assertEqual(get_azure_config('org')['client_id'], 'platform_client_id')
+
+    def test_bulk_prefetch(self):
+        get_azure_config('org')
+        utils._azure_configs.clear()
+        Organization.objects.create(name='Other Org', short_name='other_org')
+
+        with self.assertNumQueries(1):
+            azure_configs = get_azure_configs(['org', 'other_org', 'third_org'])
+        self.assertEqual(azure_configs['org']['client_id'], 'client_id')
+        self.assertEqual(azure_configs['other_org']['client_id'], 'platform_client_id')
+        self.assertEqual(azure_configs['third_org']['client_id'], 'platform_client_id')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_azure_configs(['org', 'third_org']), {
+                'org': azure_configs['org'], 'third_org': azure_configs['third_org'],
+            })
+            self.assertEqual(get_azure_config('other_org'), azure_configs['other_org'])
@@ -1,6 +1,8 @@
 import unittest
 
+from azure_video_pipeline import media_service, response_cache
 from azure_video_pipeline.media_service import AccessPolicyPermissions, LocatorTypes, MediaServiceClient
+from django.core.cache import cache
 from freezegun import freeze_time
 import mock
 from requests import HTTPError
@@ -8,7 +10,11 @@ from requests import HTTPError
 
 class MediaServiceClientTests(unittest.TestCase):
 
-    @mock.patch('azure_video_pipeline.media_service.ServicePrincipalCredentials')
+    def setUp(self):
+        cache.clear()
+        response_cache.reset_response_caches()
+
+    @mock.patch('azure_video_pipeline.media_service.CachedServicePrincipalCredentials')
     def make_one(self, service_principal_credentials):
         azure_config = {
             'client_id': 'client_id',
@@ -24,9 +30,9 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.get',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get',
                 return_value=mock.Mock(status_code=400, raise_for_status=mock.Mock(side_effect=HTTPError)))
-    @mock.patch('azure_video_pipeline.media_service.requests.post',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
                 return_value=mock.Mock(status_code=400, raise_for_status=mock.Mock(side_effect=HTTPError)))
     def raise_for_status(self, requests_post, requests_get, headers, func, func_args=None):
         media_services = self.make_one()
@@ -56,55 +62,47 @@ class MediaServiceClientTests(unittest.TestCase):
         media_services.set_metadata('value_name', 'value')
         self.assertEqual(media_services.value_name, 'value')
 
-    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.create_asset_file',
-                return_value={})
-    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.create_access_policy',
-                return_value={'Id': 'access_policy_id'})
-    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.create_locator',
-                return_value={})
-    @mock.patch('azure_video_pipeline.media_service.BlobServiceClient',
-                return_value=mock.Mock(generate_url=mock.Mock(
-                    return_value='sas_url')))
-    def test_generate_url(self, blob_service_client, create_locator, create_access_policy, create_asset_file):
+    @mock.patch('azure_video_pipeline.media_service.BatchRequest.execute',
+                return_value=[{'Id': 'asset_file_id'}, {'Id': 'locator_id'}])
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_access_policy_id',
+                return_value='access_policy_id')
+    @mock.patch('azure_video_pipeline.media_service.get_sas_signer')
+    @freeze_time("2017-11-01")
+    def test_generate_url(self, get_sas_signer, get_access_policy_id, batch_execute):
+        get_sas_signer.return_value.make_blob_url.return_value = 'sas_url'
         media_services = self.make_one()
         media_services.client_video_id = 'file_name.mp4'
         media_services.asset = {
             'Id': 'asset_id'
         }
-        sas_url = media_services.generate_url(expires_in=123456789)
+        with mock.patch('azure_video_pipeline.media_service.BatchRequest.add', side_effect=[0, 1]) as batch_add:
+            sas_url = media_services.generate_url(expires_in=123456789)
 
-        create_asset_file.assert_called_once_with(
-            'asset_id', 'file_name.mp4', 'video/mp4'
-        )
-        create_access_policy.assert_called_once_with(
-            u'AccessPolicy_file_name',
-            permissions=AccessPolicyPermissions.WRITE
-        )
-        create_locator.assert_called_once_with(
-            'access_policy_id',
-            'asset_id',
-            locator_type=LocatorTypes.SAS
-        )
-        blob_service_client.assert_called_once_with(
-            'storage_account_name',
-            'storage_key'
-        )
-        blob_service_client().generate_url.assert_called_once_with(
-            asset_id='asset_id',
-            blob_name='file_name.mp4',
-            expires_in=123456789
+        get_access_policy_id.assert_called_once_with(120, AccessPolicyPermissions.WRITE)
+        self.assertEqual(batch_add.call_args_list, [
+            mock.call('POST', 'Files', media_services.get_asset_file_data('asset_id', 'file_name.mp4', 'video/mp4')),
+            mock.call('POST', 'Locators', media_services.get_locator_data(
+                'access_policy_id', 'asset_id', LocatorTypes.SAS
+            )),
+        ])
+        batch_execute.assert_called_once_with(raise_for_status=False)
+        get_sas_signer.assert_called_once_with('storage_account_name', 'storage_key')
+        get_sas_signer().make_blob_url.assert_called_once_with(
+            'asset-asset_id', 'file_name.mp4', 'w', 123456789
         )
         self.assertEqual(sas_url, 'sas_url')
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.get',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get',
                 return_value=mock.Mock(status_code=200,
                                        json=mock.Mock(return_value={'value': ['locator1', 'locator2']})))
     def test_get_locators_list(self, requests_get, headers):
         media_services = self.make_one()
         locators = media_services.get_locators_list(LocatorTypes.OnDemandOrigin)
-        requests_get.assert_called_once_with('https://rest_api_endpoint/api/Locators?$filter=Type eq 2', headers={})
+        requests_get.assert_called_once_with(
+            'https://rest_api_endpoint/api/Locators?$filter=Type eq 2&$top=1000', headers={}
+        )
         self.assertEqual(locators, ['locator1', 'locator2'])
 
     def test_raise_for_status_get_list_locators(self):
@@ -112,15 +110,15 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.get',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get',
                 return_value=mock.Mock(status_code=200,
-                                       json=mock.Mock(return_value={'value': ['locator']})))
+                                       json=mock.Mock(return_value={'value': ['locator']}), headers={}))
     def test_get_asset_locator(self, requests_get, headers):
         media_services = self.make_one()
         asset_id = 'asset_id'
         locator = media_services.get_asset_locator(asset_id, LocatorTypes.SAS)
         requests_get.assert_called_once_with(
-            "https://rest_api_endpoint/api/Assets('{}')/Locators?$filter=Type eq 1".format(asset_id),
+            "https://rest_api_endpoint/api/Assets('{}')/Locators?$filter=Type eq 1&$top=1".format(asset_id),
             headers={}
         )
         self.assertEqual(locator, 'locator')
@@ -130,15 +128,15 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.get',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get',
                 return_value=mock.Mock(status_code=200,
-                                       json=mock.Mock(return_value={'value': ['file1', 'file2']})))
+                                       json=mock.Mock(return_value={'value': ['file1', 'file2']}), headers={}))
     def test_get_asset_files(self, requests_get, headers):
         media_services = self.make_one()
         asset_id = 'asset_id'
         files = media_services.get_asset_files(asset_id)
         requests_get.assert_called_once_with(
-            "https://rest_api_endpoint/api/Assets('{}')/Files".format(asset_id),
+            "https://rest_api_endpoint/api/Assets('{}')/Files?$top=1000".format(asset_id),
             headers={}
         )
         self.assertEqual(files, ['file1', 'file2'])
@@ -148,7 +146,7 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.post',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
                 return_value=mock.Mock(status_code=201,
                                        json=mock.Mock(return_value={'asset_id': 'asset_id',
                                                                     'asset_name': 'asset_name'})))
@@ -168,7 +166,7 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.post',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
                 return_value=mock.Mock(status_code=201,
                                        json=mock.Mock(return_value={'file_id': 'file_id',
                                                                     'file_name': 'file_name'})))
@@ -197,7 +195,7 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.post',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
                 return_value=mock.Mock(status_code=201,
                                        json=mock.Mock(return_value={'policy_id': 'policy_id',
                                                                     'policy_name': 'policy_name'})))
@@ -222,7 +220,7 @@ class MediaServiceClientTests(unittest.TestCase):
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers',
                 return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.post',
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
                 return_value=mock.Mock(status_code=201,
                                        json=mock.Mock(return_value={'locator_id': 'locator_id',
                                                                     'locator_name': 'locator_name'})))
@@ -250,8 +248,8 @@ class MediaServiceClientTests(unittest.TestCase):
         self.raise_for_status(func='create_locator', func_args=['access_policy_id', 'asset_id', 'locator_type'])
 
     @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
-    @mock.patch('azure_video_pipeline.media_service.requests.get', return_value=mock.Mock(
-        status_code=200, json=mock.Mock(return_value={'value': [{'id', 'asset_id'}]})
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get', return_value=mock.Mock(
+        status_code=200, json=mock.Mock(return_value={'value': [{'id', 'asset_id'}]}), headers={}
     ))
     def test_get_input_asset_by_video_id(self, requests_get_mock, _get_headers_mock):
         # arrange
@@ -261,7 +259,279 @@ class MediaServiceClientTests(unittest.TestCase):
         asset = media_services.get_input_asset_by_video_id(video_id)
         # assert
         requests_get_mock.assert_called_once_with(
-            "https://rest_api_endpoint/api/Assets?$filter=Name eq 'UPLOADED::test:video:id'",
+            "https://rest_api_endpoint/api/Assets?$filter=Name eq 'UPLOADED::test:video:id'&$top=1",
             headers={}
         )
         self.assertEqual(asset, {'id', 'asset_id'})
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    @mock.patch('azure_video_pipeline.transport.requests.Session.get')
+    def test_missing_asset_is_not_cached(self, requests_get_mock, _get_headers_mock):
+        requests_get_mock.side_effect = [
+            mock.Mock(status_code=200, json=mock.Mock(return_value={'value': []}), headers={}),
+            mock.Mock(status_code=200, json=mock.Mock(return_value={'value': [{'Id': 'asset_id'}]}), headers={}),
+        ]
+        media_services = self.make_one()
+
+        self.assertIsNone(media_services.get_input_asset_by_video_id('video_id', 'ENCODED'))
+        self.assertEqual(media_services.get_input_asset_by_video_id('video_id', 'ENCODED'), {'Id': 'asset_id'})
+        self.assertEqual(media_services.get_input_asset_by_video_id('video_id', 'ENCODED'), {'Id': 'asset_id'})
+        self.assertEqual(requests_get_mock.call_count, 2)
+
+    @mock.patch('azure_video_pipeline.media_service.BatchRequest.execute',
+                return_value=[{'Id': 'streaming_locator'}, {'Id': 'progressive_locator'}])
+    @freeze_time("2017-11-01")
+    def test_create_locators(self, batch_execute):
+        media_services = self.make_one()
+        with mock.patch('azure_video_pipeline.media_service.BatchRequest.add') as batch_add:
+            locators = media_services.create_locators(
+                'access_policy_id', 'asset_id', [LocatorTypes.OnDemandOrigin, LocatorTypes.SAS]
+            )
+
+        self.assertEqual(batch_add.call_args_list, [
+            mock.call('POST', 'Locators', {
+                "AccessPolicyId": 'access_policy_id',
+                "AssetId": 'asset_id',
+                "StartTime": '2017-10-31T23:50:00',
+                "Type": LocatorTypes.OnDemandOrigin
+            }),
+            mock.call('POST', 'Locators', {
+                "AccessPolicyId": 'access_policy_id',
+                "AssetId": 'asset_id',
+                "StartTime": '2017-10-31T23:50:00',
+                "Type": LocatorTypes.SAS
+            }),
+        ])
+        self.assertEqual(locators, [{'Id': 'streaming_locator'}, {'Id': 'progressive_locator'}])
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    def test_iter_collection_follows_next_link(self, _get_headers_mock):
+        media_services = self.make_one()
+        pages = [
+            {'value': ['locator1', 'locator2'], 'odata.nextLink': "Locators?$filter=Type eq 2&$skiptoken='2'"},
+            {'value': ['locator3']},
+        ]
+        with mock.patch('azure_video_pipeline.transport.requests.Session.get', side_effect=[
+            mock.Mock(status_code=200, json=mock.Mock(return_value=page)) for page in pages
+        ]) as requests_get:
+            locators = list(media_services.iter_locators(LocatorTypes.OnDemandOrigin, select=['AssetId', 'Path']))
+
+        self.assertEqual(locators, ['locator1', 'locator2', 'locator3'])
+        self.assertEqual(requests_get.call_args_list, [
+            mock.call('https://rest_api_endpoint/api/Locators?$filter=Type eq 2&$top=1000&$select=AssetId,Path',
+                      headers={}),
+            mock.call("https://rest_api_endpoint/api/Locators?$filter=Type eq 2&$skiptoken='2'", headers={}),
+        ])
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    def test_iter_collection_pages_with_skip(self, _get_headers_mock):
+        media_services = self.make_one()
+        pages = [{'value': ['file1', 'file2']}, {'value': ['file3', 'file4']}, {'value': []}]
+        with mock.patch('azure_video_pipeline.transport.requests.Session.get', side_effect=[
+            mock.Mock(status_code=200, json=mock.Mock(return_value=page)) for page in pages
+        ]) as requests_get:
+            files = media_services.iter_asset_files('asset_id', page_size=2)
+            self.assertEqual(next(files), 'file1')
+            requests_get.assert_called_once_with(
+                "https://rest_api_endpoint/api/Assets('asset_id')/Files?$top=2", headers={}
+            )
+            self.assertEqual(list(files), ['file2', 'file3', 'file4'])
+
+        self.assertEqual(requests_get.call_args_list[1:], [
+            mock.call("https://rest_api_endpoint/api/Assets('asset_id')/Files?$top=2&$skip=2", headers={}),
+            mock.call("https://rest_api_endpoint/api/Assets('asset_id')/Files?$top=2&$skip=4", headers={}),
+        ])
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.create_notification_endpoint',
+                return_value={'Id': 'endpoint_id'})
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_notification_endpoint', return_value=None)
+    def test_notification_endpoint_is_created_once(self, get_notification_endpoint, create_notification_endpoint):
+        media_service._notification_endpoints.clear()
+
+        self.assertEqual(self.make_one().get_notification_endpoint_id('jobs'), 'endpoint_id')
+        media_service._notification_endpoints.clear()  # emulate another process
+        self.assertEqual(self.make_one().get_notification_endpoint_id('jobs'), 'endpoint_id')
+
+        get_notification_endpoint.assert_called_once_with('jobs')
+        create_notification_endpoint.assert_called_once_with('jobs')
+
+    @mock.patch('azure_video_pipeline.media_service.cache')
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_notification_endpoint',
+                return_value={'Id': 'endpoint_id'})
+    def test_notification_endpoint_cache_ttl(self, _get_notification_endpoint, cache):
+        media_service._notification_endpoints.clear()
+        cache.get.return_value = None
+
+        with mock.patch.dict('azure_video_pipeline.media_service.settings.FEATURES', {
+            'AZURE_MEDIA_PROCESSOR_CACHE_TTL': 60, 'AZURE_NOTIFICATION_ENDPOINT_CACHE_TTL': 600
+        }):
+            self.make_one().get_notification_endpoint_id('jobs')
+
+        self.assertEqual(cache.set.call_args[0][1:], ('endpoint_id', 600))
+        media_service._notification_endpoints.clear()
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    @mock.patch('azure_video_pipeline.transport.requests.Session.post',
+                return_value=mock.Mock(status_code=201, json=mock.Mock(return_value={'d': {'Id': 'job_id'}})))
+    def test_job_is_subscribed_to_notification_endpoint(self, requests_post, _get_headers_mock):
+        self.make_one().submit_job('asset_id', 'video_id', 'media_processor_id', 'endpoint_id')
+
+        self.assertEqual(requests_post.call_args[1]['json']['JobNotificationSubscriptions'], [
+            {'NotificationEndPointId': 'endpoint_id', 'TargetJobState': media_service.TargetJobState.FINAL_STATES_ONLY}
+        ])
+
+    @mock.patch('azure_video_pipeline.transport.sleep')
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.iter_collection')
+    @mock.patch('azure_video_pipeline.transport.requests.Session.request')
+    def test_job_creation_is_retried_unless_job_exists(self, request, iter_collection, _get_headers_mock, _sleep):
+        request.side_effect = [
+            mock.Mock(status_code=503, headers={}),
+            mock.Mock(status_code=201, json=mock.Mock(return_value={'d': {'Id': 'job_id', 'Created': 'now'}})),
+        ]
+        iter_collection.return_value = iter([{'Id': 'failed_job_id', 'State': 4}])
+
+        self.assertEqual(self.make_one().submit_job('asset_id', 'video_id', 'media_processor_id')['d']['Id'], 'job_id')
+        dedupe_keys = [call[1]['headers']['x-ms-client-request-id'] for call in request.call_args_list]
+        self.assertEqual(len(set(dedupe_keys)), 1)
+        iter_collection.assert_called_once_with(
+            u"Jobs?$filter=Name eq 'AssetEncodeJob:asset_id'", select=['Id', 'Name', 'State', 'Created']
+        )
+
+        request.reset_mock()
+        request.side_effect = [mock.Mock(status_code=503, headers={})]
+        iter_collection.return_value = iter([{'Id': 'job_id', 'State': 0, 'Created': 'now'}])
+        job = self.make_one().submit_job('asset_id', 'video_id', 'media_processor_id')
+        self.assertEqual(job, {'d': {'Id': 'job_id', 'State': 0, 'Created': 'now'}})
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(
+            request.call_args[1]['headers']['x-ms-client-request-id'], dedupe_keys[0]
+        )
+
+    @mock.patch('azure_video_pipeline.media_service.JOBS_FILTER_SIZE', 2)
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.iter_collection',
+                side_effect=[iter([{'Id': 'job_1'}, {'Id': 'job_2'}]), iter([{'Id': 'job_3'}])])
+    def test_get_jobs_filters_by_ids(self, iter_collection):
+        media_services = self.make_one()
+
+        jobs = media_services.get_jobs(['job_1', 'job_2', 'job_3'], select=['Id', 'State'])
+
+        self.assertEqual(jobs, [{'Id': 'job_1'}, {'Id': 'job_2'}, {'Id': 'job_3'}])
+        self.assertEqual(iter_collection.call_args_list, [
+            mock.call("Jobs?$filter=Id eq 'job_1' or Id eq 'job_2'", select=['Id', 'State'], expand=None),
+            mock.call("Jobs?$filter=Id eq 'job_3'", select=['Id', 'State'], expand=None),
+        ])
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_media_processor',
+                return_value={'Id': 'media_processor_id'})
+    def test_get_media_processor_id_is_cached(self, get_media_processor):
+        cache.clear()
+        media_service._media_processors.clear()
+        media_services = self.make_one()
+
+        self.assertEqual(media_services.get_media_processor_id(), 'media_processor_id')
+        media_service._media_processors.clear()  # emulate another process
+        self.assertEqual(self.make_one().get_media_processor_id(), 'media_processor_id')
+
+        get_media_processor.assert_called_once_with('Media Encoder Standard')
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.submit_job', return_value={'Id': 'job_id'})
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_media_processor_id',
+                side_effect=['stale_processor_id', 'media_processor_id'])
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.invalidate_media_processor_id')
+    def test_create_job_refreshes_unknown_media_processor(self, invalidate, get_media_processor_id, submit_job):
+        error = HTTPError(response=mock.Mock(text='MediaProcessorId is invalid'))
+        submit_job.side_effect = [error, {'Id': 'job_id'}]
+
+        job = self.make_one().create_job('asset_id', 'video_id')
+
+        self.assertEqual(job, {'Id': 'job_id'})
+        invalidate.assert_called_once_with()
+        submit_job.assert_called_with('asset_id', 'video_id', 'media_processor_id', None,
+                                      media_service.DEFAULT_ENCODING_PRESET)
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.submit_job',
+                side_effect=HTTPError(response=mock.Mock(text='Internal error')))
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_media_processor_id',
+                return_value='media_processor_id')
+    def test_create_job_raises_other_errors(self, get_media_processor_id, submit_job):
+        with self.assertRaises(HTTPError):
+            self.make_one().create_job('asset_id', 'video_id')
+        submit_job.assert_called_once_with('asset_id', 'video_id', 'media_processor_id', None,
+                                           media_service.DEFAULT_ENCODING_PRESET)
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.create_locators',
+                side_effect=[HTTPError, [{'Id': 'locator_id'}]])
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_access_policy_id',
+                side_effect=['deleted_policy_id', 'access_policy_id'])
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.invalidate_access_policy_id')
+    def test_create_pooled_locators_refreshes_policy(self, invalidate, get_access_policy_id, create_locators):
+        locators = self.make_one().create_pooled_locators(
+            'asset_id', [LocatorTypes.SAS], 120, AccessPolicyPermissions.WRITE
+        )
+
+        self.assertEqual(locators, [{'Id': 'locator_id'}])
+        invalidate.assert_called_once_with(120, AccessPolicyPermissions.WRITE)
+        create_locators.assert_called_with('access_policy_id', 'asset_id', [LocatorTypes.SAS])
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    def test_asset_lookups_are_cached(self, _get_headers_mock):
+        response_cache.reset_metrics()
+        with mock.patch('azure_video_pipeline.transport.requests.Session.get', return_value=mock.Mock(
+            status_code=200, json=mock.Mock(return_value={'value': ['file1']}), headers={}
+        )) as requests_get:
+            self.assertEqual(self.make_one().get_asset_files('asset_id'), ['file1'])
+            response_cache.reset_response_caches()  # emulate another process
+            self.assertEqual(self.make_one().get_asset_files('asset_id'), ['file1'])
+            self.assertEqual(self.make_one().get_asset_files('asset_id'), ['file1'])
+
+        requests_get.assert_called_once_with("https://rest_api_endpoint/api/Assets('asset_id')/Files?$top=1000",
+                                             headers={})
+        self.assertEqual(response_cache.get_metrics(), {
+            ('misses', 'Files'): 1, ('shared_hits', 'Files'): 1, ('local_hits', 'Files'): 1
+        })
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    def test_expired_asset_lookup_is_revalidated(self, _get_headers_mock):
+        media_services = self.make_one()
+        with freeze_time('2017-11-01 00:00:00'):
+            with mock.patch('azure_video_pipeline.transport.requests.Session.get', return_value=mock.Mock(
+                status_code=200, json=mock.Mock(return_value={'value': ['locator']}), headers={'ETag': 'etag'}
+            )):
+                media_services.get_asset_locator('asset_id', LocatorTypes.SAS)
+
+        with freeze_time('2017-11-01 01:00:01'):
+            with mock.patch('azure_video_pipeline.transport.requests.Session.get',
+                            return_value=mock.Mock(status_code=304)) as requests_get:
+                self.assertEqual(media_services.get_asset_locator('asset_id', LocatorTypes.SAS), 'locator')
+                self.assertEqual(media_services.get_asset_locator('asset_id', LocatorTypes.SAS), 'locator')
+
+        requests_get.assert_called_once_with(
+            "https://rest_api_endpoint/api/Assets('asset_id')/Locators?$filter=Type eq 1&$top=1",
+            headers={'If-None-Match': 'etag'}
+        )
+
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    @mock.patch('azure_video_pipeline.media_service.BatchRequest.execute', return_value=[{'Id': 'locator_id'}])
+    def test_asset_lookups_are_invalidated_on_write(self, batch_execute, _get_headers_mock):
+        media_services = self.make_one()
+        with mock.patch('azure_video_pipeline.transport.requests.Session.get', side_effect=[
+            mock.Mock(status_code=200, json=mock.Mock(return_value={'value': []}), headers={}),
+            mock.Mock(status_code=200, json=mock.Mock(return_value={'value': ['locator']}), headers={}),
+        ]):
+            self.assertIsNone(media_services.get_asset_locator('asset_id', LocatorTypes.SAS))
+            media_services.create_locators('access_policy_id', 'asset_id', [LocatorTypes.SAS])
+            self.assertEqual(media_services.get_asset_locator('asset_id', LocatorTypes.SAS), 'locator')
+
+    @mock.patch.dict('azure_video_pipeline.media_service.settings.FEATURES', {
+        'AZURE_RESPONSE_CACHE_BACKEND': 'azure_video_pipeline.response_cache.NullResponseCache'
+    })
+    @mock.patch('azure_video_pipeline.media_service.MediaServiceClient.get_headers', return_value={})
+    def test_response_cache_backend_is_pluggable(self, _get_headers_mock):
+        with mock.patch('azure_video_pipeline.transport.requests.Session.get', return_value=mock.Mock(
+            status_code=200, json=mock.Mock(return_value={'value': ['file1']}), headers={}
+        )) as requests_get:
+            self.make_one().get_asset_files('asset_id')
+            self.make_one().get_asset_files('asset_id')
+
+        self.assertEqual(requests_get.call_count, 2)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import threading
+import time
+from time import sleep
+
+from django.conf import settings
+from django.core.cache import cache
+from msrestazure.azure_active_directory import ServicePrincipalCredentials
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_MARGIN = 5 * 60
+DEFAULT_TOKEN_LIFETIME = 60 * 60
+REFRESH_LOCK_TIMEOUT = 30
+REFRESH_WAIT_INTERVAL = 0.1
+
+_local_tokens = {}
+
+
+def get_token_cache_key(tenant, client_id, resource):
+    digest = hashlib.md5(u'{}|{}|{}'.format(tenant, client_id, resource).encode('utf-8')).hexdigest()
+    return 'azure_video_pipeline.aad_token.{}'.format(digest)
+
+
+def get_token_expiry(token):
+    """
+    Get token expiration timestamp (seconds since epoch).
+
+    AAD responses contain `expires_on`, oauthlib adds `expires_at`; `expires_in` is a last resort.
+    """
+    for field in ('expires_at', 'expires_on'):
+        if token.get(field):
+            return float(token[field])
+    return time.time() + int(token.get('expires_in', DEFAULT_TOKEN_LIFETIME))
+
+
+class CachedServicePrincipalCredentials(object):
+    """
+    Service principal credentials sharing the AAD access token between processes.
+
+    Token is kept in-process and in the Django cache under (tenant, client_id, resource) key. It is
+    refreshed `AZURE_TOKEN_REFRESH_MARGIN` seconds before expiration by a single process holding the
+    refresh lock, in background, so readers keep using the still valid token meanwhile.
+    """
+
+    def __init__(self, client_id, secret, tenant=None, resource=None, **kwargs):
+        self.client_id = client_id
+        self.secret = secret
+        self.tenant = tenant
+        self.resource = resource
+        self.cache_key = get_token_cache_key(tenant, client_id, resource)
+        self.lock_key = '{}.lock'.format(self.cache_key)
+
+    @property
+    def refresh_margin(self):
+        return settings.FEATURES.get('AZURE_TOKEN_REFRESH_MARGIN', DEFAULT_REFRESH_MARGIN)
+
+    @property
+    def token(self):
+        token = self.get_cached_token()
+        now = time.time()
+        if token and now < token['expires_at'] - self.refresh_margin:
+            return token
+
+        if token and now < token['expires_at']:
+            # token is about to expire - renew it ahead without holding the caller:
+            if self.acquire_refresh_lock():
+                self.refresh_in_background()
+            return token
+
+        return self.wait_for_token()
+
+    def get_cached_token(self):
+        token = _local_tokens.get(self.cache_key)
+        if token is None or time.time() >= token['expires_at'] - self.refresh_margin:
+            token = cache.get(self.cache_key) or token
+            if token:
+                _local_tokens[self.cache_key] = token
+        return token
+
+    def wait_for_token(self):
+        """
+        Get a valid token when none is cached, refreshing it unless another process is already on it.
+        """
+        deadline = time.time() + REFRESH_LOCK_TIMEOUT
+        while not self.acquire_refresh_lock():
+            if time.time() > deadline:
+                LOGGER.warning('Gave up waiting for concurrent AAD token refresh [%s].', self.cache_key)
+                return self.refresh()
+            sleep(REFRESH_WAIT_INTERVAL)
+            token = cache.get(self.cache_key)
+            if token and time.time() < token['expires_at']:
+                _local_tokens[self.cache_key] = token
+                return token
+        try:
+            token = cache.get(self.cache_key)
+            if token and time.time() < token['expires_at'] - self.refresh_margin:
+                _local_tokens[self.cache_key] = token
+                return token
+            return self.refresh()
+        finally:
+            self.release_refresh_lock()
+
+    def acquire_refresh_lock(self):
+        return cache.add(self.lock_key, True, REFRESH_LOCK_TIMEOUT)
+
+    def release_refresh_lock(self):
+        cache.delete(self.lock_key)
+
+    def refresh_in_background(self):
+        def refresh():
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception('Background AAD token refresh failed.')
+            finally:
+                self.release_refresh_lock()
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def refresh(self):
+        """
+        Request new access token from AAD and share it through the cache.
+        """
+        credentials = ServicePrincipalCredentials(
+            self.client_id, self.secret, tenant=self.tenant, resource=self.resource, cached=True
+        )
+        credentials.set_token()
+        token = dict(credentials.token)
+        token['expires_at'] = get_token_expiry(token)
+        cache.set(self.cache_key, token, max(int(token['expires_at'] - time.time()), 1))
+        _local_tokens[self.cache_key] = token
+        return token
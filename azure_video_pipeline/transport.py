@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from email.utils import mktime_tz, parsedate_tz
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from time import sleep
+
+from django.conf import settings
+from django.utils.six.moves.urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+DEFAULT_RETRY_TOTAL = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_RETRY_BACKOFF_MAX = 30
+DEFAULT_RETRY_AFTER_MAX = 60
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_TIMEOUT = 30
+
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'MERGE'])
+DEDUPE_KEY_HEADER = 'x-ms-client-request-id'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_breakers = {}
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+class CircuitBreakerOpen(requests.RequestException):
+    """
+    Raised instead of sending a request while the endpoint is considered degraded.
+    """
+
+
+def increment_metric(name, base_url):
+    with _metrics_lock:
+        _metrics[(name, base_url)] += 1
+
+
+def get_metrics():
+    """
+    Get transport counters of the current process.
+
+    :return: dict of `{(name, base_url): count}`, names are `retries`, `breaker_trips` and `breaker_rejections`
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class CircuitBreaker(object):
+    """
+    Per-endpoint circuit breaker.
+
+    Opens after `threshold` consecutive failed attempts and rejects requests for `reset_timeout` seconds,
+    then lets a single trial request through (half-open state): its success closes the breaker, its failure
+    opens it again.
+    """
+
+    def __init__(self, base_url, threshold, reset_timeout):
+        self.base_url = base_url
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout and not self.trial_in_progress:
+                self.trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def release_trial(self):
+        with self._lock:
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_progress or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.time()
+                self.trial_in_progress = False
+                tripped = True
+            else:
+                tripped = False
+        if tripped:
+            LOGGER.warning('Circuit breaker opened for %s after %s failures.', self.base_url, self.failures)
+            increment_metric('breaker_trips', self.base_url)
+
+
+def get_circuit_breaker(base_url):
+    key = (os.getpid(), base_url)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _sessions_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                features = settings.FEATURES
+                breaker = _breakers[key] = CircuitBreaker(
+                    base_url,
+                    threshold=features.get('AZURE_CIRCUIT_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD),
+                    reset_timeout=features.get('AZURE_CIRCUIT_BREAKER_RESET_TIMEOUT', DEFAULT_BREAKER_RESET_TIMEOUT),
+                )
+    return breaker
+
+
+def get_retry_after(response):
+    """
+    Get delay (seconds) requested by `Retry-After` response header (either seconds or HTTP date), if any.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        date = parsedate_tz(value)
+        return max(mktime_tz(date) - time.time(), 0) if date else None
+
+
+def get_backoff(attempt, response=None):
+    """
+    Get delay before the next attempt: `Retry-After` if provided, exponential backoff with full jitter otherwise.
+    """
+    features = settings.FEATURES
+    retry_after = get_retry_after(response) if response is not None else None
+    if retry_after is not None:
+        return min(retry_after, features.get('AZURE_RETRY_AFTER_MAX', DEFAULT_RETRY_AFTER_MAX))
+    backoff = features.get('AZURE_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF) * 2 ** attempt
+    return random.uniform(0, min(backoff, features.get('AZURE_RETRY_BACKOFF_MAX', DEFAULT_RETRY_BACKOFF_MAX)))
+
+
+def is_retryable(method, data=None, dedupe_key=None):
+    """
+    Check whether request may be safely repeated.
+    """
+    if hasattr(data, 'read'):
+        # file-like body is consumed by the first attempt:
+        return False
+    return method.upper() in IDEMPOTENT_METHODS or dedupe_key is not None
+
+
+def is_transient_error(error):
+    """
+    Check whether the failed request may succeed later: connection failures, timeouts, throttling and 5xx responses.
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, requests.RequestException)
+
+
+class RetrySession(requests.Session):
+    """
+    HTTP session retrying throttled and failed requests behind a per-endpoint circuit breaker.
+
+    Idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE, MERGE) are retried on connection errors, timeouts and
+    408/429/5xx responses up to `AZURE_RETRY_TOTAL` times. POST is retried only if the caller provides
+    `dedupe_key` (sent as `x-ms-client-request-id`), i.e. it is safe to repeat; requests streaming a file-like
+    body are never retried. AMS doesn't deduplicate requests by the header, so callers repeating entity creation
+    pass `before_retry` callable checking whether the previous attempt took effect: it is called before every
+    retry and exceptions it raises stop retrying. While the endpoint's circuit breaker is open
+    `CircuitBreakerOpen` is raised at once.
+    """
+
+    def __init__(self, base_url, sleep=None):
+        """
+        Create a session of the endpoint's host.
+
+        :param sleep: callable waiting the given number of seconds between retries, `time.sleep` by default
+        """
+        super(RetrySession, self).__init__()
+        self.base_url = base_url
+        self.sleep = sleep
+
+    def request(self, method, url, *args, **kwargs):
+        dedupe_key = kwargs.pop('dedupe_key', None)
+        before_retry = kwargs.pop('before_retry', None)
+        if dedupe_key is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{DEDUPE_KEY_HEADER: dedupe_key})
+        data = kwargs.get('data', args[1] if len(args) > 1 else None)
+        retries = settings.FEATURES.get('AZURE_RETRY_TOTAL', DEFAULT_RETRY_TOTAL)
+        if not is_retryable(method, data, dedupe_key):
+            retries = 0
+
+        attempt = 0
+        while True:
+            response = self.send_attempt(method, url, args, kwargs, last_attempt=attempt >= retries)
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt >= retries):
+                return response
+
+            delay = get_backoff(attempt, response)
+            attempt += 1
+            increment_metric('retries', self.base_url)
+            LOGGER.info('Retrying %s %s in %.2fs [attempt %s of %s].', method, url, delay, attempt, retries)
+            if response is not None:
+                response.close()
+            (self.sleep or sleep)(delay)
+            if before_retry is not None:
+                before_retry()
+
+    def send_attempt(self, method, url, args, kwargs, last_attempt):
+        """
+        Send request once through the circuit breaker.
+
+        :return: response or None if connection failed and the request is to be retried
+        """
+        breaker = get_circuit_breaker(self.base_url)
+        if not breaker.allow_request():
+            increment_metric('breaker_rejections', self.base_url)
+            raise CircuitBreakerOpen('Circuit breaker is open for {}.'.format(self.base_url))
+        try:
+            response = super(RetrySession, self).request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.record_failure()
+            if last_attempt:
+                raise
+            return None
+        except Exception:
+            # not an endpoint failure (e.g. invalid request), let another trial request through:
+            breaker.release_trial()
+            raise
+        if response.status_code in RETRY_STATUSES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter which keeps TCP connections to the remote host alive between requests.
+    """
+
+    def __init__(self, keep_alive=True, **kwargs):
+        self.keep_alive = keep_alive
+        super(PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keep_alive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+def get_base_url(endpoint):
+    """
+    Reduce endpoint URL to the `scheme://host[:port]` part connections are pooled by.
+    """
+    parts = urlsplit(endpoint or '')
+    return u'{}://{}'.format(parts.scheme or 'https', parts.netloc)
+
+
+def create_session(base_url):
+    """
+    Build retrying HTTP session with a connection pool mounted for the given base URL.
+
+    Pool size and keep-alive are configured by `AZURE_HTTP_POOL_CONNECTIONS`, `AZURE_HTTP_POOL_MAXSIZE`
+    and `AZURE_HTTP_KEEP_ALIVE` features.
+    """
+    features = settings.FEATURES
+    keep_alive = features.get('AZURE_HTTP_KEEP_ALIVE', True)
+    adapter = PooledHTTPAdapter(
+        keep_alive=keep_alive,
+        pool_connections=features.get('AZURE_HTTP_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=features.get('AZURE_HTTP_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE),
+    )
+    session = RetrySession(base_url)
+    session.mount(base_url, adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_session(endpoint):
+    """
+    Return shared HTTP session for the endpoint's host.
+
+    Sessions are kept per process so forked workers (e.g. Celery prefork pool) never share sockets
+    with their parent.
+    :param endpoint: any URL on the target host
+    """
+    key = (os.getpid(), get_base_url(endpoint))
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = create_session(key[1])
+    return session
+
+
+def reset_sessions():
+    """
+    Close and forget all pooled sessions (and circuit breakers) of the current process.
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _breakers.clear()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import logging
+import mimetypes
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from .blobs_service import BlobServiceClient, get_block_id, MAX_BLOCK_SIZE
+from .models import AzureUploadSession
+from .telemetry import record_stage
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Azure block blob consists of 50000 blocks at most:
+MAX_BLOCKS_COUNT = 50000
+DEFAULT_UPLOAD_THROUGHPUT = 256 * 1024
+DEFAULT_MIN_URL_EXPIRY = 30 * 60
+DEFAULT_MAX_URL_EXPIRY = 24 * 60 * 60
+
+
+def get_url_expiry(missing_bytes):
+    """
+    Get SAS URL lifetime (seconds) enough to send missing bytes at `AZURE_UPLOAD_THROUGHPUT` bytes per second.
+    """
+    features = settings.FEATURES
+    expires_in = missing_bytes // features.get('AZURE_UPLOAD_THROUGHPUT', DEFAULT_UPLOAD_THROUGHPUT)
+    return int(min(
+        max(expires_in, features.get('AZURE_UPLOAD_MIN_URL_EXPIRY', DEFAULT_MIN_URL_EXPIRY)),
+        features.get('AZURE_UPLOAD_MAX_URL_EXPIRY', DEFAULT_MAX_URL_EXPIRY)
+    ))
+
+
+def get_block_size(file_size):
+    # Put Block rejects blocks larger than MAX_BLOCK_SIZE:
+    block_size = min(settings.FEATURES.get('AZURE_UPLOAD_BLOCK_SIZE', MAX_BLOCK_SIZE), MAX_BLOCK_SIZE)
+    if file_size > block_size * MAX_BLOCKS_COUNT:
+        raise ValidationError('File of {} bytes is too large to be uploaded.'.format(file_size))
+    return block_size
+
+
+def start_upload_session(media_service_client, file_size, organization='', edx_video_id=''):
+    """
+    Start resumable upload of `client_video_id` file into `asset` of the MediaServiceClient.
+
+    Creates AssetFile (and write SAS Locator) the same way `MediaServiceClient.generate_url` does.
+    :param media_service_client: MediaServiceClient with `asset` and `client_video_id` metadata set
+    :param file_size: size of the file to be uploaded in bytes
+    :return: AzureUploadSession
+    """
+    asset_id = media_service_client.asset['Id']
+    blob_name = media_service_client.client_video_id
+    content_type = mimetypes.guess_type(blob_name)[0] or ''
+    asset_file, _ = media_service_client.create_asset_file_with_locator(
+        asset_id, blob_name, content_type, duration_in_minutes=DEFAULT_MAX_URL_EXPIRY // 60
+    )
+    if edx_video_id:
+        record_stage(edx_video_id, 'upload_url_issued')
+    return AzureUploadSession.objects.create(
+        organization=organization or '',
+        edx_video_id=edx_video_id,
+        asset_id=asset_id,
+        asset_file_id=asset_file['Id'],
+        blob_name=blob_name,
+        content_type=content_type,
+        file_size=file_size,
+        block_size=get_block_size(file_size),
+    )
+
+
+def get_blob_service_client(media_service_client):
+    return BlobServiceClient(media_service_client.storage_account_name, media_service_client.storage_key)
+
+
+def sync_upload_session(media_service_client, upload_session):
+    """
+    Refresh session's block manifest from blocks actually stored on Azure.
+
+    Blocks with unexpected size (e.g. interrupted) are considered missing. Uncommitted blocks are discarded
+    by Azure after a week, so the manifest is replaced rather than merged.
+    """
+    block_sizes = get_blob_service_client(media_service_client).get_block_sizes(
+        upload_session.container_name, upload_session.blob_name
+    )
+    upload_session.set_uploaded_blocks(
+        index for index, size in block_sizes.items()
+        if index < upload_session.blocks_count and size == upload_session.get_block_length(index)
+    )
+    upload_session.save()
+    return upload_session
+
+
+def get_upload_session_info(media_service_client, upload_session, sync=True):
+    """
+    Get data needed to (re)start the upload: missing byte ranges and SAS URL living long enough to send them.
+
+    Client is expected to split the file into `block_size` blocks, upload missing ones with Put Block
+    using their `block_ids` (plain, to be base64-encoded) and call `complete_upload_session` afterwards.
+    """
+    if sync:
+        sync_upload_session(media_service_client, upload_session)
+    missing_ranges = upload_session.get_missing_ranges()
+    for block_range in missing_ranges:
+        block_range['block_ids'] = [
+            get_block_id(index) for index in range(block_range['first_block'], block_range['last_block'] + 1)
+        ]
+    expires_in = get_url_expiry(upload_session.missing_bytes)
+    upload_url = get_blob_service_client(media_service_client).generate_url(
+        asset_id=upload_session.asset_id,
+        blob_name=upload_session.blob_name,
+        expires_in=expires_in,
+    )
+    return {
+        'session_id': upload_session.id,
+        'file_size': upload_session.file_size,
+        'block_size': upload_session.block_size,
+        'missing_ranges': missing_ranges,
+        'upload_url': upload_url,
+        'expires_in': expires_in,
+    }
+
+
+def complete_upload_session(media_service_client, upload_session):
+    """
+    Commit uploaded blocks into the blob and set AssetFile size.
+
+    :raise ValidationError: if some blocks are still missing
+    """
+    if upload_session.status == AzureUploadSession.COMMITTED:
+        return upload_session
+    sync_upload_session(media_service_client, upload_session)
+    if upload_session.missing_blocks:
+        raise ValidationError('Upload is incomplete: {} blocks are missing.'.format(
+            len(upload_session.missing_blocks)
+        ))
+
+    get_blob_service_client(media_service_client).commit_blocks(
+        upload_session.container_name,
+        upload_session.blob_name,
+        [get_block_id(index) for index in range(upload_session.blocks_count)],
+        content_type=upload_session.content_type or None,
+    )
+    media_service_client.update_asset_file(
+        upload_session.asset_file_id,
+        {'size': upload_session.file_size, 'ctype': upload_session.content_type},
+        input_asset_id=upload_session.asset_id,
+    )
+    upload_session.status = AzureUploadSession.COMMITTED
+    upload_session.save()
+    LOGGER.info('Upload session [%s] is committed.', upload_session.id)
+    return upload_session
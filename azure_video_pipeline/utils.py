@@ -1,42 +1,260 @@
+from collections import deque
+import copy
+import itertools
+import logging
+from multiprocessing.pool import ThreadPool
+import uuid
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from organizations.models import Organization
+from requests import HTTPError
 
+from .async_media_service import AsyncMediaServiceClient
+from .caching import LRUCache
 from .media_service import LocatorTypes, MediaServiceClient
 from .models import AzureOrgProfile
 
+LOGGER = logging.getLogger(__name__)
 
-def get_azure_config(organization):
-    azure_config = {}
-    azure_profile = AzureOrgProfile.objects.filter(organization__short_name=organization).first()
-    if azure_profile:
-        azure_config = azure_profile.to_dict()
-    elif all([
-        settings.FEATURES.get('AZURE_CLIENT_ID'),
-        settings.FEATURES.get('AZURE_CLIENT_SECRET'),
-        settings.FEATURES.get('AZURE_TENANT'),
-        settings.FEATURES.get('AZURE_REST_API_ENDPOINT'),
-        settings.FEATURES.get('STORAGE_ACCOUNT_NAME'),
-        settings.FEATURES.get('STORAGE_KEY')
-    ]):
-        azure_config = {
-            'client_id': settings.FEATURES.get('AZURE_CLIENT_ID'),
-            'secret': settings.FEATURES.get('AZURE_CLIENT_SECRET'),
-            'tenant': settings.FEATURES.get('AZURE_TENANT'),
-            'rest_api_endpoint': settings.FEATURES.get('AZURE_REST_API_ENDPOINT'),
-            'storage_account_name': settings.FEATURES.get('STORAGE_ACCOUNT_NAME'),
-            'storage_key': settings.FEATURES.get('STORAGE_KEY')
-        }
+ORG_PROFILE_VERSION_KEY = 'azure_video_pipeline.org_profile_version.{}'
+AZURE_CONFIG_CACHE_KEY = 'azure_video_pipeline.azure_config.{}.{}'
+DEFAULT_AZURE_CONFIG_CACHE_TTL = 60 * 60
+# cached for Organizations without Azure profile, they use the platform config:
+NO_AZURE_PROFILE = 'no_azure_profile'
+STREAMING_LOCATOR_FIELDS = ['AssetId', 'Path']
+STREAMING_FILE_FIELDS = ['Name', 'MimeType']
+
+_media_service_clients = LRUCache(max_size=settings.FEATURES.get('AZURE_CLIENT_REGISTRY_SIZE', 1000))
+# `{(short name, profile version): Azure config}`
+_azure_configs = LRUCache(max_size=settings.FEATURES.get('AZURE_CLIENT_REGISTRY_SIZE', 1000))
+
+
+def get_platform_azure_config():
+    """
+    Get Azure config of the platform settings, used by Organizations without Azure profile (empty if not set).
+    """
+    features = settings.FEATURES
+    azure_config = {
+        'client_id': features.get('AZURE_CLIENT_ID'),
+        'secret': features.get('AZURE_CLIENT_SECRET'),
+        'tenant': features.get('AZURE_TENANT'),
+        'rest_api_endpoint': features.get('AZURE_REST_API_ENDPOINT'),
+        'storage_account_name': features.get('STORAGE_ACCOUNT_NAME'),
+        'storage_key': features.get('STORAGE_KEY')
+    }
+    return azure_config if all(azure_config.values()) else {}
+
+
+def get_azure_config_cache_ttl():
+    return settings.FEATURES.get('AZURE_CONFIG_CACHE_TTL', DEFAULT_AZURE_CONFIG_CACHE_TTL)
+
+
+def set_local_azure_config(organization, version, azure_profile):
+    azure_config = get_platform_azure_config() if azure_profile == NO_AZURE_PROFILE else azure_profile
+    _azure_configs.set((organization, version), azure_config)
     return azure_config
 
 
+def get_azure_config(organization):
+    """
+    Get Azure config of the Organization: its AzureOrgProfile's one or the platform's one.
+
+    Configs are looked up in the process-wide LRU tier, then in the Django cache and only then in the DB. Both
+    tiers are keyed by Organization's profile version, so changes of AzureOrgProfile or Organization (and
+    profiles created later) are picked up at once by every process. Organizations without a profile are
+    cached too, the platform config is never stored in the Django cache.
+    :param organization: Organization short name
+    """
+    version = get_org_profile_version(organization)
+    azure_config = _azure_configs.get((organization, version))
+    if azure_config is None:
+        key = AZURE_CONFIG_CACHE_KEY.format(organization, version)
+        azure_profile = cache.get(key)
+        if azure_profile is None:
+            azure_profile = AzureOrgProfile.objects.filter(organization__short_name=organization).first()
+            azure_profile = azure_profile.to_dict() if azure_profile else NO_AZURE_PROFILE
+            cache.set(key, azure_profile, get_azure_config_cache_ttl())
+        azure_config = set_local_azure_config(organization, version, azure_profile)
+    return dict(azure_config)
+
+
+def load_azure_profiles(organizations, versions):
+    """
+    Load Azure profiles of the Organizations (NO_AZURE_PROFILE if there is none) with a single query.
+    """
+    azure_profiles = {
+        azure_profile.organization.short_name: azure_profile.to_dict()
+        for azure_profile in AzureOrgProfile.objects.filter(
+            organization__short_name__in=organizations
+        ).select_related('organization')
+    }
+    azure_profiles = {
+        organization: azure_profiles.get(organization, NO_AZURE_PROFILE) for organization in organizations
+    }
+    cache.set_many({
+        AZURE_CONFIG_CACHE_KEY.format(organization, versions[organization]): azure_profile
+        for organization, azure_profile in azure_profiles.items()
+    }, get_azure_config_cache_ttl())
+    return azure_profiles
+
+
+def get_azure_configs(organizations):
+    """
+    Get Azure configs of many Organizations at once (e.g. before walking all of them), see `get_azure_config`.
+
+    Profile versions and Django cache entries are read with a single `get_many` each and profiles missing
+    there with a single query, both tiers are warmed up for later `get_azure_config` calls.
+    :return: `{short name: Azure config}`
+    """
+    organizations = set(organizations)
+    versions = cache.get_many([ORG_PROFILE_VERSION_KEY.format(organization) for organization in organizations])
+    versions = {
+        organization: versions.get(ORG_PROFILE_VERSION_KEY.format(organization)) for organization in organizations
+    }
+    azure_configs, keys = {}, {}
+    for organization in organizations:
+        azure_config = _azure_configs.get((organization, versions[organization]))
+        if azure_config is None:
+            keys[AZURE_CONFIG_CACHE_KEY.format(organization, versions[organization])] = organization
+        else:
+            azure_configs[organization] = azure_config
+
+    azure_profiles = {keys[key]: azure_profile for key, azure_profile in cache.get_many(list(keys)).items()}
+    missing = [organization for organization in keys.values() if organization not in azure_profiles]
+    if missing:
+        azure_profiles.update(load_azure_profiles(missing, versions))
+    for organization, azure_profile in azure_profiles.items():
+        azure_configs[organization] = set_local_azure_config(organization, versions[organization], azure_profile)
+    return {organization: dict(azure_config) for organization, azure_config in azure_configs.items()}
+
+
+def get_org_profile_version(organization):
+    return cache.get(ORG_PROFILE_VERSION_KEY.format(organization))
+
+
 def get_media_service_client(organization):
-    return MediaServiceClient(get_azure_config(organization))
+    """
+    Get ready-to-use MediaServiceClient for the Organization.
+
+    Clients are kept in the process-wide LRU registry and dropped once Organization's Azure profile
+    version (shared through the Django cache) changes. Registry hands out shallow copies, so per-request
+    metadata (see `MediaServiceClient.set_metadata`) never leaks between callers.
+    :param organization: Organization short name
+    """
+    version = get_org_profile_version(organization)
+    entry = _media_service_clients.get(organization)
+    if entry is None or entry[0] != version:
+        entry = (version, MediaServiceClient(get_azure_config(organization)))
+        _media_service_clients.set(organization, entry)
+    return copy.copy(entry[1])
+
+
+def get_async_media_service_client(organization):
+    """
+    Get non-blocking client for the Organization (see `AsyncMediaServiceClient`).
+    """
+    return AsyncMediaServiceClient(client=get_media_service_client(organization))
+
+
+def invalidate_media_service_client(organization):
+    # new profile version drops cached Azure configs of the Organization as well:
+    cache.set(ORG_PROFILE_VERSION_KEY.format(organization), uuid.uuid4().hex, None)
+    _media_service_clients.delete(organization)
+
+
+@receiver(post_save, sender=AzureOrgProfile)
+@receiver(post_delete, sender=AzureOrgProfile)
+def azure_org_profile_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Drop cached clients of the Organization whose Azure profile is changed.
+    """
+    invalidate_media_service_client(instance.organization.short_name)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def organization_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Drop cached clients of the changed Organization, e.g. the one whose profile is deleted along with it.
+    """
+    invalidate_media_service_client(instance.short_name)
+
+
+def iter_concurrently(func, items, workers):
+    """
+    Apply `func` to every item on a bounded thread pool, yielding (item, result) pairs in items order.
+
+    No more than `2 * workers` items are in flight, so items may come from an endless generator.
+    """
+    pool = ThreadPool(workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.apply_async(func, (item,))))
+            if len(pending) >= 2 * workers:
+                item, result = pending.popleft()
+                yield item, result.get()
+        while pending:
+            item, result = pending.popleft()
+            yield item, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def get_streaming_locators(media_service_api):
+    """
+    Get iterator of streaming Locators with their Asset Files inlined (`$expand`) when AMS allows it.
+
+    :return: (Locators iterator, whether Asset Files are inlined)
+    """
+    locators = media_service_api.iter_locators(
+        LocatorTypes.OnDemandOrigin,
+        select=STREAMING_LOCATOR_FIELDS + ['Asset/Files/{}'.format(field) for field in STREAMING_FILE_FIELDS],
+        expand=['Asset/Files']
+    )
+    try:
+        first_locator = next(locators)
+    except StopIteration:
+        return iter([]), True
+    except HTTPError:
+        LOGGER.info('Locators $expand is rejected by AzureMS, Asset Files are to be fetched separately.')
+        return media_service_api.iter_locators(LocatorTypes.OnDemandOrigin, select=STREAMING_LOCATOR_FIELDS), False
+    return itertools.chain([first_locator], locators), True
+
+
+def get_streaming_video_list(organization, bulk=True):
+    """
+    Iterate over Organization's published videos, fetching Locators page by page.
+
+    :param organization: Organization short name
+    :param bulk: get Asset Files along with Locators or, if that's not possible, fetch Files of several
+        Assets concurrently (`AZURE_FANOUT_WORKERS` threads, started for that fallback only); videos are yielded
+        in Locators order anyway
+    """
+    media_service_api = get_media_service_client(organization)
+    if not bulk:
+        locators = media_service_api.iter_locators(LocatorTypes.OnDemandOrigin, select=STREAMING_LOCATOR_FIELDS)
+        for locator in locators:
+            files = media_service_api.iter_asset_files(locator.get('AssetId'), select=STREAMING_FILE_FIELDS)
+            yield get_streaming_video_info(files, locator)
+        return
 
+    def get_files(locator):
+        files = (locator.get('Asset') or {}).get('Files')
+        if files is None:
+            files = list(media_service_api.iter_asset_files(locator.get('AssetId'), select=STREAMING_FILE_FIELDS))
+        return files
 
-def get_streaming_video_list(azure_config):
-    media_service_api = get_media_service_client(azure_config)
-    locators = media_service_api.get_locators_list(LocatorTypes.OnDemandOrigin)
-    for locator in locators:
-        files = media_service_api.get_asset_files(locator.get('AssetId'))
+    locators, expanded = get_streaming_locators(media_service_api)
+    if expanded:
+        located_files = ((locator, get_files(locator)) for locator in locators)
+    else:
+        located_files = iter_concurrently(get_files, locators, settings.FEATURES.get('AZURE_FANOUT_WORKERS', 8))
+    for locator, files in located_files:
         yield get_streaming_video_info(files, locator)
 
 
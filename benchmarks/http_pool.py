@@ -0,0 +1,59 @@
+"""
+Compare per-call `requests` connections with the pooled MediaServiceClient session.
+
+Stub server speaks plain HTTP, so the measured gain only covers TCP setup; against AMS every avoided
+connection also saves a TLS handshake.
+
+Usage: python benchmarks/http_pool.py [number-of-calls]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure(FEATURES={}, MOCKED_MODULES=['courseware'])
+
+import mock  # noqa: E402
+import requests  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+from azure_video_pipeline import transport  # noqa: E402
+from azure_video_pipeline.media_service import MediaServiceClient  # noqa: E402
+
+
+def run(label, server, call, calls):
+    server.reset_stats()
+    started = time.time()
+    for _ in range(calls):
+        call()
+    elapsed = time.time() - started
+    print('{:<28} calls={:<6} connections={:<6} total={:.3f}s per-call={:.3f}ms'.format(
+        label, server.stats['requests'], server.stats['connections'], elapsed, elapsed * 1000 / calls
+    ))
+
+
+def main(calls):
+    server = StubServer().start()
+    client = MediaServiceClient({
+        'client_id': 'client_id',
+        'secret': 'secret',
+        'rest_api_endpoint': server.endpoint,
+        'storage_account_name': 'account',
+        'storage_key': 'key',
+    })
+    client.credentials = mock.Mock(token={'token_type': 'Bearer', 'access_token': 'token'})
+    job_url = "{}Jobs('nb:jid:UUID:stub')".format(server.endpoint)
+
+    run('requests.get (no pooling)', server, lambda: requests.get(job_url, headers=client.get_headers()), calls)
+    run('MediaServiceClient.get_job', server, lambda: client.get_job('nb:jid:UUID:stub'), calls)
+    transport.reset_sessions()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
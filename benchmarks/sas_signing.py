@@ -0,0 +1,72 @@
+"""
+Compare azure-storage SAS generation with the local SasSigner, uncached and cached.
+
+Every URL is built for one of `blobs` distinct blobs, as when a video list renders the same assets
+for many learners.
+
+Usage: python benchmarks/sas_signing.py [number-of-urls] [number-of-blobs]
+"""
+from __future__ import print_function
+
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure(FEATURES={}, MOCKED_MODULES=['courseware'])
+
+from azure.storage.blob import BlobService, BlobSharedAccessPermissions  # noqa: E402
+
+from azure_video_pipeline.blobs_service import BlobServiceClient  # noqa: E402
+from azure_video_pipeline.sas import SasSigner  # noqa: E402
+
+ACCOUNT_KEY = base64.b64encode(b'k' * 64)
+EXPIRES_IN = 60 * 60
+
+
+def run(label, make_url, urls, blobs):
+    started = time.time()
+    for index in range(urls):
+        make_url('asset-id', 'video-{}.mp4'.format(index % blobs))
+    elapsed = time.time() - started
+    print('{:<28} urls={:<7} total={:.3f}s per-url={:.2f}us'.format(
+        label, urls, elapsed, elapsed * 1000000 / urls
+    ))
+
+
+def main(urls, blobs):
+    permission = BlobSharedAccessPermissions.READ
+    blob_service_client = BlobServiceClient('account', ACCOUNT_KEY)
+    blob_service_client.blob_service = BlobService('account', ACCOUNT_KEY)
+
+    def azure_storage_url(container_name, blob_name):
+        blob_service = blob_service_client.blob_service
+        sas_token = blob_service.generate_shared_access_signature(
+            container_name, blob_name, blob_service_client.get_shared_access_policy(permission, EXPIRES_IN)
+        )
+        return blob_service.make_blob_url(container_name, blob_name, sas_token=sas_token)
+
+    signer = SasSigner('account', ACCOUNT_KEY)
+    now = int(time.time())
+
+    def uncached_url(container_name, blob_name):
+        return u'{}/{}/{}?{}'.format(signer.base_url, container_name, blob_name, signer.sign_blob_token(
+            container_name, blob_name, permission, now, now + EXPIRES_IN
+        ))
+
+    run('azure-storage', azure_storage_url, urls, blobs)
+    run('SasSigner (uncached)', uncached_url, urls, blobs)
+    run('SasSigner.make_blob_url', lambda container_name, blob_name: signer.make_blob_url(
+        container_name, blob_name, permission, EXPIRES_IN
+    ), urls, blobs)
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
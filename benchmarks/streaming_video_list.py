@@ -0,0 +1,101 @@
+"""
+Compare sequential and bulk `get_streaming_video_list` against a local stand-in with many published assets.
+
+Stand-in delays every response to emulate the round trip to Azure Media Services; the fan-out gain grows with
+that latency (try `2000 20`).
+
+Usage: python benchmarks/streaming_video_list.py [number-of-assets] [latency-ms]
+"""
+from __future__ import print_function
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    FEATURES={'AZURE_HTTP_POOL_MAXSIZE': 16, 'AZURE_FANOUT_WORKERS': 16},
+    MOCKED_MODULES=['courseware'],
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth', 'organizations', 'azure_video_pipeline'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+)
+django.setup()
+
+from django.utils.six.moves.urllib.parse import unquote  # noqa: E402
+import mock  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+from azure_video_pipeline import transport, utils  # noqa: E402
+from azure_video_pipeline.tokens import CachedServicePrincipalCredentials  # noqa: E402
+
+
+class PublishedAssets(object):
+    """
+    Responder serving `count` streaming locators and their asset files.
+    """
+
+    def __init__(self, count, expand_supported):
+        self.count = count
+        self.expand_supported = expand_supported
+
+    @staticmethod
+    def files(index):
+        return [
+            {'Name': 'video_{}.ism'.format(index), 'MimeType': 'application/octet-stream'},
+            {'Name': 'video_{}_1280x720.mp4'.format(index), 'MimeType': 'video/mp4'},
+        ]
+
+    def __call__(self, method, path, body):
+        path = unquote(path)
+        if path.startswith('/api/Assets('):
+            index = int(re.search(r"Assets\('asset_(\d+)'\)", path).group(1))
+            return {'value': self.files(index)}
+
+        expand = '$expand=' in path
+        if expand and not self.expand_supported:
+            return 400, {'odata.error': {'message': {'value': 'Expand is not supported.'}}}
+        top = int(re.search(r'\$top=(\d+)', path).group(1))
+        skip = re.search(r'\$skip=(\d+)', path)
+        skip = int(skip.group(1)) if skip else 0
+        locators = []
+        for index in range(skip, min(skip + top, self.count)):
+            locator = {'AssetId': 'asset_{}'.format(index), 'Path': 'https://streaming/locator_{}/'.format(index)}
+            if expand:
+                locator['Asset'] = {'Files': self.files(index)}
+            locators.append(locator)
+        return {'value': locators}
+
+
+def run(label, count, latency, expand_supported, bulk):
+    server = StubServer(PublishedAssets(count, expand_supported), latency=latency).start()
+    azure_config = {'client_id': 'client_id', 'secret': 'secret', 'rest_api_endpoint': server.endpoint}
+    utils._media_service_clients.clear()
+    with mock.patch.object(utils, 'get_azure_config', return_value=azure_config):
+        started = time.time()
+        videos = sum(1 for _ in utils.get_streaming_video_list('org', bulk=bulk))
+        elapsed = time.time() - started
+    print('{:<34} videos={:<7} requests={:<7} total={:.2f}s'.format(
+        label, videos, server.stats['requests'], elapsed
+    ))
+    transport.reset_sessions()
+    server.stop()
+
+
+def main(count, latency):
+    token = {'token_type': 'Bearer', 'access_token': 'token'}
+    with mock.patch.object(CachedServicePrincipalCredentials, 'token', token):
+        run('sequential (N+1)', count, latency, expand_supported=False, bulk=False)
+        run('bulk, concurrent Files fan-out', count, latency, expand_supported=False, bulk=True)
+        run('bulk, $expand=Asset/Files', count, latency, expand_supported=True, bulk=True)
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002,
+    )
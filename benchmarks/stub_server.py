@@ -0,0 +1,98 @@
+"""
+Local stand-in for the Azure Media Services REST API used by benchmarks.
+
+Server counts accepted TCP connections and handled requests so benchmarks can report round trips.
+Responder callable gets (method, path, body) and returns JSON payload or (status, payload) pair.
+"""
+import json
+import threading
+import time
+
+from django.utils.six.moves import BaseHTTPServer, socketserver
+
+
+class StubRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # buffer whole response and write it at once, avoiding Nagle/delayed-ACK stalls on kept-alive sockets:
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.stats_lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload):
+        if isinstance(payload, tuple):
+            status, payload = payload
+        body = json.dumps(payload).encode('utf-8')
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def do_GET(self):  # noqa: N802
+        self.send_json(200, self.server.responder('GET', self.path, None))
+
+    def do_POST(self):  # noqa: N802
+        body = self.read_body()
+        self.send_json(201, self.server.responder('POST', self.path, body))
+
+    def do_DELETE(self):  # noqa: N802
+        self.send_json(204, {})
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    request_queue_size = 128
+
+    def __init__(self, responder=None, latency=0):
+        """
+        Create server bound to a random local port.
+
+        :param responder: callable building responses
+        :param latency: seconds every response is delayed by, to emulate round trip to Azure
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StubRequestHandler)
+        self.latency = latency
+        self.responder = responder or (lambda method, path, body: {'Id': 'nb:jid:UUID:stub', 'State': 3})
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:{}/api/'.format(self.server_address[1])
+
+    def handle_error(self, request, client_address):
+        # clients dropping kept-alive connections at exit are expected
+        pass
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'connections': 0, 'requests': 0}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()